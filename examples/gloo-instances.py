@@ -0,0 +1,58 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+""" 10,000 rotating quads drawn with a single (instanced) draw call """
+import numpy as np
+from glumpy import app, gl, gloo
+
+vertex = """
+uniform float time;
+attribute vec2 position;  // Per vertex
+attribute vec2 offset;    // Per instance
+attribute float size;     // Per instance
+attribute vec4 color;     // Per instance
+varying vec4 v_color;
+void main (void)
+{
+    float c = cos(time*size*100.0), s = sin(time*size*100.0);
+    vec2 p = size * mat2(c, s, -s, c) * position;
+    gl_Position = vec4(offset + p, 0.0, 1.0);
+    v_color = color;
+}
+"""
+
+fragment = """
+varying vec4 v_color;
+void main(void)
+{
+    gl_FragColor = v_color;
+}
+"""
+
+window = app.Window(width=800, height=800, color=(1,1,1,1))
+
+@window.event
+def on_draw(dt):
+    window.clear()
+    program["time"] += dt
+    program.draw(gl.GL_TRIANGLE_STRIP, instances=len(instances))
+
+n = 10000
+instances = np.zeros(n, [("offset", np.float32, 2),
+                         ("size",   np.float32),
+                         ("color",  np.uint8,   4)]).view(gloo.VertexBuffer)
+instances["offset"] = np.random.uniform(-1, 1, (n,2))
+instances["size"] = np.random.uniform(0.005, 0.02, n)
+instances["color"] = np.random.randint(0, 256, (n,4))
+instances["color"][:,3] = 192
+instances.divisor = 1
+
+program = gloo.Program(vertex, fragment)
+program["position"] = [(-1,-1), (-1,+1), (+1,-1), (+1,+1)]
+program.bind(instances)
+program["time"] = 0
+
+gl.glEnable(gl.GL_BLEND)
+gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+app.run()
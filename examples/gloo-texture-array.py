@@ -0,0 +1,67 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+""" A grid of images rendered in a single draw call using a texture array """
+import numpy as np
+from glumpy import app, gloo, gl
+
+vertex = """
+    attribute vec2 position;
+    attribute vec2 texcoord;
+    attribute float layer;
+    varying vec3 v_texcoord;
+    void main()
+    {
+        gl_Position = vec4(position, 0.0, 1.0);
+        v_texcoord = vec3(texcoord, layer);
+    }
+"""
+
+fragment = """
+    #extension GL_EXT_texture_array : enable
+    uniform sampler2DArray images;
+    varying vec3 v_texcoord;
+    void main()
+    {
+        gl_FragColor = texture2DArray(images, v_texcoord);
+    }
+"""
+
+rows, cols, size = 4, 4, 64
+count = rows*cols
+
+# One image (layer) per cell
+X, Y = np.meshgrid(np.linspace(-1, 1, size), np.linspace(-1, 1, size))
+images = np.zeros((count, size, size, 4), np.float32)
+for i in range(count):
+    Z = np.sin((i+1)*X) * np.cos((i+1)*Y)
+    images[i,...,0] = (Z+1)/2
+    images[i,...,1] = i/float(count)
+    images[i,...,2] = 1-(Z+1)/2
+    images[i,...,3] = 1
+
+# Two triangles per cell
+V = np.zeros((count, 6), [("position", np.float32, 2),
+                          ("texcoord", np.float32, 2),
+                          ("layer",    np.float32, 1)])
+corners = np.array([(0,0), (0,1), (1,0), (1,0), (0,1), (1,1)], np.float32)
+for i in range(count):
+    x, y = i % cols, i // cols
+    V["position"][i] = -1 + 2*(corners + (x,y)) / (cols,rows) * 0.98
+    V["texcoord"][i] = corners
+    V["layer"][i] = i
+V = V.ravel().view(gloo.VertexBuffer)
+
+window = app.Window(width=512, height=512)
+
+@window.event
+def on_draw(dt):
+    window.clear()
+    program.draw(gl.GL_TRIANGLES)
+
+program = gloo.Program(vertex, fragment)
+program.bind(V)
+program['images'] = images
+program['images'].interpolation = gl.GL_LINEAR
+app.run()
@@ -0,0 +1,72 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+""" A 65536×65536 virtual texture whose tiles are computed on demand """
+import numpy as np
+from glumpy import app, gloo, gl
+from glumpy.transforms import PanZoom, Position
+
+vertex = """
+    attribute vec2 position;
+    attribute vec2 texcoord;
+    varying vec2 v_texcoord;
+    void main()
+    {
+        gl_Position = <transform>;
+        v_texcoord = texcoord;
+    }
+"""
+
+fragment = """
+    varying vec2 v_texcoord;
+    void main()
+    {
+        gl_FragColor = <texture>(v_texcoord);
+    }
+"""
+
+size, tile = 65536, 256
+
+def mandelbrot(level, row, col, iterations=128):
+    """ Tile of the Mandelbrot set covering [-2.0,0.5]×[-1.25,1.25] """
+
+    step = 2**level
+    Y, X = np.mgrid[0:tile, 0:tile] * step
+    C = ((col*tile*step + X)/size*2.5 - 2.0) + 1j*((row*tile*step + Y)/size*2.5 - 1.25)
+    Z = np.zeros_like(C)
+    N = np.zeros(C.shape, np.int32)
+    for i in range(iterations):
+        I = np.abs(Z) < 2
+        Z[I] = Z[I]*Z[I] + C[I]
+        N[I] += 1
+    V = (255*np.sqrt(N/iterations)).astype(np.uint8)
+    return np.dstack([V, V//2, 255-V])
+
+window = app.Window(width=800, height=800)
+
+@window.event
+def on_draw(dt):
+    window.clear()
+    program.draw(gl.GL_TRIANGLE_STRIP)
+
+@window.event
+def on_key_press(key, modifiers):
+    if key == app.window.key.SPACE:
+        transform.reset()
+
+program = gloo.Program(vertex, fragment, count=4)
+program['position'] = [(-1,-1), (-1,1), (1,-1), (1,1)]
+program['texcoord'] = [( 0, 1), ( 0, 0), ( 1, 1), ( 1, 0)]
+
+# Only shape and dtype of the source are used since tiles come from the loader
+source = np.broadcast_to(np.zeros(3, np.uint8), (size, size, 3))
+transform = PanZoom(Position("position"), aspect=1, zoom_max=10000)
+texture = gloo.VirtualTexture(source, tile=tile, loader=mandelbrot,
+                              transform=transform)
+program['transform'] = transform
+program['texture'] = texture
+window.attach(transform)
+window.attach(texture)
+
+app.run()
@@ -51,4 +51,6 @@ program = gloo.Program(vertex, fragment, count=4)
 program['position'] = [(-1,-1), (-1,+1), (+1,-1), (+1,+1)]
 program['texcoord'] = [( 0, 1), ( 0, 0), ( 1, 1), ( 1, 0)]
 program['frame'] = np.zeros((height,width,3), dtype=np.uint8)
+# Frames are streamed through two pixel buffers
+program['frame'].pixel_buffers = 2
 app.run()
@@ -5,8 +5,8 @@
 # Realtime signals example
 #
 # Implementation uses a ring buffer such that only new values are uploaded in
-# GPU memory. This requires the corresponding numpy array to have a
-# Fortran-like layout.
+# GPU memory. The ring buffer updates the "index" uniform (oldest row) each
+# time new values are appended.
 # -----------------------------------------------------------------------------
 import numpy as np
 from glumpy import app, gloo, gl
@@ -38,15 +38,10 @@ window = app.Window(width=1500, height=1000, color=(1,1,1,1))
 
 @window.event
 def on_draw(dt):
-    global size, count
     window.clear()
     program.draw(gl.GL_LINES, I)
-    index = int(program["index"])
-    y = program["y_value"].reshape(size,count)
-
     yscale = 1.0/count
-    y[index] = yscale * np.random.uniform(-1,+1,count)
-    program["index"] = (index + 1) % size
+    Y.append(yscale * np.random.uniform(-1,+1,count))
 
 count, size = 64, 1000
 program = gloo.Program(vertex, fragment, count=size*count)
@@ -54,7 +49,8 @@ program["size"] = size
 program["count"] = count
 program["x_index"] = np.repeat(np.arange(size),count)
 program["y_index"] = np.tile(np.arange(count),size)
-program["y_value"] = 0
+Y = np.zeros((size,count), np.float32).view(gloo.RingBuffer)
+program["y_value"] = Y
 
 # Compute indices
 I = np.arange(count * size, dtype=np.uint32).reshape(size, -1).T
@@ -12,6 +12,7 @@ import importlib
 import numpy as np
 
 from glumpy import gl
+from glumpy.gloo import resources, statistics
 from glumpy.log import log
 from glumpy.ext.inputhook import inputhook_manager, stdin_ready
 from glumpy.app.window import backends
@@ -207,6 +208,24 @@ class Window(object):
 
 
 
+# --------------------------------------------------------------- end frame ---
+def _end_frame(backend):
+    """
+    Process GPU resources of each window context (once per context, even if
+    shared by several windows) and close statistics of the frame
+    """
+
+    managers = []
+    for window in backend.windows():
+        window.activate()
+        manager = resources.get_default()
+        if not any(manager is other for other in managers):
+            managers.append(manager)
+            manager.process()
+    statistics.end_frame()
+
+
+
 # --------------------------------------------------------------- __init__ ---
 def __init__(clock=None, framerate=None, backend=None):
     """ Initialize the main loop
@@ -329,6 +348,7 @@ def run(clock=None, framerate=None, interactive=None,
         def run():
             while not stdin_ready():
                 __backend__.process(clock.tick())
+                _end_frame(__backend__)
             return 0
         inputhook_manager.set_inputhook(run)
 
@@ -342,6 +362,9 @@ def run(clock=None, framerate=None, interactive=None,
                 duration -= dt
                 framecount -= 1
                 count = __backend__.process(dt)
+                # Process GPU resources (deferred deletions, budget) and
+                # statistics once per frame
+                _end_frame(__backend__)
 
         if options.record:
             from .movie import record
@@ -0,0 +1,27 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+"""
+Benchmarks of glumpy hot paths (gloo, collections, text and geometry).
+
+Benchmarks run headless, GL calls being made against the recording mock
+backend (see :mod:`glumpy.mockgl`). For each benchmark, the best and mean
+times over several runs are recorded as well as the peak memory allocated
+during a run. Results are written as JSON such that they can be compared
+across commits.
+
+**Example usage**:
+
+  .. code:: bash
+
+     $ python -m glumpy.benchmarks --list
+     $ python -m glumpy.benchmarks -o before.json
+     $ python -m glumpy.benchmarks -o after.json --compare before.json
+     $ python -m glumpy.benchmarks "collection.*" "arraylist.*"
+"""
+from . harness import benchmark, run, compare, main
+from . import bench_gloo
+from . import bench_collections
+from . import bench_text
+from . import bench_geometry
@@ -0,0 +1,8 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import sys
+from glumpy.benchmarks import main
+
+sys.exit(main())
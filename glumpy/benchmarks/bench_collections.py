@@ -0,0 +1,83 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+""" Array lists and collections benchmarks """
+import numpy as np
+from . harness import benchmark
+from glumpy.graphics.collections.array_list import ArrayList
+from glumpy.graphics.collections.base_collection import BaseCollection
+from glumpy.graphics.collections.agg_path_collection import AggPathCollection
+
+
+vtype = [('value', 'f4', 2)]
+utype = [('value_1', 'f4', 3),
+         ('value_2', 'f4', 3)]
+itype = np.uint32
+
+
+@benchmark("arraylist.append")
+def arraylist_append():
+    L = ArrayList(dtype=np.float32)
+    data = np.zeros(3, np.float32)
+    def run():
+        for i in range(10000):
+            L.append(data)
+    return run
+
+
+@benchmark("arraylist.insert")
+def arraylist_insert():
+    L = ArrayList(np.zeros(3*1000, np.float32), itemsize=3)
+    data = np.zeros(3, np.float32)
+    def run():
+        for i in range(2000):
+            L.insert(i//2, data)
+    return run
+
+
+@benchmark("arraylist.delete")
+def arraylist_delete():
+    L = ArrayList(np.zeros(3*5000, np.float32), itemsize=3)
+    def run():
+        for i in range(2000):
+            del L[len(L)//2]
+    return run
+
+
+@benchmark("collection.append_one")
+def collection_append_one():
+    C = BaseCollection(vtype, utype, itype)
+    V = np.zeros(3, dtype=C.vtype)
+    def run():
+        for i in range(5000):
+            C.append(V, indices=[0, 1, 2])
+    return run
+
+
+@benchmark("collection.append_bulk")
+def collection_append_bulk():
+    C = BaseCollection(vtype, utype, itype)
+    V = np.zeros(3*50000, dtype=C.vtype)
+    def run():
+        C.append(V, itemsize=3, indices=[0, 1, 2])
+    return run
+
+
+@benchmark("collection.append_sizes")
+def collection_append_sizes():
+    C = BaseCollection(vtype, utype, itype)
+    V = np.zeros(3*50000, dtype=C.vtype)
+    itemsize = 3*np.ones(50000, dtype=int)
+    def run():
+        C.append(V, itemsize=itemsize)
+    return run
+
+
+@benchmark("aggpath.append", repeat=3)
+def aggpath_append():
+    C = AggPathCollection(linewidth='local', color='local')
+    P = np.random.uniform(-1, 1, (10000, 3))
+    def run():
+        C.append(P, closed=False)
+    return run
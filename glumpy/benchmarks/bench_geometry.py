@@ -0,0 +1,53 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+""" Geometry and mesh loading benchmarks """
+import os
+import tempfile
+import numpy as np
+from . harness import benchmark
+from glumpy import data
+from glumpy.geometry.normals import normals
+
+
+def grid(n):
+    """ Triangulated (n,n) height field (vertices and indices) """
+
+    X, Y = np.meshgrid(np.linspace(-1, 1, n), np.linspace(-1, 1, n))
+    Z = np.sin(4*X) * np.cos(4*Y)
+    vertices = np.dstack((X, Y, Z)).reshape(-1, 3)
+    I = np.arange(n*n).reshape(n, n)
+    A, B, C, D = I[:-1,:-1], I[:-1,1:], I[1:,:-1], I[1:,1:]
+    indices = np.concatenate((np.dstack((A, B, C)).reshape(-1, 3),
+                              np.dstack((B, D, C)).reshape(-1, 3)))
+    return vertices, indices.astype(np.uint32)
+
+
+@benchmark("geometry.normals")
+def geometry_normals():
+    vertices, indices = grid(200)
+    def run():
+        normals(vertices, indices)
+    return run
+
+
+@benchmark("data.objload", repeat=3)
+def data_objload():
+    vertices, indices = grid(150)
+    with tempfile.NamedTemporaryFile("w", suffix=".obj", delete=False) as file:
+        for x, y, z in vertices:
+            file.write("v %f %f %f\n" % (x, y, z))
+        for x, y, z in vertices:
+            file.write("vt %f %f\n" % ((x+1)/2, (y+1)/2))
+        for x, y, z in vertices:
+            file.write("vn 0 0 1\n")
+        for a, b, c in indices+1:
+            file.write("f %d/%d/%d %d/%d/%d %d/%d/%d\n" % (a,a,a, b,b,b, c,c,c))
+        filename = file.name
+    def run():
+        try:
+            data.objload(filename)
+        finally:
+            os.remove(filename)
+    return run
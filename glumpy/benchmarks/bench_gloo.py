@@ -0,0 +1,139 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+""" Shader parsing, snippets and program benchmarks """
+import os
+import numpy as np
+from . harness import benchmark
+from glumpy import gl, gloo, library
+from glumpy.gloo import parser
+
+
+def library_files(extensions):
+    """ Library shader filenames with the given extensions """
+
+    path = os.path.dirname(library.__file__)
+    filenames = []
+    for root, dirs, files in os.walk(path):
+        for filename in sorted(files):
+            if os.path.splitext(filename)[1] in extensions:
+                filenames.append(os.path.join(root, filename))
+    return sorted(filenames)
+
+
+@benchmark("parser.parse")
+def parser_parse():
+    codes = []
+    for filename in library_files((".glsl", ".vert", ".frag")):
+        code = library.get(filename)
+        try:
+            parser.parse(code)
+        except RuntimeError:
+            continue
+        codes.append(code)
+    def run():
+        for code in codes:
+            parser.parse(code)
+    return run
+
+
+@benchmark("shader.code")
+def shader_code():
+    filenames = library_files((".vert",))
+    def run():
+        for filename in filenames:
+            gloo.VertexShader(filename).code
+    return run
+
+
+@benchmark("snippet.mangled_code")
+def snippet_mangled_code():
+    filenames = library_files((".glsl",))[:40]
+    snippets = []
+    for filename in filenames:
+        try:
+            snippets.append(gloo.Snippet(library.get(filename)))
+        except Exception:
+            pass
+    def run():
+        for i in range(10):
+            for snippet in snippets:
+                snippet.mangled_code()
+    return run
+
+
+vertex = """
+uniform float scale;
+uniform vec4  color;
+attribute vec2 position;
+varying vec4 v_color;
+void main()
+{
+    v_color = color;
+    gl_Position = vec4(scale*position, 0.0, 1.0);
+}
+"""
+
+fragment = """
+varying vec4 v_color;
+void main() { gl_FragColor = v_color; }
+"""
+
+@benchmark("program.draw")
+def program_draw():
+    program = gloo.Program(vertex, fragment, count=1000)
+    program["position"] = np.random.uniform(-1, 1, (1000, 2))
+    program["color"] = 1, 0, 0, 1
+    program.draw(gl.GL_POINTS)
+    def run():
+        for i in range(1000):
+            program["scale"] = i/1000.0
+            program.draw(gl.GL_POINTS)
+    return run
+
+
+@benchmark("program.draw_indexed")
+def program_draw_indexed():
+    program = gloo.Program(vertex, fragment, count=1000)
+    program["position"] = np.random.uniform(-1, 1, (1000, 2))
+    program["color"] = 1, 0, 0, 1
+    indices = np.arange(1000, dtype=np.uint32).view(gloo.IndexBuffer)
+    program.draw(gl.GL_POINTS, indices)
+    def run():
+        for i in range(1000):
+            program["position"][i] = 0, 0
+            program.draw(gl.GL_POINTS, indices)
+    return run
+
+
+@benchmark("program.create")
+def program_create():
+    def run():
+        programs = []
+        for i in range(100):
+            program = gloo.Program(vertex, fragment, count=1000)
+            program.activate()
+            programs.append(program)
+    return run
+
+
+@benchmark("library.transforms")
+def library_transforms():
+    from glumpy.transforms import Position, PanZoom, PVMProjection, Trackball
+    def run():
+        for i in range(25):
+            PanZoom(Position())
+            PVMProjection(Position())
+            Trackball(Position())
+    return run
+
+
+@benchmark("program.uniforms")
+def program_uniforms():
+    program = gloo.Program(vertex, fragment, count=1000)
+    def run():
+        for i in range(1000):
+            program.all_uniforms
+            program.all_attributes
+    return run
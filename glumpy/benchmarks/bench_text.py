@@ -0,0 +1,33 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+""" Font loading benchmarks """
+import string
+import numpy as np
+from . harness import benchmark
+from glumpy import data
+from glumpy.gloo.atlas import Atlas
+
+
+font = "SourceSansPro-Regular.otf"
+
+
+@benchmark("font.agg.load", repeat=3)
+def agg_font_load():
+    from glumpy.graphics.text.agg_font import AggFont
+    atlas = np.zeros((1024,1024,3), np.ubyte).view(Atlas)
+    font_ = AggFont(data.get(font), 16, atlas)
+    def run():
+        font_.load(string.printable)
+    return run
+
+
+@benchmark("font.sdf.load", repeat=3)
+def sdf_font_load():
+    from glumpy.graphics.text.sdf_font import SDFFont
+    atlas = np.zeros((1024,1024), np.float32).view(Atlas)
+    font_ = SDFFont(data.get(font), atlas)
+    def run():
+        font_.load(string.ascii_letters)
+    return run
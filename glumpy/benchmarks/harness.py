@@ -0,0 +1,191 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+"""
+Benchmark harness.
+
+A benchmark is a function that prepares everything that is needed (this
+part is not measured) and returns the function to be timed. It is called
+again before each run such that runs are independent.
+"""
+import json
+import time
+import fnmatch
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import numpy as np
+
+import glumpy
+from glumpy import gl
+
+
+# Registered benchmarks (name -> (setup, repeat))
+__benchmarks__ = {}
+
+
+def benchmark(name, repeat=5):
+    """
+    Register a benchmark.
+
+    :param str name: Benchmark name (dotted names are used to group them)
+    :param int repeat: Default number of runs
+    """
+
+    def register(setup):
+        __benchmarks__[name] = setup, repeat
+        return setup
+    return register
+
+
+def _select(patterns):
+    """ Names of benchmarks matching any of the given patterns """
+
+    names = list(__benchmarks__.keys())
+    if not patterns:
+        return names
+    return [name for name in names
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+
+
+def _commit():
+    """ Current git commit (None if not available) """
+
+    try:
+        output = subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                         cwd=glumpy.__path__[0],
+                                         stderr=subprocess.DEVNULL)
+        return output.decode().strip()
+    except Exception:
+        return None
+
+
+def _measure(name, repeat=None):
+    """ Run the named benchmark and return its result """
+
+    setup, default = __benchmarks__[name]
+    try:
+        times = []
+        for i in range(repeat or default):
+            function = setup()
+            gl.recorder.clear()
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        calls = gl.recorder.count()
+
+        function = setup()
+        tracemalloc.start()
+        function()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return { "best":   min(times),
+                 "mean":   sum(times)/len(times),
+                 "repeat": len(times),
+                 "memory": peak,
+                 "calls":  calls }
+    except Exception as error:
+        tracemalloc.stop()
+        return { "error": "%s: %s" % (type(error).__name__, error) }
+
+
+def run(patterns=None, repeat=None, verbose=False):
+    """
+    Run benchmarks (using the mock GL backend, the previous backend being
+    restored afterwards) and return results.
+
+    :param list patterns: Benchmark name patterns (all if None)
+    :param int repeat: Number of runs (override benchmarks default)
+    :param bool verbose: Whether to print results as they come
+    """
+
+    results = {}
+    backend = gl.use("mock")
+    try:
+        for name in _select(patterns):
+            result = results[name] = _measure(name, repeat)
+            if verbose:
+                if "error" in result:
+                    print("%-32s %s" % (name, result["error"]))
+                else:
+                    print("%-32s %10.3f ms %10.1f kB" % (name, 1000*result["best"],
+                                                       result["memory"]/1024.0))
+    finally:
+        if backend is not None:
+            gl.use(backend)
+
+    return { "glumpy":     glumpy.__version__,
+             "commit":     _commit(),
+             "python":     platform.python_version(),
+             "numpy":      np.__version__,
+             "platform":   platform.platform(),
+             "benchmarks": results }
+
+
+def compare(before, after, threshold=0.1):
+    """
+    Compare two benchmark results and return a list of
+    (name, before, after, ratio) for benchmarks present in both, ratio
+    being the after/before ratio of best times.
+
+    :param dict before: Reference results (as returned by run)
+    :param dict after: New results (as returned by run)
+    :param float threshold: Relative change to report
+    """
+
+    changes = []
+    for name, result in after["benchmarks"].items():
+        reference = before["benchmarks"].get(name, {})
+        if "best" not in result or "best" not in reference:
+            continue
+        ratio = result["best"] / max(reference["best"], 1e-9)
+        if abs(ratio - 1) >= threshold:
+            changes.append((name, reference["best"], result["best"], ratio))
+    return changes
+
+
+def main(args=None):
+    """ Command line entry point """
+
+    parser = argparse.ArgumentParser(prog="python -m glumpy.benchmarks",
+                                     description="Run glumpy benchmarks")
+    parser.add_argument("patterns", nargs="*",
+                        help="benchmark name patterns (default is all)")
+    parser.add_argument("-l", "--list", action="store_true",
+                        help="list available benchmarks")
+    parser.add_argument("-r", "--repeat", type=int, default=None,
+                        help="number of runs for each benchmark")
+    parser.add_argument("-o", "--output", default=None,
+                        help="JSON file to write results to")
+    parser.add_argument("-c", "--compare", default=None,
+                        help="JSON file of reference results")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1,
+                        help="relative change to report when comparing")
+    options = parser.parse_args(args)
+
+    if options.list:
+        for name in _select(options.patterns):
+            print(name)
+        return 0
+
+    results = run(options.patterns, options.repeat, verbose=True)
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as file:
+            reference = json.load(file)
+        changes = compare(reference, results, options.threshold)
+        if changes:
+            print()
+        for name, before, after, ratio in changes:
+            print("%-32s %10.3f ms -> %10.3f ms (x%.2f)"
+                  % (name, 1000*before, 1000*after, ratio))
+
+    errors = [name for name, result in results["benchmarks"].items()
+              if "error" in result]
+    return 1 if errors and len(errors) == len(results["benchmarks"]) else 0
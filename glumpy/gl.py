@@ -2,32 +2,133 @@
 # Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
 # Distributed under the (new) BSD License.
 # -----------------------------------------------------------------------------
+"""
+GL API used by glumpy.
+
+The backend is selected through the ``GLUMPY_GL`` environment variable and
+defaults to PyOpenGL. The ``mock`` backend (see :mod:`glumpy.mockgl`) does
+not need any GL context and records all GL calls instead.
+"""
+import os
 import ctypes
+import importlib
 from glumpy.log import log
 
-import OpenGL
-OpenGL.ERROR_ON_COPY = True
-# -> if set to a True value before importing the numpy/lists support modules,
-#    will cause array operations to raise OpenGL.error.CopyError if the
-#    operation would cause a data-copy in order to make the passed data-type
-#    match the target data-type.
-
-from OpenGL.plugins import FormatHandler
-FormatHandler( 'glumpy',
-               'OpenGL.arrays.numpymodule.NumpyHandler',[
-                   'glumpy.gloo.buffer.VertexBuffer',
-                   'glumpy.gloo.buffer.IndexBuffer',
-                   'glumpy.gloo.atlas.Atlas',
-                   'glumpy.gloo.texture.Texture2D',
-                   'glumpy.gloo.texture.Texture1D',
-                   'glumpy.gloo.texture.FloatTexture2D',
-                   'glumpy.gloo.texture.FloatTexture1D',
-                   'glumpy.gloo.texture.TextureCube',
-               ])
-
-
-
-from OpenGL import contextdata
+
+# Current backend ("pyopengl" or "mock")
+__backend__ = None
+
+# Names defined by the current backend
+__names__ = set()
+
+
+def _pyopengl():
+    """ Namespace of the PyOpenGL backend """
+
+    import OpenGL
+    OpenGL.ERROR_ON_COPY = True
+    # -> if set to a True value before importing the numpy/lists support modules,
+    #    will cause array operations to raise OpenGL.error.CopyError if the
+    #    operation would cause a data-copy in order to make the passed data-type
+    #    match the target data-type.
+
+    from OpenGL.plugins import FormatHandler
+    FormatHandler( 'glumpy',
+                   'OpenGL.arrays.numpymodule.NumpyHandler',[
+                       'glumpy.gloo.buffer.VertexBuffer',
+                       'glumpy.gloo.buffer.IndexBuffer',
+                       'glumpy.gloo.atlas.Atlas',
+                       'glumpy.gloo.texture.Texture2D',
+                       'glumpy.gloo.texture.Texture1D',
+                       'glumpy.gloo.texture.FloatTexture2D',
+                       'glumpy.gloo.texture.FloatTexture1D',
+                       'glumpy.gloo.texture.TextureCube',
+                   ])
+
+    namespace = {}
+    for name in ("OpenGL.GL",
+                 "OpenGL.GL.EXT.geometry_shader4",
+                 "OpenGL.GL.NV.geometry_program4",
+                 "OpenGL.GL.ARB.texture_rg"):
+        module = importlib.import_module(name)
+        names = getattr(module, "__all__", None) or dir(module)
+        namespace.update((key, getattr(module, key))
+                         for key in names if not key.startswith("_"))
+
+    from OpenGL import contextdata
+    namespace["contextdata"] = contextdata
+
+    # Patch: pythonize the glGetActiveAttrib
+    _glGetActiveAttrib = namespace["glGetActiveAttrib"]
+    def glGetActiveAttrib(program, index):
+        # Prepare
+        bufsize = 32
+        length = ctypes.c_int()
+        size = ctypes.c_int()
+        type = ctypes.c_int()
+        name = ctypes.create_string_buffer(bufsize)
+        # Call
+        _glGetActiveAttrib(program, index,
+                           bufsize, ctypes.byref(length), ctypes.byref(size),
+                           ctypes.byref(type), name)
+        # Return Python objects
+        return name.value, size.value, type.value
+    namespace["glGetActiveAttrib"] = glGetActiveAttrib
+
+    return namespace
+
+
+def _mock():
+    """ Namespace of the mock backend """
+
+    from glumpy import mockgl
+    namespace = { name: getattr(mockgl, name) for name in mockgl.__all__ }
+    namespace["mockgl"] = mockgl
+    return namespace
+
+
+def use(backend):
+    """
+    Select the GL backend and return the previous one (None if there was
+    none), such that it can be restored afterwards.
+
+    :param str backend: "pyopengl" or "mock"
+
+    .. note::
+
+       The backend must be selected before any GL object has been created.
+    """
+
+    global __backend__, __names__
+
+    previous = __backend__
+    backend = backend.lower()
+    if backend == "pyopengl":
+        namespace = _pyopengl()
+    elif backend == "mock":
+        namespace = _mock()
+    else:
+        raise ValueError("Unknown GL backend (%s)" % backend)
+
+    for name in __names__:
+        globals().pop(name, None)
+    globals().update(namespace)
+    __names__ = set(namespace.keys())
+    if __backend__ is not None and backend != __backend__:
+        log.info("Using %s GL backend" % backend)
+    __backend__ = backend
+    return previous
+
+
+def __getattr__(name):
+    """ The mock backend creates (recording) GL functions on demand """
+
+    if __backend__ == "mock":
+        from glumpy import mockgl
+        return getattr(mockgl, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
 def cleanupCallback( context=None ):
     """Create a cleanup callback to clear context-specific storage for the current context"""
     def callback( context = contextdata.getContext( context ) ):
@@ -35,27 +136,8 @@ def cleanupCallback( context=None ):
         contextdata.cleanupContext( context )
     return callback
 
-from OpenGL.GL import *
-from OpenGL.GL.EXT.geometry_shader4 import *
-from OpenGL.GL.NV.geometry_program4 import *
-from OpenGL.GL.ARB.texture_rg import *
-
-
-# Patch: pythonize the glGetActiveAttrib
-_glGetActiveAttrib = glGetActiveAttrib
-def glGetActiveAttrib(program, index):
-    # Prepare
-    bufsize = 32
-    length = ctypes.c_int()
-    size = ctypes.c_int()
-    type = ctypes.c_int()
-    name = ctypes.create_string_buffer(bufsize)
-    # Call
-    _glGetActiveAttrib(program, index,
-                       bufsize, ctypes.byref(length), ctypes.byref(size),
-                       ctypes.byref(type), name)
-    # Return Python objects
-    return name.value, size.value, type.value
+
+use(os.environ.get("GLUMPY_GL", "pyopengl"))
 
 
 # # --- Wrapper ---
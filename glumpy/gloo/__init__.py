@@ -2,7 +2,10 @@
 # Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
 # Distributed under the (new) BSD License.
 # -----------------------------------------------------------------------------
+from . import resources
+from . import cache
 from . atlas import Atlas
+from . virtual import VirtualTexture
 from . snippet import Snippet
 from . program import Program
 from . gpudata import GPUData
@@ -11,12 +14,18 @@ from . variable import Variable, Attribute, Uniform
 from . uniforms import Uniforms
 from . texture import Texture
 from . texture import TextureCube
-from . texture import Texture1D, Texture2D
+from . texture import Texture1D, Texture2D, Texture2DArray
 from . texture import TextureFloat1D, TextureFloat2D
+from . texture import TextureHalf1D, TextureHalf2D
 from . texture import DepthTexture
 from . array import VertexArray
 from . buffer import Buffer
-from . buffer import VertexBuffer, IndexBuffer
+from . buffer import VertexBuffer, IndexBuffer, RingBuffer
+from . buffer import UniformBuffer, std140
+from . pool import BufferPool
+from . resources import ResourceManager
+from . cache import ProgramCache
+from . statistics import stats
 from . shader import Shader
 from . shader import VertexShader, FragmentShader, GeometryShader
 from . framebuffer import FrameBuffer
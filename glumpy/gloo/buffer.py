@@ -19,13 +19,133 @@ Read more on buffer objects on `OpenGL Wiki
               ("color",    np.float32, 4)]
      V = np.zeros(4,dtype).view(gloo.VertexBuffer)
 
+**Compact attributes**:
+
+  Float attributes can be fed with half float or integer fields, the latter
+  being normalized to [0,1] (unsigned) or [-1,1] (signed) by default:
+
+  .. code:: python
+
+     dtype = [("position", np.float16, 3),
+              ("normal",   np.int16,   3),
+              ("color",    np.uint8,   4)]
+     V = np.zeros(4,dtype).view(gloo.VertexBuffer)
+
+**Streaming**:
+
+  Buffers that are rewritten every frame may stall the pipeline when the GPU
+  is still reading the previous content. Two (possibly combined) strategies
+  are available to avoid this:
+
+  .. code:: python
+
+     # Full rewrites re-specify (orphan) the storage
+     V.usage = gl.GL_STREAM_DRAW
+
+     # Storage is split into 3 regions that are written in turn, the offset
+     # used for drawing being updated transparently.
+     V.regions = 3
+
+**Instances**:
+
+  A vertex buffer holding per-instance data (divisor of 1) makes attributes
+  advance once per instance instead of once per vertex:
+
+  .. code:: python
+
+     I = np.zeros(1000, [("offset", np.float32, 2)]).view(gloo.VertexBuffer)
+     I.divisor = 1
+     program.bind(I)
+     program.draw(gl.GL_TRIANGLES, indices, instances=len(I))
+
+**Ring buffer**:
+
+  A ring buffer is a vertex buffer whose first axis is used circularly, which
+  is the canonical layout for scrolling time series. Only appended rows are
+  uploaded and the head (index of the oldest row) is set automatically on the
+  ``index`` uniform of the programs the buffer is attached to.
+
+  .. code:: python
+
+     Y = np.zeros((size, count), np.float32).view(gloo.RingBuffer)
+     program["y_value"] = Y
+     ...
+     Y.append(np.random.uniform(-1, +1, count))
+
+**Uniform buffer**:
+
+  A uniform buffer holds the values of a uniform block using the std140
+  layout, which can be built from the block member declarations. It is
+  uploaded once (when modified) and bound to the block of every program it
+  is assigned to.
+
+  .. code:: python
+
+     # layout(std140) uniform Transform { vec2 pan; vec2 zoom; mat4 model; };
+     U = np.zeros(1, std140([("pan",  "vec2"),
+                             ("zoom", "vec2"),
+                             ("model","mat4")])).view(gloo.UniformBuffer)
+     program1["Transform"] = U
+     program2["Transform"] = U
+     U["zoom"] = 2
 """
 import numpy as np
 
 from glumpy import gl
 from glumpy.log import log
-from glumpy.gloo.gpudata import GPUData
+from glumpy.gloo.gpudata import GPUData, merge_range
 from glumpy.gloo.globject import GLObject
+from glumpy.gloo import statistics
+
+
+# std140 base types (GLSL type -> (dtype, shape, base alignment))
+_std140_types = {
+    "float": (np.float32, (),     4), "vec2":  (np.float32, (2,),   8),
+    "vec3":  (np.float32, (3,),  16), "vec4":  (np.float32, (4,),  16),
+    "int":   (np.int32,   (),     4), "ivec2": (np.int32,   (2,),   8),
+    "ivec3": (np.int32,   (3,),  16), "ivec4": (np.int32,   (4,),  16),
+    "uint":  (np.uint32,  (),     4), "uvec2": (np.uint32,  (2,),   8),
+    "uvec3": (np.uint32,  (3,),  16), "uvec4": (np.uint32,  (4,),  16),
+    "bool":  (np.int32,   (),     4), "bvec2": (np.int32,   (2,),   8),
+    "bvec3": (np.int32,   (3,),  16), "bvec4": (np.int32,   (4,),  16),
+    "mat2":  (np.float32, (2,4), 16), "mat3":  (np.float32, (3,4), 16),
+    "mat4":  (np.float32, (4,4), 16) }
+
+
+def std140(members):
+    """
+    Numpy dtype corresponding to the std140 layout of a uniform block.
+
+    :param list members: Block members as (name, GLSL type). Array elements
+                         are given individually (as "name[i]"), as they are
+                         returned by the GLSL parser.
+
+    .. note::
+
+       Matrix columns are padded to four components (as in the std140
+       layout), i.e. mat2 and mat3 fields have shape (2,4) and (3,4).
+    """
+
+    names, formats, offsets = [], [], []
+    offset = 0
+    for name, gtype in members:
+        if gtype not in _std140_types.keys():
+            raise TypeError("Unknown uniform block member type (%s)" % gtype)
+        dtype, shape, alignment = _std140_types[gtype]
+        # Array elements are aligned on (and padded to) 16 bytes
+        array = "[" in name
+        if array:
+            alignment = 16
+        offset = (offset + alignment - 1) // alignment * alignment
+        names.append(name)
+        formats.append((dtype, shape))
+        offsets.append(offset)
+        offset += np.dtype((dtype, shape)).itemsize
+        if array:
+            offset = (offset + 15) // 16 * 16
+    itemsize = max((offset + 15) // 16 * 16, 16)
+    return np.dtype({ "names": names, "formats": formats,
+                      "offsets": offsets, "itemsize": itemsize })
 
 
 class Buffer(GPUData,GLObject):
@@ -40,6 +160,12 @@ class Buffer(GPUData,GLObject):
         GLObject.__init__(self)
         self._target = target
         self._usage = usage
+        self._regions = 1
+        self._region = 0
+        self._region_ranges = [[]]
+        self._pool = None
+        self._arena = None
+        self._pool_offset = 0
 
 
     @property
@@ -49,46 +175,201 @@ class Buffer(GPUData,GLObject):
         return self.pending_data is not None
 
 
+    @property
+    def _resource(self):
+        """ Pooled buffers are accounted for by their arena """
+
+        return "buffer" if self._pool is None else None
+
+
+    @property
+    def gpu_nbytes(self):
+        """ Number of bytes used on GPU """
+
+        if self._pool is not None:
+            return 0
+        return self._regions * self.nbytes
+
+
+    @property
+    def usage(self):
+        """
+        Buffer usage hint (read/write), one of gl.GL_STATIC_DRAW,
+        gl.GL_DYNAMIC_DRAW or gl.GL_STREAM_DRAW. In the latter case, full
+        rewrites of the buffer orphan the previous storage instead of
+        waiting for the GPU to release it.
+        """
+
+        if isinstance(self.base, Buffer):
+            return self.base.usage
+        return self._usage
+
+    @usage.setter
+    def usage(self, value):
+        """ Buffer usage hint """
+
+        if isinstance(self.base, Buffer):
+            self.base.usage = value
+        elif value != self._usage:
+            self._usage = value
+            self._reallocate()
+
+
+    @property
+    def regions(self):
+        """
+        Number of regions the GPU storage is made of (read/write). When
+        greater than one, each update writes into the next region (ring
+        buffer) such that the GPU may still read the previous ones.
+        """
+
+        if isinstance(self.base, Buffer):
+            return self.base.regions
+        return self._regions
+
+    @regions.setter
+    def regions(self, value):
+        """ Number of regions the GPU storage is made of """
+
+        if isinstance(self.base, Buffer):
+            self.base.regions = value
+        elif max(int(value),1) != self._regions:
+            self._regions = max(int(value),1)
+            self._reallocate()
+
+
+    @property
+    def pool(self):
+        """ Buffer pool this buffer is allocated from (if any) """
+
+        if isinstance(self.base, Buffer):
+            return self.base.pool
+        return self._pool
+
+
+    @property
+    def offset(self):
+        """
+        Byte offset in the GPU buffer (pool allocation and current region
+        included).
+        """
+
+        base = self.base if isinstance(self.base, Buffer) else self
+        return (self._extents[0] + base._pool_offset +
+                base._region * base.nbytes)
+
+
+    @property
+    def _storage(self):
+        """
+        Creation number of the GL buffer holding data (pooled buffers use
+        the one of their arena), which changes whenever the buffer is
+        deleted and created again even if its GL name is re-used.
+        """
+
+        base = self.base if isinstance(self.base, Buffer) else self
+        if base._arena is not None:
+            return base._arena._creation
+        return base._creation
+
+
+    def _invalidate(self):
+        """ Mark GPU storage to be (re-)created and fully re-uploaded """
+
+        self._region = 0
+        self._region_ranges = [[[0, self.nbytes]] for i in range(self._regions)]
+        self._add_pending_data(0, self.nbytes)
+        self._need_create = True
+
+
+    def _reallocate(self):
+        """ Mark GPU storage to be re-allocated and re-uploaded """
+
+        if self._pool is not None:
+            pool = self._pool
+            pool.free(self)
+            pool.allocate(self)
+        else:
+            self._invalidate()
+
+
     def _create(self):
         """ Create buffer on GPU """
 
-        self._handle = gl.glGenBuffers(1)
+        # Pooled buffer: storage is part of a (shared) arena
+        if self._pool is not None:
+            if self._arena is None:
+                self._pool.allocate(self)
+            self._arena.activate()
+            self._handle = self._arena.handle
+            log.debug("GPU: Allocating buffer (id=%d) from pool" % self._id)
+            return
+
+        if self._handle < 0:
+            self._handle = gl.glGenBuffers(1)
+            self._created()
         self._activate()
         log.debug("GPU: Creating buffer (id=%d)" % self._id)
-        gl.glBufferData(self._target, self.nbytes, None, self._usage)
+        gl.glBufferData(self._target, self._regions*self.nbytes, None, self._usage)
         self._deactivate()
 
 
     def _delete(self):
         """ Delete buffer from GPU """
 
-        if self._handle > -1:
+        if self._pool is not None:
+            self._pool.free(self)
+        elif self._handle > -1:
             gl.glDeleteBuffers(1, np.array([self._handle]))
+        self._invalidate()
 
 
     def _activate(self):
         """ Bind the buffer to some target """
 
-        log.debug("GPU: Activating buffer (id=%d)" % self._id)
+        statistics.count(self, "buffer_binds")
         gl.glBindBuffer(self._target, self._handle)
 
 
     def _deactivate(self):
         """ Unbind the current bound buffer """
 
-        log.debug("GPU: Deactivating buffer (id=%d)" % self._id)
         gl.glBindBuffer(self._target, 0)
 
 
     def _update(self):
         """ Upload all pending data to GPU. """
 
-        if self.pending_data:
-            start, stop = self.pending_data
-            offset, nbytes = start, stop-start
-            # offset, nbytes = self.pending_data
-            data = self.ravel().view(np.ubyte)[offset:offset+nbytes]
-            gl.glBufferSubData(self.target, offset, nbytes, data)
+        ranges = self.pending_ranges
+        if ranges:
+            data = self.ravel().view(np.ubyte)
+
+            # Ring buffer: every region misses what has just changed and we
+            # only upload into the next region what it misses.
+            if self._regions > 1:
+                for region_ranges in self._region_ranges:
+                    for start, stop in ranges:
+                        merge_range(region_ranges, start, stop,
+                                    self._merge_threshold, self._max_ranges)
+                self._region = (self._region + 1) % self._regions
+                ranges = self._region_ranges[self._region]
+                self._region_ranges[self._region] = []
+
+            # Streaming full rewrite: orphan the previous storage
+            if (self._usage == gl.GL_STREAM_DRAW and self._regions == 1
+                and self._pool is None
+                and len(ranges) == 1 and tuple(ranges[0]) == (0, self.nbytes)):
+                gl.glBufferData(self.target, self.nbytes, data, self._usage)
+                statistics.count(self, "uploads")
+                statistics.count(self, "uploaded", self.nbytes)
+            else:
+                base = self._pool_offset + self._region * self.nbytes
+                for start, stop in ranges:
+                    offset, nbytes = start, stop-start
+                    gl.glBufferSubData(self.target, base+offset, nbytes,
+                                       data[offset:offset+nbytes])
+                    statistics.count(self, "uploads")
+                    statistics.count(self, "uploaded", nbytes)
         self._pending_data = None
         self._need_update = False
 
@@ -99,6 +380,30 @@ class VertexBuffer(Buffer):
 
     def __init__(self, usage=gl.GL_DYNAMIC_DRAW):
         Buffer.__init__(self, gl.GL_ARRAY_BUFFER, usage)
+        self._divisor = 0
+
+
+    @property
+    def divisor(self):
+        """
+        Number of consecutive instances using each item when drawing
+        instances (read/write). Default (0) is per-vertex data while 1 makes
+        the buffer hold per-instance data (e.g. instance positions or
+        colors).
+        """
+
+        if isinstance(self.base, VertexBuffer):
+            return self.base.divisor
+        return self._divisor
+
+    @divisor.setter
+    def divisor(self, value):
+        """ Number of consecutive instances using each item """
+
+        if isinstance(self.base, VertexBuffer):
+            self.base.divisor = value
+        else:
+            self._divisor = max(int(value), 0)
 
 
 class IndexBuffer(Buffer):
@@ -106,3 +411,125 @@ class IndexBuffer(Buffer):
 
     def __init__(self, usage=gl.GL_DYNAMIC_DRAW):
         Buffer.__init__(self, gl.GL_ELEMENT_ARRAY_BUFFER, usage)
+
+
+
+class UniformBuffer(Buffer):
+    """ Buffer for uniform block data (see :func:`std140`) """
+
+    def __init__(self, usage=gl.GL_DYNAMIC_DRAW):
+        Buffer.__init__(self, gl.GL_UNIFORM_BUFFER, usage)
+
+
+    def bind(self, index):
+        """
+        Upload pending data (if any) and bind the buffer to the given
+        uniform buffer binding point.
+        """
+
+        self.activate()
+        gl.glBindBufferBase(gl.GL_UNIFORM_BUFFER, index, self.handle)
+
+
+
+class RingBuffer(VertexBuffer):
+    """
+    Vertex buffer whose first axis is used circularly.
+
+    Rows are appended at the head position, wrapping around the end of the
+    buffer such that an append uploads at most two contiguous ranges. The
+    head (index of the next row to be written, i.e. the oldest row) is
+    pushed to the attached programs using the uniform name given by the
+    `uniform` property (default is "index").
+    """
+
+    def __init__(self, usage=gl.GL_DYNAMIC_DRAW):
+        VertexBuffer.__init__(self, usage)
+        self._head = 0
+        self._uniform = "index"
+        self._programs = []
+
+
+    @property
+    def head(self):
+        """ Index of the next row to be written (oldest row) """
+
+        if isinstance(self.base, RingBuffer):
+            return self.base.head
+        return self._head
+
+
+    @property
+    def uniform(self):
+        """ Name of the uniform receiving the head index (read/write) """
+
+        if isinstance(self.base, RingBuffer):
+            return self.base.uniform
+        return self._uniform
+
+    @uniform.setter
+    def uniform(self, value):
+        """ Name of the uniform receiving the head index """
+
+        if isinstance(self.base, RingBuffer):
+            self.base.uniform = value
+        else:
+            self._uniform = value
+            self._update_programs()
+
+
+    def attach(self, program):
+        """ Attach a program that will receive the head index """
+
+        if isinstance(self.base, RingBuffer):
+            self.base.attach(program)
+        elif program not in self._programs:
+            self._programs.append(program)
+            self._update_programs()
+
+
+    def detach(self, program):
+        """ Detach a program """
+
+        if isinstance(self.base, RingBuffer):
+            self.base.detach(program)
+        elif program in self._programs:
+            self._programs.remove(program)
+
+
+    def _update_programs(self):
+        """ Push head index to attached programs """
+
+        for program in self._programs:
+            if self._uniform in program._uniforms.keys():
+                program[self._uniform] = self._head
+
+
+    def append(self, rows):
+        """
+        Append one or several rows at head position (wrapping around).
+
+        :param array rows: A single row (shape is self.shape[1:]) or several
+                           rows (shape is (n,)+self.shape[1:])
+        """
+
+        if isinstance(self.base, RingBuffer):
+            raise ValueError("Cannot append to a view of a ring buffer")
+
+        rows = np.asarray(rows)
+        if rows.ndim < self.ndim:
+            rows = rows.reshape((1,) + self.shape[1:])
+        size, count = len(self), len(rows)
+
+        # Only the last size rows would survive anyway
+        if count > size:
+            self._head = (self._head + count - size) % size
+            rows, count = rows[-size:], size
+
+        head = self._head
+        first = min(count, size - head)
+        self[head:head+first] = rows[:first]
+        if count > first:
+            self[:count-first] = rows[first:]
+        self._head = (head + count) % size
+        self._update_programs()
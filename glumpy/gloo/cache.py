@@ -0,0 +1,290 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+"""
+The program cache indexes compiled shaders and linked programs of a GL
+context by their final source code (version directive included), such that
+shaders and programs having identical sources share a single GL object. An
+application made of many similar views or filters thus compiles and links
+each distinct program only once. A cached object is deleted once it is not
+used anymore.
+
+Linked programs can also be stored on disk (as program binaries, if
+supported by the driver) to speed up next runs. Binaries are keyed by
+driver (vendor, renderer and version) and programs are transparently
+compiled and linked from sources when a binary is rejected. The binary
+cache is disabled by default and can be enabled by setting the
+``GLUMPY_PROGRAM_CACHE`` environment variable or the module ``directory``
+to the directory where binaries are to be stored.
+
+**Example usage**:
+
+  .. code:: python
+
+     gloo.cache.directory = os.path.expanduser("~/.cache/glumpy")
+     ...
+     cache = gloo.cache.get_default()
+     print(cache.hits, cache.misses, cache.loads)
+"""
+import os
+import hashlib
+import weakref
+import numpy as np
+
+from glumpy import gl
+from glumpy.log import log
+from glumpy.gloo import resources
+
+
+# Program caches per context
+__caches__ = {}
+
+# Directory where program binaries are stored (None means no binary cache)
+directory = os.environ.get("GLUMPY_PROGRAM_CACHE", None)
+
+
+
+class Entry(object):
+    """
+    Cached GL object record (kind, handle, users and last program object
+    that used it). Program entries also shadow the state of the GL program
+    shared by their users: last uploaded uniform values (location -> value)
+    and uniform block bindings (name -> binding point).
+    """
+
+    __slots__ = ["kind", "handle", "users", "owner", "uniforms", "blocks"]
+
+    def __init__(self, kind, handle):
+        self.kind = kind
+        self.handle = handle
+        self.users = {}
+        self.owner = None
+        self.uniforms = {}
+        self.blocks = {}
+
+
+
+class ProgramCache(object):
+    """
+    Compiled shaders and linked programs living in a GL context.
+
+    :param str directory: Directory where program binaries are stored
+                          (None means binaries are not stored)
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._entries = {}
+        self._manager = resources.get_default()
+        self._driver = None
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+
+
+    @property
+    def directory(self):
+        """ Directory where program binaries are stored (read/write) """
+
+        return self._directory
+
+    @directory.setter
+    def directory(self, value):
+        """ Directory where program binaries are stored """
+
+        self._directory = value
+
+
+    @property
+    def hits(self):
+        """ Number of shaders and programs found in cache """
+
+        return self._hits
+
+
+    @property
+    def misses(self):
+        """ Number of shaders and programs compiled or linked """
+
+        return self._misses
+
+
+    @property
+    def loads(self):
+        """ Number of programs loaded from binaries """
+
+        return self._loads
+
+
+    def __len__(self):
+        """ Number of cached shaders and programs """
+
+        return len(self._entries)
+
+
+    def key(self, *sources):
+        """ Key of an object built from given sources """
+
+        sha = hashlib.sha1()
+        for source in sources:
+            sha.update(str(source).encode())
+            sha.update(b"\0")
+        return sha.hexdigest()
+
+
+    def acquire(self, key, obj):
+        """
+        Get the cached entry with the given key (None if not cached),
+        obj becoming one of its users.
+        """
+
+        entry = self._entries.get(key, None)
+        if entry is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._attach(key, entry, obj)
+        return entry
+
+
+    def store(self, key, kind, handle, obj):
+        """ Cache a new object (kind, handle) used by obj """
+
+        entry = Entry(kind, handle)
+        self._entries[key] = entry
+        self._attach(key, entry, obj)
+        return entry
+
+
+    def release(self, key, obj):
+        """
+        Object does not use the cached entry anymore, which is deleted if
+        it has no other user. This must be called when the GL context is
+        current.
+        """
+
+        entry = self._entries.get(key, None)
+        if entry is None:
+            return
+        entry.users.pop(id(obj), None)
+        if not entry.users:
+            del self._entries[key]
+            log.debug("GPU: Deleting cached %s (handle=%d)" % (entry.kind, entry.handle))
+            resources.ResourceManager._deleters[entry.kind](entry.handle)
+
+
+    def load(self, key, handle):
+        """
+        Load the program binary with the given key into the given program
+        handle and return whether the program is linked.
+        """
+
+        filename = self._filename(key)
+        if filename is None or not os.path.exists(filename):
+            return False
+        try:
+            data = np.fromfile(filename, dtype=np.ubyte)
+            format = int(data[:4].view(np.uint32)[0])
+            binary = data[4:]
+            gl.glProgramBinary(handle, format, binary, len(binary))
+            linked = gl.glGetProgramiv(handle, gl.GL_LINK_STATUS)
+        except Exception as error:
+            log.debug("Cannot load program binary (%s)" % error)
+            linked = False
+        if not linked:
+            log.debug("Program binary has been rejected (%s)" % filename)
+            self._remove(filename)
+            return False
+        self._loads += 1
+        return True
+
+
+    def save(self, key, handle):
+        """ Save the binary of the given (linked) program handle """
+
+        filename = self._filename(key)
+        if filename is None:
+            return
+        try:
+            length = gl.glGetProgramiv(handle, gl.GL_PROGRAM_BINARY_LENGTH)
+            if not length:
+                return
+            binary = np.zeros(length, dtype=np.ubyte)
+            size = np.zeros(1, dtype=np.int32)
+            format = np.zeros(1, dtype=np.uint32)
+            gl.glGetProgramBinary(handle, length, size, format, binary)
+        except Exception as error:
+            log.debug("Cannot get program binary (%s)" % error)
+            return
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            temp = "%s.%d" % (filename, os.getpid())
+            with open(temp, "wb") as file:
+                file.write(format.tobytes())
+                file.write(binary[:int(size[0])].tobytes())
+            os.replace(temp, filename)
+        except OSError as error:
+            log.warning("Cannot save program binary (%s)" % error)
+
+
+    def clear(self):
+        """ Remove program binaries of the cache directory """
+
+        if self._directory is None or not os.path.isdir(self._directory):
+            return
+        for filename in os.listdir(self._directory):
+            if filename.endswith(".bin"):
+                self._remove(os.path.join(self._directory, filename))
+
+
+    def _filename(self, key):
+        """ Binary filename for given program key (None if no directory) """
+
+        if self._directory is None:
+            return None
+
+        # Binaries are only valid for the driver that produced them
+        if self._driver is None:
+            self._driver = self.key(*[gl.glGetString(name) for name in
+                                      (gl.GL_VENDOR, gl.GL_RENDERER, gl.GL_VERSION)])
+        return os.path.join(self._directory, "%s.bin" % self.key(self._driver, key))
+
+
+    def _remove(self, filename):
+        """ Remove a binary file (if possible) """
+
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+
+    def _attach(self, key, entry, obj):
+        """ Register obj as a user of entry """
+
+        release = lambda ref, key=key, id=id(obj): self._collect(key, id)
+        entry.users[id(obj)] = weakref.ref(obj, release)
+
+
+    def _collect(self, key, id):
+        """ A user has been garbage collected """
+
+        entry = self._entries.get(key, None)
+        if entry is None:
+            return
+        entry.users.pop(id, None)
+        if not entry.users:
+            # There is no guarantee a GL context is current
+            del self._entries[key]
+            self._manager.defer(entry.kind, entry.handle)
+
+
+
+def get_default():
+    """ Get the program cache for the current GL context """
+
+    context = resources.get_current_context()
+    if context not in __caches__.keys():
+        __caches__[context] = ProgramCache(directory)
+    return __caches__[context]
@@ -45,6 +45,8 @@ class RenderBuffer(GLObject):
     :param int height:    Buffer height (pixel)
     """
 
+    _resource = "renderbuffer"
+
     def __init__(self, width, height, format):
         GLObject.__init__(self)
         self._width = width
@@ -67,6 +69,13 @@ class RenderBuffer(GLObject):
         return self._height
 
 
+    @property
+    def gpu_nbytes(self):
+        """ Number of bytes used on GPU (assuming 4 bytes per pixel) """
+
+        return 4 * self._width * self._height
+
+
     def resize(self, width, height):
         """ Resize the buffer (deferred operation).
 
@@ -90,7 +99,8 @@ class RenderBuffer(GLObject):
         """ Delete buffer from GPU """
 
         log.debug("GPU: Deleting render buffer")
-        gl.glDeleteRenderbuffer(self._handle)
+        if self._handle > -1:
+            gl.glDeleteRenderbuffers(1, np.array([self._handle]))
 
 
     def _activate(self):
@@ -178,6 +188,8 @@ class FrameBuffer(GLObject):
     :param StencilBuffer stencil: A stencil buffer or None
     """
 
+    _resource = "framebuffer"
+
     def __init__(self, color=None, depth=None, stencil=None):
         """
         """
@@ -404,6 +416,8 @@ class FrameBuffer(GLObject):
                                              gl.GL_RENDERBUFFER, buffer.handle)
                 buffer.deactivate()
             elif isinstance(buffer, Texture2D):
+                # Texture content lives on GPU only, it cannot be evicted
+                buffer._pinned = True
                 buffer.activate()
                 # INFO: 0 is for mipmap level 0 (default) of the texture
                 gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, attachment,
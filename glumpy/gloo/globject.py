@@ -2,6 +2,9 @@
 # Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
 # Distributed under the (new) BSD License.
 # -----------------------------------------------------------------------------
+from glumpy.gloo import resources
+from glumpy.gloo import statistics
+
 
 class GLObject(object):
     """ Generic GL object that may live both on CPU and GPU """
@@ -9,6 +12,23 @@ class GLObject(object):
     # Internal id counter to keep track of GPU objects
     _idcount = 0
 
+    # Internal creation counter to identify GPU objects (the GL name of a
+    # deleted object may be re-used when another one is created)
+    _createcount = 0
+    _creation = 0
+
+    # Kind of GPU resource (for accounting, None means not accounted)
+    _resource = None
+
+    # Resource manager the object is registered with
+    _manager = None
+
+    # Whether object can be evicted from GPU memory
+    _pinned = False
+
+    # Statistics counters (created at first count)
+    _stats = None
+
     def __init__(self):
         """ Initialize the object in the default state """
 
@@ -69,10 +89,18 @@ class GLObject(object):
         return self._need_delete
 
 
+    @property
+    def gpu_nbytes(self):
+        """ Number of bytes used on GPU """
+        return 0
+
+
     def delete(self):
         """ Delete the object from GPU memory """
 
         #if self.need_delete:
+        if self._manager is not None:
+            self._manager.unregister(self)
         self._delete()
         self._handle = -1
         self._need_setup = True
@@ -91,6 +119,11 @@ class GLObject(object):
         if self.need_create:
             self._create()
             self._need_create = False
+            if self._resource is not None:
+                resources.get_default().register(self)
+
+        if self._manager is not None:
+            self._manager.touch(self)
 
         self._activate()
 
@@ -99,6 +132,7 @@ class GLObject(object):
             self._need_setup = False
 
         if self.need_update:
+            statistics.count(self, "updates")
             self._update()
             self._need_update = False
 
@@ -133,6 +167,13 @@ class GLObject(object):
         #return self._handle
 
 
+    def _created(self):
+        """ Record the creation of a new GL object (name) """
+
+        GLObject._createcount += 1
+        self._creation = GLObject._createcount
+
+
     def _create(self):
         """ Dummy create method """
 
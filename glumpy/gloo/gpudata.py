@@ -4,31 +4,120 @@
 # -----------------------------------------------------------------------------
 """
 GPU data is the base class for any data that needs to co-exist on both CPU and
-GPU memory. It keeps track of the smallest contiguous area that needs to be
-uploaded to GPU to keep the CPU and GPU data synced. This allows to update the
-data in one operation. Even though this might be sub-optimal in a few cases, it
-provides a greater usage flexibility and most of the time, it will be faster.
+GPU memory. It keeps track of the areas that need to be uploaded to GPU to keep
+the CPU and GPU data synced as a sorted set of disjoint byte ranges. Ranges
+separated by less than `merge_threshold` bytes are merged together (a single
+larger upload is usually faster than several tiny ones) and the total number
+of ranges is capped to `max_ranges` by merging the closest ones.
 
 This is done transparently and user can use a GPU buffer as a regular numpy
-array. The `pending_data` property indicates the region (offset/nbytes) of
-the base array that needs to be uploaded.
+array: basic and advanced indexing (integer arrays, boolean masks), in-place
+operators, ufuncs with an `out` argument and in-place numpy functions such as
+`np.copyto` all record the regions they modify. The `pending_ranges` property
+indicates the regions (start/stop) of the base array that needs to be uploaded
+while the `pending_data` property gives the smallest contiguous region
+(start/stop) enclosing all of them.
 
 **Example**:
 
   .. code::
 
-     data = np.zeros((5,5)).view(GPUData)
+     data = np.zeros(1000, np.float32).view(GPUData)
+     data._pending_data = None
+     data[0] = data[-1] = 1
+     print data.pending_ranges
+     [(0, 4), (3996, 4000)]
      print data.pending_data
-     (0, 200)
+     (0, 4000)
 """
+import bisect
 import numpy as np
 
 
+def merge_range(ranges, start, stop, threshold=0, count=None):
+    """
+    Insert the [start,stop[ byte range into a sorted list of disjoint ranges,
+    merging any range that overlaps or lies closer than threshold bytes. If
+    count is given, the closest ranges are then merged until there are no
+    more than count ranges.
+
+    :param list ranges: Sorted list of [start,stop] ranges (modified in place)
+    :param int start: Range start (bytes)
+    :param int stop: Range stop (bytes)
+    :param int threshold: Gap (bytes) below which ranges are merged
+    :param int count: Maximum number of ranges
+    """
+
+    start, stop = int(start), int(stop)
+    assert start <= stop, "Invalid range [%d,%d[" % (start, stop)
+
+    # First range that may be merged (its stop is not too far from start)
+    i = bisect.bisect_left([r[1] for r in ranges], start - threshold)
+    # Last range that may be merged (its start is not too far from stop)
+    j = i
+    while j < len(ranges) and ranges[j][0] <= stop + threshold:
+        start = min(start, ranges[j][0])
+        stop = max(stop, ranges[j][1])
+        j += 1
+    ranges[i:j] = [[start, stop]]
+
+    if count is not None:
+        while len(ranges) > max(count,1):
+            gaps = [ranges[k+1][0] - ranges[k][1] for k in range(len(ranges)-1)]
+            k = int(np.argmin(gaps))
+            ranges[k:k+2] = [[ranges[k][0], ranges[k+1][1]]]
+    return ranges
+
+
+def merge_ranges(ranges, starts, stops, threshold=0, count=None):
+    """
+    Merge several [start,stop[ byte ranges (given as arrays) with a sorted list
+    of disjoint ranges, merging any ranges that overlap or lie closer than
+    threshold bytes. If count is given, the closest ranges are then merged
+    until there are no more than count ranges. Returns the new list.
+
+    :param list ranges: Sorted list of [start,stop] ranges
+    :param array starts: Ranges start (bytes)
+    :param array stops: Ranges stop (bytes)
+    :param int threshold: Gap (bytes) below which ranges are merged
+    :param int count: Maximum number of ranges
+    """
+
+    assert np.all(np.asarray(starts) <= np.asarray(stops)), "Invalid ranges"
+    starts = np.concatenate([[r[0] for r in ranges], starts]).astype(np.int64)
+    stops = np.concatenate([[r[1] for r in ranges], stops]).astype(np.int64)
+    if not len(starts):
+        return []
+    order = np.argsort(starts, kind='stable')
+    starts, stops = starts[order], np.maximum.accumulate(stops[order])
+
+    # A new range begins when the gap with the previous one is too large
+    breaks = np.flatnonzero(starts[1:] > stops[:-1] + threshold)
+
+    # Merging the n smallest gaps (greedy) keeps count ranges
+    if count is not None and len(breaks) >= max(count,1):
+        gaps = starts[breaks+1] - stops[breaks]
+        n = len(breaks) - max(count,1) + 1
+        keep = np.ones(len(breaks), dtype=bool)
+        keep[np.argpartition(gaps, n-1)[:n]] = False
+        breaks = breaks[keep]
+
+    first = np.concatenate([[0], breaks+1])
+    last = np.concatenate([breaks, [len(starts)-1]])
+    return [[int(start), int(stop)] for start, stop in zip(starts[first], stops[last])]
+
+
 class GPUData(np.ndarray):
     """
     Memory tracked numpy array.
     """
 
+    # Gap (in bytes) below which two pending ranges are merged
+    _merge_threshold = 1024
+
+    # Maximum number of pending ranges
+    _max_ranges = 16
+
     def __new__(cls, *args, **kwargs):
         return np.ndarray.__new__(cls, *args, **kwargs)
 
@@ -39,27 +128,67 @@ class GPUData(np.ndarray):
         if not isinstance(obj, GPUData):
             self._extents = 0, self.size*self.itemsize
             self.__class__.__init__(self)
-            self._pending_data = self._extents
+            self._pending_data = [list(self._extents)]
         else:
             self._extents = obj._extents
 
 
     @property
     def pending_data(self):
-        """ Pending data region as (byte offset, byte size) """
+        """ Smallest pending data region as (byte start, byte stop) """
+
+        ranges = self.pending_ranges
+        if ranges:
+            return ranges[0][0], ranges[-1][1]
+        return None
+
+
+    @property
+    def pending_ranges(self):
+        """ Sorted list of disjoint pending regions as (byte start, byte stop) """
 
         if isinstance(self.base, GPUData):
-            return self.base.pending_data
+            return self.base.pending_ranges
 
         if self._pending_data:
-            return self._pending_data
-            # start, stop = self._pending_data
-            # WARN: semantic is offset, nbytes
-            # extents semantic is start, stop
-            # return start, stop-start
-            return start, stop
+            return [(start, stop) for start, stop in self._pending_data]
+        return []
+
+
+    @property
+    def merge_threshold(self):
+        """ Gap (in bytes) below which two pending ranges are merged """
+
+        if isinstance(self.base, GPUData):
+            return self.base.merge_threshold
+        return self._merge_threshold
+
+    @merge_threshold.setter
+    def merge_threshold(self, value):
+        """ Gap (in bytes) below which two pending ranges are merged """
+
+        if isinstance(self.base, GPUData):
+            self.base.merge_threshold = value
         else:
-            return None
+            self._merge_threshold = max(int(value), 0)
+
+
+    @property
+    def max_ranges(self):
+        """ Maximum number of pending ranges (closest ones are merged) """
+
+        if isinstance(self.base, GPUData):
+            return self.base.max_ranges
+        return self._max_ranges
+
+    @max_ranges.setter
+    def max_ranges(self, value):
+        """ Maximum number of pending ranges (closest ones are merged) """
+
+        if isinstance(self.base, GPUData):
+            self.base.max_ranges = value
+        else:
+            self._max_ranges = max(int(value), 1)
 
     @property
     def stride(self):
@@ -79,60 +208,190 @@ class GPUData(np.ndarray):
 
     def _add_pending_data(self, start, stop):
         """
-        Add pending data, taking care of previous pending data such that it
-        is always a contiguous area.
+        Add pending data, merging it with previous pending data according to
+        the merge threshold and the maximum number of ranges.
         """
         base = self.base
         if isinstance(base, GPUData):
             base._add_pending_data(start, stop)
         else:
             if self._pending_data is None:
-                self._pending_data = start, stop
+                self._pending_data = []
+            merge_range(self._pending_data, start, stop,
+                        self._merge_threshold, self._max_ranges)
+
+    def _add_pending_view(self, Z):
+        """
+        Add pending data corresponding to a view (Z) of the base array that
+        has been modified. Subclasses may use the view shape and strides to
+        record the modified region more precisely than its byte extents.
+        """
+
+        if Z.size == 0:
+            return
+        self._add_pending_data(Z._extents[0], Z._extents[1])
+
+    def _add_pending_ranges(self, starts, stops):
+        """
+        Add several pending ranges at once (starts and stops being arrays of
+        byte offsets in the base array).
+        """
+        base = self.base
+        if isinstance(base, GPUData):
+            base._add_pending_ranges(starts, stops)
+        else:
+            if self._pending_data is None:
+                self._pending_data = []
+            self._pending_data = merge_ranges(self._pending_data, starts, stops,
+                                              self._merge_threshold, self._max_ranges)
+
+    def _add_pending_index(self, key):
+        """
+        Add pending data corresponding to an advanced index (integer arrays
+        and/or boolean masks, possibly mixed with slices).
+        """
+
+        offsets, size = self._index_offsets(key)
+        if len(offsets):
+            starts = self._data_offset() + offsets
+            self._add_pending_ranges(starts, starts + size)
+
+    def _index_offsets(self, key):
+        """
+        Compute the sorted byte offsets (relative to this array) of the cells
+        touched by an advanced index, a cell being the block spanned by the
+        axes following the last indexed one. Returns offsets and cell size.
+        """
+
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        # Normalize key: boolean masks become integer arrays (one per axis
+        # they cover) and newaxis are dropped since they do not consume axes.
+        items = []
+        for k in key:
+            if k is None or k is Ellipsis or isinstance(k, slice):
+                if k is not None:
+                    items.append(k)
+                continue
+            k = np.asarray(k)
+            if k.dtype == bool:
+                if k.ndim == 0:
+                    if not k:
+                        return np.zeros(0, np.int64), 0
+                    continue
+                items.extend(np.nonzero(k))
             else:
-                start = min(self._pending_data[0], start)
-                stop = max(self._pending_data[1], stop)
-                self._pending_data = start, stop
+                items.append(k)
+        for i, k in enumerate(items):
+            if k is Ellipsis:
+                count = self.ndim - len(items) + 1
+                items[i:i+1] = [slice(None)] * count
+                break
+
+        # Axes after the last advanced index are part of the cell
+        last = max([i for i,k in enumerate(items) if not isinstance(k, slice)] + [-1])
+        items = items[:last+1]
+        shape, strides = self.shape, self.strides
+
+        # Advanced indices broadcast together...
+        advanced = [(d,k) for d,k in enumerate(items) if not isinstance(k, slice)]
+        arrays = np.broadcast_arrays(*[k for _,k in advanced]) if advanced else []
+        offsets = np.zeros(arrays[0].size if advanced else 1, np.int64)
+        for (d,_), k in zip(advanced, arrays):
+            offsets += np.mod(k.ravel().astype(np.int64), shape[d]) * strides[d]
+
+        # ... while slices give an outer product
+        for d,k in enumerate(items):
+            if isinstance(k, slice):
+                index = np.arange(*k.indices(shape[d]), dtype=np.int64)
+                offsets = (offsets[:,np.newaxis] + index*strides[d]).ravel()
+
+        # Cell extent (taking care of negative strides)
+        lo, hi = 0, self.itemsize
+        for n, stride in zip(shape[last+1:], strides[last+1:]):
+            lo += min(0, (n-1)*stride)
+            hi += max(0, (n-1)*stride)
+        return np.unique(offsets) + lo, hi - lo
+
+    def _data_offset(self):
+        """
+        Byte offset of the first element in the base array (which is not the
+        start of the extents for views with negative strides).
+        """
+
+        base = self.base if isinstance(self.base, GPUData) else self
+        return (self.__array_interface__['data'][0] -
+                base.__array_interface__['data'][0])
 
     def _compute_extents(self, Z):
         """
         Compute extents (start, stop) in the base array.
         """
 
-        if self.base is not None:
-            base = self.base.__array_interface__['data'][0]
-            view = Z.__array_interface__['data'][0]
-            offset = view - base
-            shape = np.array(Z.shape) - 1
-            strides = np.array(Z.strides)
-            size = (shape*strides).sum() + Z.itemsize
-            return offset, offset+size
-        else:
-            return 0, self.size*self.itemsize
+        base = self.base if isinstance(self.base, GPUData) else self
+        base = base.__array_interface__['data'][0]
+        view = Z.__array_interface__['data'][0]
+        offset = view - base
+        if Z.size == 0:
+            return offset, offset
+
+        # Negative strides (reversed views) extend the view before its offset
+        spans = (np.array(Z.shape) - 1) * np.array(Z.strides)
+        start = offset + spans[spans < 0].sum()
+        stop = offset + spans[spans > 0].sum() + Z.itemsize
+        return int(start), int(stop)
+
+
+    def _is_advanced(self, key):
+        """
+        Whether key is (or contains) a list, an array, a mask or a boolean
+        (boolean scalars are advanced indices too)
+        """
+
+        if isinstance(key, tuple):
+            return any(self._is_advanced(k) for k in key)
+        return isinstance(key, (list, np.ndarray, bool, np.bool_))
 
 
     def __getitem__(self, key):
-        """ FIXME: Need to take care of case where key is a list or array """
+        """ Get a view (basic index) or a detached copy (advanced index) """
 
         Z = np.ndarray.__getitem__(self, key)
         if not hasattr(Z,'shape') or Z.shape == ():
             return Z
-        Z._extents = self._compute_extents(Z)
+        if self._is_advanced(key) or not np.may_share_memory(Z, self):
+            # Advanced indexing returns a copy that lives on its own
+            Z._extents = 0, Z.size*Z.itemsize
+            Z._pending_data = [list(Z._extents)]
+        else:
+            Z._extents = self._compute_extents(Z)
         return Z
 
     def __setitem__(self, key, value):
-        """ FIXME: Need to take care of case where key is a list or array """
-        
+        """ Set data and record the (possibly scattered) modified regions """
+
+        if self._is_advanced(key):
+            np.ndarray.__setitem__(self, key, value)
+            self._add_pending_index(key)
+            return
+
         Z = np.ndarray.__getitem__(self, key)
+        if Z.shape != () and not np.may_share_memory(Z, self):
+            # Not a view (any other kind of advanced index)
+            np.ndarray.__setitem__(self, key, value)
+            self._add_pending_index(key)
+            return
         if Z.shape == ():
             # WARN: Be careful with negative indices !
             key = np.mod(np.array(key)+self.shape, self.shape)
-            offset = self._extents[0]+(key * self.strides).sum()
+            offset = self._data_offset()+(key * self.strides).sum()
             size = Z.itemsize
             self._add_pending_data(offset, offset+size)
             key = tuple(key)
         else:
             Z._extents = self._compute_extents(Z)
-            self._add_pending_data(Z._extents[0], Z._extents[1])
+            self._add_pending_view(Z)
         np.ndarray.__setitem__(self, key, value)
 
 
@@ -142,18 +401,75 @@ class GPUData(np.ndarray):
     def __setslice__(self, start, stop,  value):
         return self.__setitem__(slice(int(start), int(stop)), value)
 
-    def __iadd__(self, other):
-        self._add_pending_data(self._extents[0], self._extents[1])
-        return np.ndarray.__iadd__(self, other)
 
-    def __isub__(self, other):
-        self._add_pending_data(self._extents[0], self._extents[1])
-        return np.ndarray.__isub__(self, other)
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """
+        Record regions modified by ufuncs writing in place, i.e. in-place
+        operators (+=, -=, etc), explicit outputs (out=) and ufunc.at.
+        """
+
+        outputs = kwargs.get('out', ())
+        if outputs:
+            for Z in outputs:
+                if isinstance(Z, GPUData):
+                    Z._add_pending_view(Z)
+            kwargs['out'] = tuple(Z.view(np.ndarray) if isinstance(Z, GPUData)
+                                  else Z for Z in outputs)
+        if method == 'at' and isinstance(inputs[0], GPUData):
+            inputs[0]._add_pending_index(inputs[1])
+
+        args = [Z.view(np.ndarray) if isinstance(Z, GPUData) else Z for Z in inputs]
+        results = getattr(ufunc, method)(*args, **kwargs)
+        if method == 'at':
+            return None
+
+        if ufunc.nout == 1:
+            results = (results,)
+        wrapped = []
+        for i, result in enumerate(results):
+            if outputs and outputs[i] is not None:
+                wrapped.append(outputs[i])
+            elif isinstance(result, np.ndarray):
+                # New array that lives on its own (as advanced index copies)
+                Z = np.ndarray.__array_wrap__(self, result)
+                Z._extents = 0, Z.size*Z.itemsize
+                Z._pending_data = [list(Z._extents)]
+                wrapped.append(Z)
+            else:
+                wrapped.append(result)
+        return wrapped[0] if len(wrapped) == 1 else tuple(wrapped)
+
+
+    def __array_function__(self, func, types, args, kwargs):
+        """
+        Record regions modified by numpy functions writing in place
+        (np.copyto, np.put, np.place, np.putmask, np.fill_diagonal).
+        """
+
+        if func in (np.place, np.putmask) and isinstance(args[0], GPUData):
+            mask = args[1] if len(args) > 1 else kwargs['mask']
+            args[0]._add_pending_index(np.asarray(mask, dtype=bool))
+        elif func in (np.copyto, np.put, np.fill_diagonal):
+            Z = args[0] if len(args) else kwargs.get('dst', kwargs.get('a'))
+            if isinstance(Z, GPUData):
+                Z._add_pending_view(Z)
+        return np.ndarray.__array_function__(self, func, types, args, kwargs)
+
+
+    def fill(self, value):
+        """ Fill the array with a scalar value """
+
+        self._add_pending_view(self)
+        np.ndarray.fill(self, value)
+
+    def put(self, *args, **kwargs):
+        """ Set a.flat[n] = values[n] for all n in indices """
+
+        self._add_pending_view(self)
+        np.ndarray.put(self, *args, **kwargs)
 
-    def __imul__(self, other):
-        self._add_pending_data(self._extents[0], self._extents[1])
-        return np.ndarray.__imul__(self, other)
+    def sort(self, *args, **kwargs):
+        """ Sort the array in place """
 
-    def __idiv__(self, other):
-        self._add_pending_data(self._extents[0], self._extents[1])
-        return np.ndarray.__idiv__(self, other)
+        self._add_pending_view(self)
+        np.ndarray.sort(self, *args, **kwargs)
@@ -3,8 +3,8 @@
 # Distributed under the (new) BSD License.
 # -----------------------------------------------------------------------------
 import re
+import functools
 import numpy as np
-import OpenGL.GL as gl
 from glumpy import library
 from glumpy.log import log
 
@@ -36,9 +36,31 @@ def remove_version(code):
     return regex.sub('\n', code)
 
 
+# Comment-free content of included files (filename -> (content, code))
+_includes = {}
+
+
+def _include(filename):
+    """ Comment-free code of an included file """
+
+    content = library.read(filename)
+    cached = _includes.get(filename, None)
+    if cached is None or cached[0] is not content:
+        cached = content, remove_comments(content)
+        _includes[filename] = cached
+    return cached[1]
+
+
 def merge_includes(code):
     """ Merge all includes recursively """
 
+    return _merge_includes(code, library.version())
+
+
+@functools.lru_cache(maxsize=1024)
+def _merge_includes(code, version):
+    """ Merge all includes recursively (for a given library version) """
+
     # pattern = '\#\s*include\s*"(?P<filename>[a-zA-Z0-9\-\.\/]+)"[^\r\n]*\n'
     pattern = '\#\s*include\s*"(?P<filename>[a-zA-Z0-9\-\.\/\_]+)"'
     regex = re.compile(pattern)
@@ -54,7 +76,7 @@ def merge_includes(code):
                 log.critical('"%s" not found' % filename)
                 raise RuntimeError("File not found")
             text = '\n// --- start of "%s" ---\n' % filename
-            text += remove_comments(open(path).read())
+            text += _include(path)
             text += '// --- end of "%s" ---\n' % filename
             return text
         return ''
@@ -73,9 +95,17 @@ def preprocess(code):
     """ Preprocess a code by removing comments, version and merging includes """
 
     if code:
-        code = remove_comments(code)
-        code = remove_version(code)
-        code = merge_includes(code)
+        code = _preprocess(code, library.version())
+    return code
+
+
+@functools.lru_cache(maxsize=1024)
+def _preprocess(code, version):
+    """ Preprocess a code (for a given library version) """
+
+    code = remove_comments(code)
+    code = remove_version(code)
+    code = merge_includes(code)
     return code
 
 
@@ -128,93 +158,256 @@ def get_declarations(code, qualifier = ""):
                     variables.append((iname, vtype))
     return variables
 
-def get_hooks(code):
-    if not len(code):
-        return []
-
-    hooks = []
-    # re_hooks = re.compile("""\<(?P<hook>\w+)
-    #                           (\.(?P<subhook>\w+))?
-    #                           (\([^<>]+\))?\>""", re.VERBOSE )
-    re_hooks = re.compile("""\<(?P<hook>\w+)
-                              (\.(?P<subhook>.+))?
-                              (\([^<>]+\))?\>""", re.VERBOSE )
-    # re_hooks = re.compile("\<(?P<hook>\w+)\>", re.VERBOSE)
-    for match in re.finditer(re_hooks, code):
-        # hooks.append( (match.group('hook'),match.group('subhook')) )
-        hooks.append((match.group('hook'), None))
-        # print match.group('hook')
-        # print match.group('subhook')
-    # print set(hooks)
-    return list(set(hooks))
-
 def get_args(code):
     return get_declarations(code, qualifier = "")
 
+# Statement tokens: hooks, identifiers (or numbers) and other characters
+_re_tokens = re.compile(r"\<\w+(?:\.[\.\w\!]+)?(?:\([^<>]+\))?\>|[\w\.]+|\S")
+
+# Top-level statement delimiters, preprocessor lines, comments and hooks
+_re_top = re.compile(r"""(?=[\#/<;{}])(?:                  # Skip to candidates
+    (?P<directive>\#(?:[^\n\\]|\\.)*)                        # Preprocessor line
+  | (?P<comment>//[^\n]*|/\*.*?\*/)                          # Comment
+  | (?P<hook>\<(?P<name>\w+)(?:\.[\.\w\!]+)?(?:\([^<>]+\))?\>) # Hook
+  | (?P<symbol>[;{}]))                                      # Delimiter
+    """, re.VERBOSE | re.DOTALL)
+
+# Same inside definitions (only braces are delimiters)
+_re_body = re.compile(r"""(?=[\#/<{}])(?:                  # Skip to candidates
+    (?P<directive>\#(?:[^\n\\]|\\.)*)                        # Preprocessor line
+  | (?P<comment>//[^\n]*|/\*.*?\*/)                          # Comment
+  | (?P<hook>\<(?P<name>\w+)(?:\.[\.\w\!]+)?(?:\([^<>]+\))?\>) # Hook
+  | (?P<symbol>[{}]))                                       # Brace
+    """, re.VERBOSE | re.DOTALL)
+
+_re_hooks = re.compile(r"\<(\w+)(?:\.[\.\w\!]+)?(?:\([^<>]+\))?\>")
+_re_identifier = re.compile(r"[A-Za-z_]\w*$")
+
+# Storage qualifiers (and the parse() entry they fill)
+_storages = { "extern":    "externs",
+              "const":     "consts",
+              "uniform":   "uniforms",
+              "attribute": "attributes",
+              "in":        "attributes",
+              "varying":   "varyings" }
+
+# Qualifiers that do not change the kind of a declaration
+_qualifiers = { "highp", "mediump", "lowp", "invariant", "precise", "flat",
+                "smooth", "noperspective", "centroid", "sample", "patch" }
+
+
+def _declarators(tokens, vtype, variables):
+    """ Append (name, type) of declarators (name[size] = value, ...) """
+
+    level, declarator = 0, []
+    for token in tokens + [","]:
+        if token == "," and level == 0:
+            if declarator and _re_identifier.match(declarator[0]):
+                name = declarator[0]
+                if (len(declarator) > 3 and declarator[1] == "["
+                    and declarator[2].isdigit() and declarator[3] == "]"):
+                    size = int(declarator[2])
+                    if size == 0:
+                        raise RuntimeError("Size of a variable array cannot be zero")
+                    for i in range(size):
+                        variables.append(('%s[%d]' % (name,i), vtype))
+                else:
+                    variables.append((name, vtype))
+            declarator = []
+            continue
+        if token == "(" or token == "[":
+            level += 1
+        elif token == ")" or token == "]":
+            level -= 1
+        declarator.append(token)
+
+
+def _declaration(tokens):
+    """ Storage (parse() entry), type and declarators of a declaration """
+
+    storage, i, count = None, 0, len(tokens)
+    while i < count:
+        token = tokens[i]
+        if token == "layout":
+            # Skip layout(...)
+            level = 0
+            for i in range(i+1, count):
+                if tokens[i] == "(":
+                    level += 1
+                elif tokens[i] == ")":
+                    level -= 1
+                    if level == 0:
+                        break
+        elif token in _storages:
+            storage = _storages[token]
+        elif token not in _qualifiers:
+            break
+        i += 1
+    if storage is None or i >= count-1:
+        return None, None, []
+    return storage, tokens[i], tokens[i+1:]
+
+
+def _definition(text, tokens):
+    """ What a top-level brace opens (function, uniform block or other) """
+
+    # Function: rtype name(args) {
+    if len(tokens) >= 4 and tokens[-1] == ")":
+        level = 0
+        for i in range(len(tokens)-1, -1, -1):
+            if tokens[i] == ")":
+                level += 1
+            elif tokens[i] == "(":
+                level -= 1
+                if level == 0:
+                    break
+        if (level == 0 and i >= 2 and _re_identifier.match(tokens[i-1])
+            and _re_identifier.match(tokens[i-2])
+            and tokens[i-1] not in ("if", "while")):
+            close = text.rindex(")")
+            level = 0
+            for start in range(close, -1, -1):
+                if text[start] == ")":
+                    level += 1
+                elif text[start] == "(":
+                    level -= 1
+                    if level == 0:
+                        break
+            return "function", (tokens[i-2], tokens[i-1], text[start+1:close])
+
+    # Uniform block: [layout(...)] uniform name {
+    storage, name, rest = _declaration(tokens + [""])
+    if storage == "uniforms" and rest == [""]:
+        return "block", name
+
+    return "other", None
+
+
+def scan(code):
+    """
+    Scan (preprocessed) code in a single pass and return declarations,
+    uniform blocks, hooks and functions (see parse).
+
+    Top-level statements are split into tokens while definition bodies
+    (functions, structs) are only scanned for braces and hooks.
+    """
+
+    objects = { 'externs'   : [],
+                'consts'    : [],
+                'uniforms'  : [],
+                'blocks'    : [],
+                'attributes': [],
+                'varyings'  : [],
+                'hooks'     : [],
+                'functions' : [] }
+    if not code:
+        return objects
+
+    hooks = objects["hooks"]
+    pieces = []      # Pieces of current statement (before a directive)
+    begin = 0        # Start of current statement (piece)
+    depth = 0        # Brace depth
+    opened = None    # What the top-level brace has opened
+    start = 0        # Start of the top-level definition body
+    position = 0
+
+    while True:
+        match = (_re_top if depth == 0 else _re_body).search(code, position)
+        if match is None:
+            break
+        position = match.end()
+        kind = match.lastgroup
+
+        if kind == "hook":
+            if (match.group("name"), None) not in hooks:
+                hooks.append((match.group("name"), None))
+            continue
+        if kind == "directive" or kind == "comment":
+            if kind == "directive" and "<" in match.group():
+                for hook in _re_hooks.finditer(match.group()):
+                    if (hook.group(1), None) not in hooks:
+                        hooks.append((hook.group(1), None))
+            if depth == 0:
+                pieces.append(code[begin:match.start()])
+                begin = position
+            continue
+
+        symbol = match.group()
+
+        # Inside a top-level definition
+        if depth > 0:
+            if symbol == "{":
+                depth += 1
+                continue
+            depth -= 1
+            if depth > 0:
+                continue
+            what, data = opened
+            if what == "function":
+                rtype, name, args = data
+                objects["functions"].append((rtype, name, args,
+                                             code[start:match.start()]))
+                pieces = []
+            else:
+                if what == "block":
+                    block = []
+                    body = remove_comments(code[start:match.start()])
+                    for member in body.split(";"):
+                        tokens = ["uniform"] + _re_tokens.findall(member)
+                        storage, vtype, declarators = _declaration(tokens)
+                        if storage is not None:
+                            _declarators(declarators, vtype, block)
+                    objects["blocks"].append((data, block))
+                # Following tokens (up to ";") are declarators
+                pieces = ["} "]
+            begin = position
+            continue
+
+        # End of a top-level statement
+        text = "".join(pieces) + code[begin:match.start()]
+        pieces, begin = [], position
+        tokens = _re_tokens.findall(text)
+        if symbol == ";":
+            storage, vtype, declarators = _declaration(tokens)
+            if storage is not None:
+                _declarators(declarators, vtype, objects[storage])
+        elif symbol == "{":
+            depth, start = 1, position
+            opened = _definition(text, tokens)
+
+    return objects
+
+
 def get_externs(code):
-    return get_declarations(code, qualifier = "extern")
+    return scan(code)["externs"]
 
 def get_consts(code):
-    return get_declarations(code, qualifier = "const")
+    return scan(code)["consts"]
 
 def get_uniforms(code):
-    return get_declarations(code, qualifier = "uniform")
+    return scan(code)["uniforms"]
+
+def get_blocks(code):
+    """ Uniform blocks as (name, members) with members as (name, type) """
+    return scan(code)["blocks"]
 
 def get_attributes(code):
-    return get_declarations(code, qualifier = ["attribute", "in"])
+    return scan(code)["attributes"]
 
 def get_varyings(code, version=120):
-    #if version <= 120:
-    return get_declarations(code, qualifier = "varying")
-    #else:
-    #    return get_declarations(code, qualifier = ["in", "out"])
+    return scan(code)["varyings"]
+
+def get_hooks(code):
+    return scan(code)["hooks"]
 
 def get_functions(code):
-    def brace_matcher (n):
-        # From stack overflow: python-how-to-match-nested-parentheses-with-regex
-        # poor man's matched brace scanning, gives up
-        # after n+1 levels.  Matches any string with balanced
-        # braces inside; add the outer braces yourself if needed.
-        # Nongreedy.
-        return r"[^{}]*?(?:{"*n+r"[^{}]*?"+r"}[^{}]*?)*?"*n
-
-    functions = []
-    regex = re.compile("""
-                       \s*(?P<type>\w+)    # Function return type
-                       \s+(?P<name>[\w]+)   # Function name
-                       \s*\((?P<args>.*?)\) # Function arguments
-                       \s*\{(?P<code>%s)\} # Function content
-                       """ % brace_matcher(5), re.VERBOSE | re.DOTALL)
-
-    for match in re.finditer(regex, code):
-        rtype = match.group('type')
-        name = match.group('name')
-        args = match.group('args')
-        fcode = match.group('code')
-        if name not in ("if", "while"):
-            functions.append( (rtype, name, args, fcode) )
-    return functions
+    return scan(code)["functions"]
 
 
 def parse(code):
     """ Parse a shader """
 
-    code      = preprocess(code)
-    externs   = get_externs(code) if code else []
-    consts    = get_consts(code) if code else []
-    uniforms  = get_uniforms(code) if code else []
-    attributes= get_attributes(code) if code else []
-    varyings  = get_varyings(code) if code else []
-    hooks     = get_hooks(code) if code else []
-    functions = get_functions(code) if code else []
-
-    return { 'externs'   : externs,
-             'consts'    : consts,
-             'uniforms'  : uniforms,
-             'attributes': attributes,
-             'varyings'  : varyings,
-             'hooks'     : hooks,
-             'functions' : functions }
+    return scan(preprocess(code))
 
 
 # -----------------------------------------------------------------------------
@@ -0,0 +1,296 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+"""
+A buffer pool sub-allocates many (small) buffers out of a few large GPU
+buffers (arenas). This reduces the number of GL objects and allows several
+buffers to share the same binding. Each pooled buffer keeps its own CPU data
+and dirty tracking, only its GPU storage is a slice of an arena whose offset
+is taken into account when buffer is used as an attribute or index source.
+
+Arenas are allocated lazily (a GL context is only needed at first
+activation) and a new arena is created when no existing one has enough
+room. Allocations that are no longer referenced are automatically returned
+to the pool.
+
+**Example usage**:
+
+  .. code:: python
+
+     pool = gloo.BufferPool(gl.GL_ARRAY_BUFFER, size=4*1024*1024)
+     V1 = pool.allocate(np.zeros(100, dtype))
+     V2 = pool.allocate(np.zeros(200, dtype).view(gloo.VertexBuffer))
+     ...
+     pool.free(V1)
+     pool.defragment()
+"""
+import weakref
+import numpy as np
+
+from glumpy import gl
+from glumpy.log import log
+from glumpy.gloo.globject import GLObject
+from glumpy.gloo.buffer import Buffer, VertexBuffer, IndexBuffer
+
+
+class Arena(GLObject):
+    """
+    Large GPU buffer holding several sub-allocated buffers.
+
+    :param GLEnum target: gl.GL_ARRAY_BUFFER or gl.GL_ELEMENT_ARRAY_BUFFER
+    :param int size: Arena size (bytes)
+    :param GLEnum usage: Buffer usage hint
+    """
+
+    _resource = "buffer"
+
+    def __init__(self, target, size, usage=gl.GL_DYNAMIC_DRAW):
+        GLObject.__init__(self)
+        self._target = target
+        self._size = size
+        self._usage = usage
+        self._free = [[0, size]]
+        self._allocations = {}
+
+
+    @property
+    def size(self):
+        """ Arena size (bytes) """
+
+        return self._size
+
+
+    @property
+    def used(self):
+        """ Number of allocated bytes """
+
+        return sum(nbytes for nbytes,ref in self._allocations.values())
+
+
+    @property
+    def gpu_nbytes(self):
+        """ Number of bytes used on GPU """
+
+        return self._size
+
+
+    @property
+    def buffers(self):
+        """ Buffers allocated in this arena (sorted by offset) """
+
+        buffers = []
+        for offset in sorted(self._allocations.keys()):
+            buffer = self._allocations[offset][1]()
+            if buffer is not None:
+                buffers.append(buffer)
+        return buffers
+
+
+    def allocate(self, buffer, nbytes, alignment):
+        """
+        Allocate nbytes for buffer using first fit and return the allocation
+        offset or None if there is no room for it.
+        """
+
+        nbytes = max(nbytes, 1)
+        for i, (start, size) in enumerate(self._free):
+            offset = -(-start // alignment) * alignment
+            if offset + nbytes <= start + size:
+                blocks = []
+                if offset > start:
+                    blocks.append([start, offset-start])
+                if offset + nbytes < start + size:
+                    blocks.append([offset+nbytes, start+size-offset-nbytes])
+                self._free[i:i+1] = blocks
+                release = lambda ref, offset=offset: self.release(offset)
+                self._allocations[offset] = nbytes, weakref.ref(buffer, release)
+                return offset
+        return None
+
+
+    def release(self, offset):
+        """ Release the allocation at given offset """
+
+        if offset not in self._allocations.keys():
+            return
+        nbytes, ref = self._allocations.pop(offset)
+        free = self._free
+        i = 0
+        while i < len(free) and free[i][0] < offset:
+            i += 1
+        free.insert(i, [offset, nbytes])
+
+        # Coalesce with next then previous free blocks
+        if i+1 < len(free) and free[i][0] + free[i][1] == free[i+1][0]:
+            free[i][1] += free[i+1][1]
+            del free[i+1]
+        if i > 0 and free[i-1][0] + free[i-1][1] == free[i][0]:
+            free[i-1][1] += free[i][1]
+            del free[i]
+
+
+    def reset(self):
+        """ Release all allocations """
+
+        self._free = [[0, self._size]]
+        self._allocations = {}
+
+
+    def _create(self):
+        """ Create arena on GPU """
+
+        self._handle = gl.glGenBuffers(1)
+        self._created()
+        log.debug("GPU: Creating arena (id=%d, %d bytes)" % (self._id, self._size))
+        gl.glBindBuffer(self._target, self._handle)
+        gl.glBufferData(self._target, self._size, None, self._usage)
+        gl.glBindBuffer(self._target, 0)
+
+
+    def _delete(self):
+        """ Delete arena from GPU """
+
+        if self._handle > -1:
+            gl.glDeleteBuffers(1, np.array([self._handle]))
+
+
+    def _activate(self):
+        """ Bind the arena """
+
+        gl.glBindBuffer(self._target, self._handle)
+
+
+    def _deactivate(self):
+        """ Unbind the arena """
+
+        gl.glBindBuffer(self._target, 0)
+
+
+
+class BufferPool(object):
+    """
+    Pool of GPU buffers sub-allocated from shared arenas.
+
+    :param GLEnum target: gl.GL_ARRAY_BUFFER or gl.GL_ELEMENT_ARRAY_BUFFER
+    :param int size: Default arena size (bytes)
+    :param int alignment: Allocation alignment (bytes)
+    :param GLEnum usage: Arenas usage hint
+    """
+
+    def __init__(self, target=gl.GL_ARRAY_BUFFER, size=4*1024*1024,
+                 alignment=16, usage=gl.GL_DYNAMIC_DRAW):
+        self._target = target
+        self._size = size
+        self._alignment = alignment
+        self._usage = usage
+        self._arenas = []
+
+
+    @property
+    def arenas(self):
+        """ Arenas composing the pool """
+
+        return list(self._arenas)
+
+
+    @property
+    def buffers(self):
+        """ Buffers currently allocated from the pool """
+
+        buffers = []
+        for arena in self._arenas:
+            buffers.extend(arena.buffers)
+        return buffers
+
+
+    @property
+    def size(self):
+        """ Total size of arenas (bytes) """
+
+        return sum(arena.size for arena in self._arenas)
+
+
+    @property
+    def used(self):
+        """ Total number of allocated bytes """
+
+        return sum(arena.used for arena in self._arenas)
+
+
+    def allocate(self, data):
+        """
+        Allocate a buffer from the pool.
+
+        :param array data: Buffer or array-like (that will be viewed as a
+                           VertexBuffer or an IndexBuffer, depending on the
+                           pool target)
+        """
+
+        if not isinstance(data, Buffer):
+            if self._target == gl.GL_ELEMENT_ARRAY_BUFFER:
+                data = np.asarray(data).view(IndexBuffer)
+            else:
+                data = np.asarray(data).view(VertexBuffer)
+        if isinstance(data.base, Buffer):
+            raise ValueError("Cannot allocate a view of a buffer")
+        if data._target != self._target:
+            raise ValueError("Buffer and pool targets differ")
+        if data._pool not in (None, self):
+            raise ValueError("Buffer already belongs to another pool")
+        if data._arena is not None:
+            self.free(data)
+
+        self._place(data)
+        data._pool = self
+        data._invalidate()
+        return data
+
+
+    def free(self, buffer):
+        """ Return buffer storage to the pool """
+
+        if buffer._pool is not self:
+            raise ValueError("Buffer does not belong to this pool")
+        if buffer._arena is not None:
+            buffer._arena.release(buffer._pool_offset)
+        buffer._arena = None
+        buffer._pool_offset = 0
+
+
+    def defragment(self):
+        """
+        Pack all allocations into as few arenas as possible. Moved buffers
+        are fully re-uploaded at next activation and arenas that end up
+        empty are deleted (this requires a current GL context).
+        """
+
+        buffers = self.buffers
+        buffers.sort(key=lambda buffer: buffer._regions*buffer.nbytes, reverse=True)
+        placements = [(buffer._arena, buffer._pool_offset) for buffer in buffers]
+        for arena in self._arenas:
+            arena.reset()
+        for buffer, placement in zip(buffers, placements):
+            self._place(buffer)
+            if (buffer._arena, buffer._pool_offset) != placement:
+                buffer._invalidate()
+        for arena in list(self._arenas):
+            if not arena._allocations:
+                self._arenas.remove(arena)
+                arena.delete()
+
+
+    def _place(self, buffer):
+        """ Find room for buffer, creating a new arena if necessary """
+
+        nbytes = buffer._regions * buffer.nbytes
+        for arena in self._arenas:
+            offset = arena.allocate(buffer, nbytes, self._alignment)
+            if offset is not None:
+                break
+        else:
+            arena = Arena(self._target, max(self._size, nbytes), self._usage)
+            self._arenas.append(arena)
+            offset = arena.allocate(buffer, nbytes, self._alignment)
+        buffer._arena = arena
+        buffer._pool_offset = offset
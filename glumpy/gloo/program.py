@@ -3,6 +3,8 @@
 # Distributed under the (new) BSD License.
 # -----------------------------------------------------------------------------
 import re
+import ctypes
+import weakref
 import numpy as np
 
 from glumpy import gl
@@ -10,8 +12,10 @@ from glumpy.log import log
 from glumpy import library
 from . snippet import Snippet
 from . globject import GLObject
+from . import cache
+from . import statistics
 from . array import VertexArray
-from . buffer import VertexBuffer, IndexBuffer
+from . buffer import VertexBuffer, IndexBuffer, UniformBuffer
 from . shader import VertexShader, FragmentShader, GeometryShader
 from . variable import gl_typeinfo, Uniform, Attribute
 
@@ -44,6 +48,22 @@ class Program(GLObject):
     msut be resolved and hooks must be inserted at the proper place.
     """
 
+    # Whether attribute bindings are stored into vertex array objects (this
+    # is disabled automatically if the GL context does not support them)
+    use_vertex_arrays = True
+
+    # Maximum number of vertex arrays per program (one per binding state)
+    _max_vertex_arrays = 8
+
+    # GL types of index buffers
+    _itypes = { np.dtype(np.uint8) : gl.GL_UNSIGNED_BYTE,
+                np.dtype(np.uint16): gl.GL_UNSIGNED_SHORT,
+                np.dtype(np.uint32): gl.GL_UNSIGNED_INT }
+
+
+    # Programs are owned by the program cache
+    _resource = None
+
     # ---------------------------------
     def __init__(self, vertex=None, fragment=None, geometry=None, count=0, version="120"):
         """
@@ -95,6 +115,27 @@ class Program(GLObject):
         self._uniforms = {}
         self._attributes = {}
 
+        # Incremented whenever uniforms or attributes are rebuilt
+        self._generation = 0
+
+        # Uniform blocks (name -> uniform buffer) and their binding points
+        self._blocks = {}
+        self._block_bindings = {}
+
+        # Last uploaded uniform values (location -> value), shared with the
+        # programs using the same linked program
+        self._uniform_values = {}
+
+        # Program cache key and entry (linked program shared with programs
+        # having the same sources)
+        self._cache_key = None
+        self._cache_entry = None
+
+        # Vertex array objects (state of bound buffers -> vertex array)
+        # and active attributes layout, built lazily when drawing
+        self._vertex_arrays = {}
+        self._vertex_layout = None
+
         # Build hooks, uniforms and attributes
         self._build_hooks()
         self._build_uniforms()
@@ -163,38 +204,62 @@ class Program(GLObject):
         pass
 
 
+    def _delete(self):
+        """ Release program from GPU memory (if it was present). """
+
+        if self._cache_entry is not None:
+            cache.get_default().release(self._cache_key, self)
+        self._cache_entry = None
+        self._cache_key = None
+        self._invalidate_vertex_arrays()
+
+
     def _create(self):
         """
-        Build (link) the program and checks everything's ok.
+        Build (link) the program and checks everything's ok. Programs having
+        the same sources share the same linked program (see :mod:`cache`).
 
         A GL context must be available to be able to build (link)
         """
 
         log.debug("GPU: Creating program")
 
-        # Check if program has been created
-        if self._handle <= 0:
-            self._handle = gl.glCreateProgram()
-            if not self._handle:
+        shaders = [self._vertex, self._fragment]
+        if self._geometry is not None:
+            shaders.append(self._geometry)
+        sources = [shader.final_code for shader in shaders]
+        if self._geometry is not None:
+            sources += [self._geometry.vertices_out, self._geometry.input_type,
+                        self._geometry.output_type]
+
+        programs = cache.get_default()
+        key = programs.key(*sources)
+        entry = programs.acquire(key, self)
+        if entry is None:
+            handle = gl.glCreateProgram()
+            if not handle:
                 raise ValueError("Cannot create program object")
-
-        self._build_shaders(self._handle)
-
-        log.debug("GPU: Linking program")
-
-        # Link the program
-        gl.glLinkProgram(self._handle)
-        if not gl.glGetProgramiv(self._handle, gl.GL_LINK_STATUS):
-            print(gl.glGetProgramInfoLog(self._handle))
-            raise ValueError('Linking error')
-
-        # Activate uniforms
+            if not programs.load(key, handle):
+                self._link(handle)
+                programs.save(key, handle)
+            entry = programs.store(key, "program", handle, self)
+        self._handle = entry.handle
+        self._cache_key = key
+        self._cache_entry = entry
+
+        # Activate uniforms (linking resets their locations and values)
         active_uniforms = [name for (name,gtype) in self.active_uniforms]
         for uniform in self._uniforms.values():
             if uniform.name in active_uniforms:
                 uniform.active = True
             else:
                 uniform.active = False
+            uniform._need_create = True
+            uniform._need_update = True
+
+        # Uniform values and block bindings are those of the linked program
+        self._uniform_values = entry.uniforms
+        self._block_bindings = entry.blocks
 
         # Activate attributes
         active_attributes = [name for (name,gtype) in self.active_attributes]
@@ -203,6 +268,29 @@ class Program(GLObject):
                 attribute.active = True
             else:
                 attribute.active = False
+            attribute._need_create = True
+        self._invalidate_vertex_arrays()
+
+
+    def _link(self, handle):
+        """ Compile and attach shaders and link the program """
+
+        self._build_shaders(handle)
+
+        log.debug("GPU: Linking program")
+
+        # Link the program
+        if cache.get_default().directory is not None:
+            try:
+                gl.glProgramParameteri(handle, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT,
+                                       gl.GL_TRUE)
+            except Exception:
+                pass
+        gl.glLinkProgram(handle)
+        if not gl.glGetProgramiv(handle, gl.GL_LINK_STATUS):
+            print(gl.glGetProgramInfoLog(handle))
+            gl.glDeleteProgram(handle)
+            raise ValueError('Linking error')
 
 
     def _build_shaders(self, program):
@@ -216,32 +304,28 @@ class Program(GLObject):
 
         log.debug("GPU: Attaching shaders to program")
 
-        # Attach shaders
-        attached = gl.glGetAttachedShaders(program)
+        # Attach shaders (program is a new one, see _create)
         shaders = [self._vertex, self._fragment]
         if self._geometry is not None:
             shaders.append(self._geometry)
 
         for shader in shaders:
-            if shader.need_update:
-                if shader.handle in attached:
-                    gl.glDetachShader(program, shader.handle)
-                shader.activate()
-                if isinstance(shader, GeometryShader):
-                    if shader.vertices_out is not None:
-                        gl.glProgramParameteriEXT(self._handle,
-                                                  gl.GL_GEOMETRY_VERTICES_OUT_EXT,
-                                                  shader.vertices_out)
-                    if shader.input_type is not None:
-                        gl.glProgramParameteriEXT(self._handle,
-                                                  gl.GL_GEOMETRY_INPUT_TYPE_EXT,
-                                                  shader.input_type)
-                    if shader.output_type is not None:
-                        gl.glProgramParameteriEXT(self._handle,
-                                                  gl.GL_GEOMETRY_OUTPUT_TYPE_EXT,
-                                                  shader.output_type)
-                gl.glAttachShader(program, shader.handle)
-                shader._program = self
+            shader.activate()
+            if isinstance(shader, GeometryShader):
+                if shader.vertices_out is not None:
+                    gl.glProgramParameteriEXT(program,
+                                              gl.GL_GEOMETRY_VERTICES_OUT_EXT,
+                                              shader.vertices_out)
+                if shader.input_type is not None:
+                    gl.glProgramParameteriEXT(program,
+                                              gl.GL_GEOMETRY_INPUT_TYPE_EXT,
+                                              shader.input_type)
+                if shader.output_type is not None:
+                    gl.glProgramParameteriEXT(program,
+                                              gl.GL_GEOMETRY_OUTPUT_TYPE_EXT,
+                                              shader.output_type)
+            gl.glAttachShader(program, shader.handle)
+            shader._program = self
 
 
     def _build_hooks(self):
@@ -276,13 +360,36 @@ class Program(GLObject):
             else:
                 uniform = self._uniforms[name]
             gtype = uniform.gtype
-            if gtype in (gl.GL_SAMPLER_1D, gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D, gl.GL_SAMPLER_CUBE):
+            if gtype in (gl.GL_SAMPLER_1D, gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D,
+                         gl.GL_SAMPLER_CUBE, gl.GL_SAMPLER_2D_ARRAY):
                 uniform._texture_unit = count
                 count += 1
             self._uniforms[name] = uniform
+        self._build_blocks()
+        self._generation += 1
         self._need_update = True
 
 
+    def _build_blocks(self):
+        """ Build the uniform blocks (keeping already assigned buffers) """
+
+        shaders = [self._vertex, self._fragment, self._geometry]
+        for shader in shaders:
+            if shader is not None:
+                for name, members in shader.blocks:
+                    if name not in self._blocks.keys():
+                        self._blocks[name] = None
+
+        # Snippets provide the buffer of their own block
+        hooks = (list(self._vert_hooks.values()) + list(self._frag_hooks.values()) +
+                 list(self._geom_hooks.values()))
+        for snippet in hooks:
+            if isinstance(snippet, Snippet):
+                for dependency in snippet.dependencies:
+                    if dependency.block_name in self._blocks.keys():
+                        self._blocks[dependency.block_name] = dependency.block
+
+
     def _build_attributes(self):
         """ Build the attribute objects """
 
@@ -298,6 +405,8 @@ class Program(GLObject):
 
             self._attributes[name] = attribute
             dtype.append(attribute.dtype)
+        self._generation += 1
+        self._invalidate_vertex_arrays()
 
 
     def bind(self, data):
@@ -353,6 +462,10 @@ class Program(GLObject):
             self._uniforms[name].set_data(data)
         elif name in self._attributes.keys():
             self._attributes[name].set_data(data)
+        elif name in self._blocks.keys():
+            if not isinstance(data, UniformBuffer):
+                raise ValueError("Uniform block data must be a UniformBuffer")
+            self._blocks[name] = data
         else:
             raise IndexError("Unknown item (no corresponding hook, uniform or attribute)")
 
@@ -368,6 +481,8 @@ class Program(GLObject):
             return self._uniforms[name].data
         elif name in self._attributes.keys():
             return self._attributes[name].data
+        elif name in self._blocks.keys():
+            return self._blocks[name]
         else:
             raise IndexError("Unknown item (no corresponding hook, uniform or attribute)")
 
@@ -380,17 +495,35 @@ class Program(GLObject):
     def _activate(self):
         """Activate the program as part of current rendering state."""
 
-        log.debug("GPU: Activating program (id=%d)" % self._id)
+        statistics.count(self, "program_binds")
         gl.glUseProgram(self.handle)
 
+        # Uniform values of a shared program may have been modified by
+        # another program object: uniforms are checked against the values
+        # the program holds and only differing ones are uploaded
+        entry = self._cache_entry
+        if entry is not None and (entry.owner is None or entry.owner() is not self):
+            if entry.owner is not None:
+                for uniform in self._uniforms.values():
+                    uniform._need_update = True
+            entry.owner = weakref.ref(self)
+
         for uniform in self._uniforms.values():
             if uniform.active:
                 uniform.activate()
 
-        # Need fix when dealing with vertex arrays (only need to active the array)
-        for attribute in self._attributes.values():
-            if attribute.active:
-                attribute.activate()
+        # Each block uses its own binding point (its index in the program)
+        for index, (name, buffer) in enumerate(self._blocks.items()):
+            if buffer is None:
+                continue
+            if self._block_bindings.get(name) != index:
+                block = gl.glGetUniformBlockIndex(self.handle, name)
+                if block != gl.GL_INVALID_INDEX:
+                    gl.glUniformBlockBinding(self.handle, block, index)
+                self._block_bindings[name] = index
+            buffer.bind(index)
+
+        self._activate_attributes()
 
 
     def _deactivate(self):
@@ -401,10 +534,120 @@ class Program(GLObject):
         for uniform in self._uniforms.values():
             uniform.deactivate()
 
-        # Need fix when dealing with vertex arrays (only need to active the array)
+        if self._vertex_layout is not None and not self._vertex_layout[5]:
+            gl.glBindVertexArray(0)
+        else:
+            for attribute in self._attributes.values():
+                attribute.deactivate()
+
+
+    def _build_vertex_layout(self):
+        """
+        Gather active attributes (all, buffer and generic ones), the (base)
+        vertex buffers they are bound to and the vertex count.
+        """
+
+        attributes, arrays, buffers, generics = [], [], [], []
+        legacy = not Program.use_vertex_arrays
         for attribute in self._attributes.values():
-            attribute.deactivate()
-        log.debug("GPU: Deactivating program (id=%d)" % self._id)
+            if not attribute.active:
+                continue
+            attributes.append(attribute)
+            data = attribute.data
+            if isinstance(data, VertexArray):
+                # Vertex arrays bind their own vertex array object
+                legacy = True
+            elif isinstance(data, VertexBuffer):
+                arrays.append(attribute)
+                while isinstance(data.base, VertexBuffer):
+                    data = data.base
+                if not any(data is buffer for buffer in buffers):
+                    buffers.append(data)
+            else:
+                generics.append(attribute)
+
+        count = 0
+        if self._attributes:
+            count = len(next(iter(self._attributes.values())))
+        self._vertex_layout = attributes, arrays, buffers, generics, count, legacy
+
+
+    def _vertex_count(self):
+        """ Vertex count given by the first per-vertex attribute """
+
+        attributes, arrays, buffers, generics, count, legacy = self._vertex_layout
+        for attribute in arrays:
+            if not attribute.data.divisor:
+                return len(attribute)
+        return count
+
+
+    def _delete_vertex_arrays(self):
+        """ Delete vertex arrays from GPU """
+
+        if self._vertex_arrays:
+            handles = list(self._vertex_arrays.values())
+            gl.glDeleteVertexArrays(len(handles), np.array(handles))
+        self._vertex_arrays = {}
+
+
+    def _invalidate_vertex_arrays(self):
+        """ Mark attribute bindings to be rebuilt (bound buffers changed) """
+
+        self._delete_vertex_arrays()
+        self._vertex_layout = None
+
+
+    def _activate_attributes(self):
+        """
+        Bind the vertex array corresponding to the current state of bound
+        buffers (handles, storages, offsets and divisors), building it if
+        necessary.
+        """
+
+        if self._vertex_layout is None:
+            self._build_vertex_layout()
+        attributes, arrays, buffers, generics, count, legacy = self._vertex_layout
+
+        if legacy:
+            for attribute in attributes:
+                attribute.activate()
+            return
+
+        # Upload pending data (array buffer binding is not part of the vertex
+        # array state). Uploads may change offsets (ring buffer regions) and
+        # storages (re-created buffers, whose GL names may be re-used) the
+        # pointers depend on.
+        for buffer in buffers:
+            if buffer.need_create or buffer.need_update:
+                buffer.activate()
+        key = tuple([(buffer.handle, buffer._storage, buffer.offset, buffer.divisor)
+                     for buffer in buffers])
+
+        handle = self._vertex_arrays.get(key)
+        if handle is not None:
+            gl.glBindVertexArray(handle)
+        else:
+            try:
+                handle = gl.glGenVertexArrays(1)
+            except Exception:
+                log.warning("Vertex array objects are not supported")
+                Program.use_vertex_arrays = False
+                self._vertex_layout = None
+                self._activate_attributes()
+                return
+            if len(self._vertex_arrays) >= Program._max_vertex_arrays:
+                self._delete_vertex_arrays()
+            self._vertex_arrays[key] = handle
+            gl.glBindVertexArray(handle)
+            for attribute in arrays:
+                # Activation enables and specifies the attribute array
+                attribute._need_update = False
+                attribute.activate()
+
+        # Generic attribute values are not part of the vertex array state
+        for attribute in generics:
+            attribute.activate()
 
 
     @property
@@ -583,7 +826,8 @@ class Program(GLObject):
         return inactive_attributes
 
 
-    def draw(self, mode = gl.GL_TRIANGLES, indices=None): #first=0, count=None):
+    def draw(self, mode = gl.GL_TRIANGLES, indices=None, instances=None,
+             first=0, count=None):
         """ Draw using the specified mode & indices.
 
         :param gl.GLEnum mode: 
@@ -598,29 +842,69 @@ class Program(GLObject):
 
         :param IndexBuffer|None indices:
             Vertex indices to be drawn. If none given, everything is drawn.
+
+        :param int|None instances:
+            Number of instances to be drawn. Attributes bound to vertex
+            buffers having a non zero divisor advance per instance and the
+            vertex count is given by the first per-vertex attribute.
+
+        :param int|array first:
+            First vertex (or first index if indices are given) to be drawn.
+            Several ranges can be drawn at once (using a single multi draw
+            call) by giving an array of firsts and an array of counts.
+
+        :param int|array|None count:
+            Number of vertices (or indices) to be drawn. Default is to draw
+            up to the end.
         """
 
         self.activate()
-        attributes = self._attributes.values()
-
-        # Get buffer size first attribute
-        # We need more tests here
-        #  - do we have at least 1 attribute ?
-        #  - does all attributes report same count ?
-        # count = (count or attributes[0].size) - first
 
         if isinstance(indices, IndexBuffer):
             indices.activate()
-            gltypes = { np.dtype(np.uint8) : gl.GL_UNSIGNED_BYTE,
-                        np.dtype(np.uint16): gl.GL_UNSIGNED_SHORT,
-                        np.dtype(np.uint32): gl.GL_UNSIGNED_INT }
-            gl.glDrawElements(mode, indices.size, gltypes[indices.dtype], None)
-            indices.deactivate()
+            gltype = Program._itypes[indices.dtype]
+            size = indices.size
+        elif instances is None:
+            size = self._vertex_layout[4]
         else:
-            first = 0
-            # count = (self._count or attributes[0].size) - first
-            count = len(tuple(attributes)[0])
-            gl.glDrawArrays(mode, first, count)
+            size = self._vertex_count()
+
+        # Several ranges
+        if not np.isscalar(first) or not (count is None or np.isscalar(count)):
+            if instances is not None:
+                raise ValueError("Cannot draw instances of several ranges")
+            first = np.asarray(first, dtype=np.int32)
+            count = size - first if count is None else count
+            first, count = np.broadcast_arrays(first, np.asarray(count, dtype=np.int32))
+            first, count = np.ascontiguousarray(first), np.ascontiguousarray(count)
+            if len(count) and isinstance(indices, IndexBuffer):
+                offsets = indices.offset + first.astype(np.intp)*indices.itemsize
+                offsets = (ctypes.c_void_p * len(offsets))(*offsets.tolist())
+                gl.glMultiDrawElements(mode, count, gltype, offsets, len(count))
+            elif len(count):
+                gl.glMultiDrawArrays(mode, first, count, len(count))
+            statistics.count(self, "vertices", int(count.sum()))
+
+        # Single range
+        else:
+            count = size - first if count is None else count
+            if isinstance(indices, IndexBuffer):
+                offset = indices.offset + first*indices.itemsize
+                offset = ctypes.c_void_p(offset) if offset else None
+                if instances is None:
+                    gl.glDrawElements(mode, count, gltype, offset)
+                else:
+                    gl.glDrawElementsInstanced(mode, count, gltype, offset, instances)
+            elif instances is None:
+                gl.glDrawArrays(mode, first, count)
+            else:
+                gl.glDrawArraysInstanced(mode, first, count, instances)
+            statistics.count(self, "vertices", count*(instances or 1))
+
+        if isinstance(indices, IndexBuffer):
+            indices.deactivate()
+        statistics.count(self, "draws")
 
+        # Buffers activated (uploaded) before drawing are left bound
         gl.glBindBuffer( gl.GL_ARRAY_BUFFER, 0 )
         self.deactivate()
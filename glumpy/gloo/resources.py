@@ -0,0 +1,248 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+"""
+The resource manager keeps track of GPU objects (buffers, textures, render
+buffers and framebuffers) created within a GL context (programs and shaders
+being shared through the program cache).
+It accounts for their GPU memory, deletes objects that have been garbage
+collected and can enforce a memory budget by evicting least recently used
+textures (their data being kept on CPU, they are transparently re-uploaded
+at next activation).
+
+Deletion of garbage collected objects is deferred until the end of the
+current frame because there is no guarantee a GL context (let alone the
+right one) is current when Python collects them. The application loop
+processes managers once per iteration, after all windows have been drawn
+(making each window context current in turn), and not from any window
+event. Applications running their own loop must call ``process`` (with
+the context current) at the end of each frame.
+
+**Example usage**:
+
+  .. code:: python
+
+     resources = gloo.resources.get_default()
+     resources.budget = 256*1024*1024
+     ...
+     print(resources.nbytes, resources.totals)
+"""
+import weakref
+import collections
+import numpy as np
+
+from glumpy import gl
+from glumpy.log import log
+
+
+# Resource managers per context
+__managers__ = {}
+
+
+def _delete_buffer(handle):
+    gl.glDeleteBuffers(1, np.array([handle]))
+
+def _delete_texture(handle):
+    gl.glDeleteTextures(np.array([handle], dtype=np.uint32))
+
+def _delete_framebuffer(handle):
+    gl.glDeleteFramebuffers(1, np.array([handle]))
+
+def _delete_renderbuffer(handle):
+    gl.glDeleteRenderbuffers(1, np.array([handle]))
+
+def _delete_program(handle):
+    gl.glDeleteProgram(handle)
+
+def _delete_shader(handle):
+    gl.glDeleteShader(handle)
+
+
+
+class Resource(object):
+    """ GPU resource record (kind, handle, size and last usage frame) """
+
+    __slots__ = ["kind", "handle", "nbytes", "frame", "ref"]
+
+    def __init__(self, kind, handle, nbytes, frame, ref):
+        self.kind = kind
+        self.handle = handle
+        self.nbytes = nbytes
+        self.frame = frame
+        self.ref = ref
+
+
+
+class ResourceManager(object):
+    """
+    GPU resources living in a GL context.
+
+    :param int budget: Maximum number of bytes for textures and buffers
+                       (None means unlimited)
+    """
+
+    _deleters = { "buffer"       : _delete_buffer,
+                  "texture"      : _delete_texture,
+                  "framebuffer"  : _delete_framebuffer,
+                  "renderbuffer" : _delete_renderbuffer,
+                  "program"      : _delete_program,
+                  "shader"       : _delete_shader }
+
+    def __init__(self, budget=None):
+        self._budget = budget
+        self._frame = 0
+        self._resources = collections.OrderedDict()
+        self._pending = []
+
+
+    @property
+    def budget(self):
+        """ Maximum number of bytes (read/write, None means unlimited) """
+
+        return self._budget
+
+    @budget.setter
+    def budget(self, value):
+        """ Maximum number of bytes """
+
+        self._budget = value
+
+
+    @property
+    def frame(self):
+        """ Current frame number """
+
+        return self._frame
+
+
+    @property
+    def nbytes(self):
+        """ Total number of GPU bytes used by registered objects """
+
+        return sum(resource.nbytes for resource in self._resources.values())
+
+
+    @property
+    def totals(self):
+        """ Number of objects and GPU bytes per kind of resource """
+
+        totals = {}
+        for resource in self._resources.values():
+            count, nbytes = totals.get(resource.kind, (0,0))
+            totals[resource.kind] = count+1, nbytes+resource.nbytes
+        return totals
+
+
+    @property
+    def pending(self):
+        """ Number of handles waiting for deletion """
+
+        return len(self._pending)
+
+
+    def register(self, obj):
+        """ Register (or update) a GPU object that has just been created """
+
+        if obj._resource is None:
+            return
+        key = id(obj)
+        resource = self._resources.get(key, None)
+        if resource is None:
+            release = lambda ref, key=key: self._release(key)
+            resource = Resource(obj._resource, obj._handle, 0,
+                                self._frame, weakref.ref(obj, release))
+            self._resources[key] = resource
+        resource.handle = obj._handle
+        resource.nbytes = obj.gpu_nbytes
+        obj._manager = self
+
+
+    def unregister(self, obj):
+        """ Forget about an object (that has been explicitly deleted) """
+
+        self._resources.pop(id(obj), None)
+        obj._manager = None
+
+
+    def touch(self, obj):
+        """ Mark object as used during current frame """
+
+        resource = self._resources.get(id(obj), None)
+        if resource is not None:
+            resource.frame = self._frame
+            self._resources.move_to_end(id(obj))
+
+
+    def evict(self, nbytes):
+        """
+        Evict least recently used textures (not used during current frame
+        and not pinned) until at least nbytes have been freed and return the
+        actual number of freed bytes.
+        """
+
+        freed = 0
+        for key, resource in list(self._resources.items()):
+            if freed >= nbytes:
+                break
+            if resource.kind != "texture" or resource.frame >= self._frame:
+                continue
+            obj = resource.ref()
+            if obj is None or obj._pinned:
+                continue
+            log.debug("GPU: Evicting texture (id=%d, %d bytes)"
+                      % (obj._id, resource.nbytes))
+            freed += resource.nbytes
+            obj.delete()
+        return freed
+
+
+    def process(self):
+        """
+        Process end of frame: delete pending handles and enforce budget.
+        This must be called when the GL context is current.
+        """
+
+        pending, self._pending = self._pending, []
+        for kind, handle in pending:
+            log.debug("GPU: Deleting collected %s (handle=%d)" % (kind, handle))
+            self._deleters[kind](handle)
+
+        if self._budget is not None:
+            nbytes = self.nbytes
+            if nbytes > self._budget:
+                self.evict(nbytes - self._budget)
+        self._frame += 1
+
+
+    def defer(self, kind, handle):
+        """ Schedule deletion of a handle (of given kind) at end of frame """
+
+        self._pending.append((kind, handle))
+
+
+    def _release(self, key):
+        """ Object has been garbage collected, schedule deletion """
+
+        resource = self._resources.pop(key, None)
+        if resource is not None and resource.handle > -1:
+            self._pending.append((resource.kind, resource.handle))
+
+
+
+def get_current_context():
+    """ Get current GL context (None if it cannot be determined) """
+
+    try:
+        return gl.contextdata.getContext()
+    except Exception:
+        return None
+
+
+def get_default():
+    """ Get the resource manager for the current GL context """
+
+    context = get_current_context()
+    if context not in __managers__.keys():
+        __managers__[context] = ResourceManager()
+    return __managers__[context]
@@ -36,8 +36,8 @@ from glumpy import gl
 from glumpy.log import log
 from . snippet import Snippet
 from . globject import GLObject
-from . parser import (remove_comments, preprocess,
-                      get_uniforms, get_attributes, get_hooks)
+from . import cache
+from . parser import remove_comments, preprocess, get_hooks, scan
 
 
 
@@ -61,6 +61,9 @@ class Shader(GLObject):
        module.
     """
 
+    # Shaders are owned by the program cache
+    _resource = None
+
     _gtypes = {
         'float':       gl.GL_FLOAT,
         'vec2':        gl.GL_FLOAT_VEC2,
@@ -81,6 +84,7 @@ class Shader(GLObject):
         'sampler2D':   gl.GL_SAMPLER_2D,
         'sampler3D':   gl.GL_SAMPLER_3D,
         'samplerCube': gl.GL_SAMPLER_CUBE,
+        'sampler2DArray': gl.GL_SAMPLER_2D_ARRAY,
     }
 
 
@@ -106,6 +110,13 @@ class Shader(GLObject):
         self._need_update = True
         self._program = None
 
+        # Key of the compiled shader in the program cache
+        self._cache_key = None
+
+        # Parsed code and declarations (see _parsed)
+        self._parsed = {}
+        self._generation = None
+
 
     def __setitem__(self, name, snippet):
         """
@@ -113,6 +124,24 @@ class Shader(GLObject):
         """
 
         self._snippets[name] = snippet
+        self._parsed = {}
+
+
+    def _cached(self, name, build):
+        """
+        Cached result of build (code or declarations). The cache is
+        invalidated when a snippet is set on the shader or when any snippet
+        is modified (call arguments, aliases or chaining).
+        """
+
+        if self._generation != Snippet._generation:
+            self._parsed = {}
+            self._generation = Snippet._generation
+        try:
+            return self._parsed[name]
+        except KeyError:
+            value = self._parsed[name] = build()
+            return value
 
 
     def _replace_hooks(self, name, snippet):
@@ -182,12 +211,19 @@ class Shader(GLObject):
         """ Reset shader snippets """
 
         self._snippets = {}
+        self._parsed = {}
 
 
     @property
     def code(self):
         """ Shader source code (built from original and snippet codes) """
 
+        return self._cached("code", self._build_code)
+
+
+    def _build_code(self):
+        """ Build source code from original and snippet codes """
+
         # Last minute hook settings
         self._hooked = self._code
         for name,snippet in self._snippets.items():
@@ -198,13 +234,37 @@ class Shader(GLObject):
         for snippet in self._snippets.values():
             if isinstance(snippet, Snippet):
                 deps.extend(snippet.dependencies)
-        for snippet in list(set(deps)):
+        for snippet in dict.fromkeys(deps):
             snippet_code += snippet.mangled_code()
         snippet_code += "// --- Snippets code : end --- //\n"
         return snippet_code + self._hooked
 
 
 
+    @property
+    def final_code(self):
+        """
+        Shader source code as compiled (version and extension directives
+        included)
+        """
+
+        def build():
+            code = self.code
+            if len(self.hooks):
+                hooks = [name for name,snippet in self.hooks]
+                error = "Shader has pending hooks (%s), cannot compile" % hooks
+                raise RuntimeError(error)
+
+            # Set shader version (extension directives, possibly coming from
+            # snippets, must precede any other code)
+            extensions = re.findall(r"^[ \t]*#[ \t]*extension[^\r\n]*$", code, re.MULTILINE)
+            if extensions:
+                code = re.sub(r"^[ \t]*#[ \t]*extension[^\r\n]*$", "", code, flags=re.MULTILINE)
+                code = "\n".join(sorted(set(e.strip() for e in extensions))) + "\n" + code
+            return ("#version %s\n" % self._version) + code
+        return self._cached(("final", self._version), build)
+
+
     def _create(self):
         """ Create the shader """
 
@@ -214,41 +274,55 @@ class Shader(GLObject):
         if not self.code:
             raise RuntimeError("No code has been given")
 
-        # Check that shader object has been created
-        if self._handle <= 0:
-            self._handle = gl.glCreateShader(self._target)
-            if self._handle <= 0:
-                raise RuntimeError("Cannot create shader object")
-
 
     def _update(self):
-        """ Compile the source and checks everything's ok """
+        """
+        Compile the source and checks everything's ok (shaders having the
+        same source share the same compiled shader)
+        """
 
-        log.debug("GPU: Compiling shader")
+        code = self.final_code
+        programs = cache.get_default()
+        key = programs.key(self._target, code)
+        if key == self._cache_key:
+            return
+        self._delete()
+
+        entry = programs.acquire(key, self)
+        if entry is not None:
+            self._handle = entry.handle
+            self._cache_key = key
+            return
 
-        if len(self.hooks):
-            hooks = [name for name,snippet in self.hooks]
-            error = "Shader has pending hooks (%s), cannot compile" % hooks
-            raise RuntimeError(error)
+        log.debug("GPU: Compiling shader")
 
-        # Set shader version
-        code = ("#version %s\n" % self._version) + self.code
-        gl.glShaderSource(self._handle, code)
+        handle = gl.glCreateShader(self._target)
+        if handle <= 0:
+            raise RuntimeError("Cannot create shader object")
+        gl.glShaderSource(handle, code)
 
         # Actual compilation
-        gl.glCompileShader(self._handle)
-        status = gl.glGetShaderiv(self._handle, gl.GL_COMPILE_STATUS)
+        gl.glCompileShader(handle)
+        status = gl.glGetShaderiv(handle, gl.GL_COMPILE_STATUS)
         if not status:
-            error = gl.glGetShaderInfoLog(self._handle).decode()
+            error = gl.glGetShaderInfoLog(handle).decode()
+            gl.glDeleteShader(handle)
             parsed_errors = self._parse_error(error)
             for lineno, mesg in parsed_errors:
                 self._print_error(mesg, lineno - 1)
             raise RuntimeError("Shader compilation error")
 
+        programs.store(key, "shader", handle, self)
+        self._handle = handle
+        self._cache_key = key
+
     def _delete(self):
-        """ Delete shader from GPU memory (if it was present). """
+        """ Release shader from GPU memory (if it was present). """
 
-        gl.glDeleteShader(self._handle)
+        if self._cache_key is not None:
+            cache.get_default().release(self._cache_key, self)
+        self._cache_key = None
+        self._handle = -1
 
     _ERROR_RE = [
         # Nvidia
@@ -319,26 +393,42 @@ class Shader(GLObject):
         """ Shader hooks (place where snippets can be inserted) """
 
         # We get hooks from the original code, not the hooked one
-        code = remove_comments(self._hooked)
-        return get_hooks(code)
+        hooked, hooks = self._parsed.get("hooks", (None, None))
+        if hooked is not self._hooked:
+            hooked = self._hooked
+            hooks = get_hooks(remove_comments(hooked))
+            self._parsed["hooks"] = hooked, hooks
+        return list(hooks)
 
 
     @property
     def uniforms(self):
         """ Shader uniforms obtained from source code """
 
-        code = remove_comments(self.code)
         gtypes = Shader._gtypes
-        return [ (n,gtypes[t]) for (n,t) in get_uniforms(code) ]
+        return [(n,gtypes[t]) for (n,t) in self._declarations["uniforms"]]
+
+
+    @property
+    def blocks(self):
+        """ Shader uniform blocks obtained from source code """
+
+        return list(self._declarations["blocks"])
 
 
     @property
     def attributes(self):
         """ Shader attributes obtained from source code """
 
-        code = remove_comments(self.code)
         gtypes = Shader._gtypes
-        return [(n,gtypes[t]) for (n,t) in get_attributes(code)]
+        return [(n,gtypes[t]) for (n,t) in self._declarations["attributes"]]
+
+
+    @property
+    def _declarations(self):
+        """ Declarations scanned from source code (see parser.scan) """
+
+        return self._cached("declarations", lambda: scan(self.code))
 
 
 
@@ -349,9 +439,8 @@ class VertexShader(Shader):
     def __init__(self, code=None, version="120"):
         Shader.__init__(self, gl.GL_VERTEX_SHADER, code, version)
 
-    @property
-    def code(self):
-        code = super(VertexShader, self).code
+    def _build_code(self):
+        code = super(VertexShader, self)._build_code()
         code = "#define _GLUMPY__VERTEX_SHADER__\n" + code
         return code
 
@@ -369,9 +458,8 @@ class FragmentShader(Shader):
     def __init__(self, code=None, version="120"):
         Shader.__init__(self, gl.GL_FRAGMENT_SHADER, code, version)
 
-    @property
-    def code(self):
-        code = super(FragmentShader, self).code
+    def _build_code(self):
+        code = super(FragmentShader, self)._build_code()
         code = "#define _GLUMPY__FRAGMENT_SHADER__\n" + code
         return code
 
@@ -4,7 +4,9 @@
 # -----------------------------------------------------------------------------
 import re
 import copy
+import numpy as np
 from . import parser
+from . buffer import UniformBuffer, std140
 
 
 class Snippet(object):
@@ -42,16 +44,41 @@ class Snippet(object):
       A = Snippet(code="...")
       B = Snippet(code="...")
       C = A("P") + B("P")
+
+    Snippet uniforms can be gathered into a uniform block (``block=True``)
+    whose values live in a single uniform buffer shared by all the programs
+    the snippet is attached to. Setting a snippet variable then writes into
+    the buffer that is uploaded once, whatever the number of programs::
+
+      transform = PanZoom(aspect=1, block=True)
+
+    Only float, int, uint and bool scalars and vectors as well as mat4 are
+    gathered (samplers, arrays, mat2 and mat3 remain regular uniforms) and
+    uniform blocks require GLSL 1.40 or the ARB_uniform_buffer_object
+    extension (that is enabled by the snippet code).
     """
 
     # Internal id counter for automatic snippets name mangling
     _id_counter = 1
 
+    # Generation counter, incremented whenever a snippet is modified (call
+    # arguments, aliases or chaining) such that generated code can be cached
+    _generation = 0
+
     # Class aliases
     aliases = { }
 
+    # Uniform types that can be gathered into a uniform block
+    _block_types = ("float", "vec2", "vec3", "vec4",
+                    "int", "ivec2", "ivec3", "ivec4",
+                    "uint", "uvec2", "uvec3", "uvec4",
+                    "bool", "bvec2", "bvec3", "bvec4", "mat4")
+
     def __init__(self, code=None, default=None, *args, **kwargs):
 
+        # Whether uniforms are gathered into a uniform block
+        block = kwargs.pop("block", False)
+
         # Original source code
         self._source_code = parser.merge_includes(code)
 
@@ -105,6 +132,79 @@ class Snippet(object):
         # Attached programs
         self._programs = []
 
+        # Version of this snippet (incremented when it is modified) and
+        # cached generated code (see _cached)
+        self._version = 0
+        self._mangled = None
+        self._generated = {}
+        self._generated_generation = None
+
+        # Uniform block (name and buffer)
+        self._block_name = None
+        self._block = None
+        if block:
+            self._build_block()
+
+
+    def _build_block(self):
+        """ Gather uniforms into a uniform block backed by a uniform buffer """
+
+        members = [(name, gtype) for (name, gtype) in self._objects["uniforms"]
+                   if gtype in Snippet._block_types and "[" not in name]
+        if not members:
+            return
+        names = [name for (name, gtype) in members]
+
+        # Move declarations into the block
+        declarations = []
+        def replace(match):
+            gtype = match.group("type")
+            moved, kept = [], []
+            for name in match.group("names").split(","):
+                if gtype in Snippet._block_types and name.strip() in names:
+                    moved.append(name.strip())
+                else:
+                    kept.append(name.strip())
+            if moved:
+                declarations.append("%s %s;" % (gtype, ", ".join(moved)))
+            if kept:
+                return "uniform %s %s;" % (gtype, ", ".join(kept))
+            return ""
+
+        regex = re.compile(r"uniform\s+(?P<type>\w+)\s+(?P<names>[^;{}]+);")
+        code = re.sub(regex, replace, self._source_code)
+
+        self._block_name = "block_%d" % self._id
+        self._source_code = ("#extension GL_ARB_uniform_buffer_object : enable\n"
+                             "layout(std140) uniform %s { %s };\n"
+                             % (self._block_name, " ".join(declarations))) + code
+
+        dtype = std140([(self._symbols[name], gtype) for (name, gtype) in members])
+        self._block = np.zeros(1, dtype).view(UniformBuffer)
+
+
+    def _modified(self):
+        """ Snippet (call arguments, aliases or chaining) has been modified """
+
+        self._version += 1
+        Snippet._generation += 1
+
+
+    def _cached(self, key, build):
+        """
+        Cached result of build (globals, dependencies or calls), invalidated
+        whenever any snippet is modified.
+        """
+
+        if self._generated_generation != Snippet._generation:
+            self._generated = {}
+            self._generated_generation = Snippet._generation
+        try:
+            return self._generated[key]
+        except KeyError:
+            value = self._generated[key] = build()
+            return value
+
 
     def process_kwargs(self, **kwargs):
         """ Process kwargs as given in __init__() or __call__() """
@@ -132,6 +232,20 @@ class Snippet(object):
         return self._programs
 
 
+    @property
+    def block(self):
+        """ Uniform buffer holding the snippet uniform block (if any) """
+
+        return self._block
+
+
+    @property
+    def block_name(self):
+        """ Name of the snippet uniform block (if any) """
+
+        return self._block_name
+
+
     @property
     def objects(self):
         """
@@ -174,12 +288,12 @@ class Snippet(object):
         taking into account symbols from arguments (call) and next (operators).
         """
 
-        """ Global symbols """
-
-        symbols = {}
-        for snippet in self.snippets:
-            symbols.update(snippet.locals)
-        return symbols
+        def build():
+            symbols = {}
+            for snippet in self.snippets:
+                symbols.update(snippet.locals)
+            return symbols
+        return dict(self._cached("globals", build))
 
 
     @property
@@ -229,15 +343,17 @@ class Snippet(object):
           D.snippets # [A,B,C]
         """
 
-        all = [self,]
-        for snippet in self._args:
-            if isinstance(snippet, Snippet):
-                all.extend(snippet.snippets)
-        if self.next:
-            operand, snippet = self._next
-            if isinstance(snippet, Snippet):
-                all.extend(snippet.snippets)
-        return all
+        def build():
+            all = [self,]
+            for snippet in self._args:
+                if isinstance(snippet, Snippet):
+                    all.extend(snippet.snippets)
+            if self.next:
+                operand, snippet = self._next
+                if isinstance(snippet, Snippet):
+                    all.extend(snippet.snippets)
+            return all
+        return list(self._cached("snippets", build))
 
 
     @property
@@ -267,6 +383,15 @@ class Snippet(object):
         return self.symbols.get(name,None)
 
 
+    def _lookup_block(self, name):
+        """ Uniform buffer (of this snippet or children) holding name """
+
+        for snippet in self.snippets:
+            if snippet._block is not None and name in snippet._block.dtype.names:
+                return snippet._block
+        return None
+
+
     def attach(self, program):
         """
         Attach this snippet to a program
@@ -325,16 +450,20 @@ class Snippet(object):
           S.dependencies # [A,B,C,D]
         """
 
-        deps = [self]
-        for snippet in self._args:
-            if isinstance(snippet, Snippet):
-                deps.extend(snippet.dependencies)
-        if self.next:
-            operand, snippet = self._next
-            if isinstance(snippet, Snippet):
-                deps.extend(snippet.dependencies)
+        def build():
+            deps = [self]
+            for snippet in self._args:
+                if isinstance(snippet, Snippet):
+                    deps.extend(snippet.dependencies)
+            if self.next:
+                operand, snippet = self._next
+                if isinstance(snippet, Snippet):
+                    deps.extend(snippet.dependencies)
 
-        return list(set(deps))
+            # Unique snippets, in a stable order such that generated code
+            # does not change from one run to the other
+            return list(dict.fromkeys(deps))
+        return list(self._cached("dependencies", build))
 
 
     @property
@@ -350,18 +479,30 @@ class Snippet(object):
     def mangled_code(self):
         """ Generate mangled code """
 
-        code = self._source_code
+        # Code only depends on this snippet source and symbols
+        if self._mangled is not None and self._mangled[0] == self._version:
+            return self._mangled[1]
+
         objects = self._objects
-        functions = objects["functions"]
-        names = objects["uniforms"] + objects["attributes"] + objects["varyings"]
-        for _,name,_,_ in functions:
-            symbol = self.symbols[name]
-            code = re.sub(r"(?<=[^\w])(%s)(?=\()" % name, symbol, code)
-        for name, _ in names:
-            # Variable starting "__" are protected and unaliased
-            #if not name.startswith("__"):
-            symbol = self.symbols[name]
-            code = re.sub(r"(?<=[^\w])(%s)(?=[^\w])" % name, symbol, code)
+        functions = [name for _,name,_,_ in objects["functions"]]
+        names = [name for name,_ in objects["uniforms"] + objects["attributes"] + objects["varyings"]]
+
+        # All symbols are renamed in a single pass (functions are only
+        # renamed when called or defined)
+        # Variable starting "__" are protected and unaliased
+        #if not name.startswith("__"):
+        code = self._source_code
+        patterns = []
+        if functions:
+            patterns.append(r"(?:%s)(?=\()" % "|".join(map(re.escape, functions)))
+        if names:
+            patterns.append(r"(?:%s)(?=[^\w])" % "|".join(map(re.escape, names)))
+        if patterns:
+            symbols = self.symbols
+            regex = re.compile(r"(?<=[^\w])(?:%s)" % "|".join(patterns))
+            code = regex.sub(lambda match: symbols[match.group()], code)
+
+        self._mangled = self._version, code
         return code
 
 
@@ -382,6 +523,13 @@ class Snippet(object):
                               with shader arguments
         """
 
+        return self._cached(("call", function, arguments, override),
+                            lambda: self._mangled_call(function, arguments, override))
+
+
+    def _mangled_call(self, function, arguments, override):
+        """ Compute the call (see mangled_call) """
+
         s = ""
 
         # Is there a function defined in the snippet ?
@@ -463,6 +611,7 @@ class Snippet(object):
         for name, alias in kwargs.items():
            self._symbols[name] = alias
 
+        self._modified()
         return self
 
 
@@ -479,6 +628,7 @@ class Snippet(object):
     def __op__(self, operand, other):
         snippet = self.copy()
         snippet.last._next = operand,other
+        snippet.last._modified()
         return snippet
 
     def __add__(self, other):
@@ -541,7 +691,8 @@ class Snippet(object):
           1. this snippet
           2. the children (args)
           3. the sibling (next)
-          4. the attached programs
+          4. the uniform blocks
+          5. the attached programs
         """
 
         # First we look in all snippets
@@ -552,6 +703,12 @@ class Snippet(object):
             if hasattr(snippet, key):
                 return getattr(snippet, key)
 
+        # Then we look into uniform blocks
+        name = self.lookup(key) or key
+        block = self._lookup_block(name)
+        if block is not None:
+            return block[name][0]
+
         # Then we look into all attached program
         if len(self._programs) > 0:
             name = self.lookup(key)
@@ -572,7 +729,8 @@ class Snippet(object):
           1. this snippet
           2. the children (args)
           3. the sibling (next)
-          4. the attached programs
+          4. the uniform blocks
+          5. the attached programs
         """
 
         name = self.lookup(key) or key
@@ -585,9 +743,14 @@ class Snippet(object):
                 setattr(snippet, name, value)
                 found = True
 
+        # Then we look into uniform blocks (uploaded once for all programs)
+        block = self._lookup_block(name)
+        if block is not None:
+            block[name] = value
+            found = True
 
         # Then we look into all attached program
-        if len(self._programs) > 0:
+        elif len(self._programs) > 0:
             for program in self._programs:
                 try:
                     program[name] = value
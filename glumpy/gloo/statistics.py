@@ -0,0 +1,107 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+"""
+GPU statistics are counters maintained by gloo objects while they are
+updated, bound and drawn. They are accumulated per object, per frame and
+since the start of the application (or the last reset). The application
+loop closes a frame once per iteration, after all windows have been drawn
+and not from any window event. Applications running their own loop must
+call ``end_frame`` at the end of each frame.
+
+Counters are:
+
+* ``updates``: number of object updates (``_update`` calls)
+* ``uploads``: number of upload calls (glBufferData, glBufferSubData, glTexSubImage)
+* ``uploaded``: number of uploaded bytes
+* ``draws``: number of draw calls
+* ``vertices``: number of submitted vertices (or indices)
+* ``program_binds``: number of program binds
+* ``texture_binds``: number of texture binds
+* ``buffer_binds``: number of buffer binds
+
+**Example usage**:
+
+  .. code:: python
+
+     @window.event
+     def on_draw(dt):
+         window.clear()
+         program.draw(gl.GL_TRIANGLES)
+         print(gloo.stats()["last"]["uploaded"])
+         print(gloo.stats(program))
+"""
+
+keys = ("updates", "uploads", "uploaded", "draws", "vertices",
+        "program_binds", "texture_binds", "buffer_binds")
+
+# Number of closed frames
+__frames__ = 0
+
+# Counters for the current frame, the last closed frame and all frames
+__frame__ = dict.fromkeys(keys, 0)
+__last__  = dict.fromkeys(keys, 0)
+__total__ = dict.fromkeys(keys, 0)
+
+
+def count(obj, key, value=1):
+    """
+    Increment counter key of the current frame and of the given object.
+
+    :param GLObject obj: Object the counter relates to
+    :param str key: Counter name
+    :param int value: Increment
+    """
+
+    __frame__[key] += value
+    counters = obj._stats
+    if counters is None:
+        counters = obj._stats = dict.fromkeys(keys, 0)
+    counters[key] += value
+
+
+def end_frame():
+    """ Close current frame and start a new one """
+
+    global __frames__, __frame__, __last__
+
+    for key, value in __frame__.items():
+        __total__[key] += value
+    __last__ = __frame__
+    __frame__ = dict.fromkeys(keys, 0)
+    __frames__ += 1
+
+
+def reset():
+    """ Reset all (non per object) counters """
+
+    global __frames__, __frame__, __last__, __total__
+
+    __frames__ = 0
+    __frame__ = dict.fromkeys(keys, 0)
+    __last__  = dict.fromkeys(keys, 0)
+    __total__ = dict.fromkeys(keys, 0)
+
+
+def stats(obj=None):
+    """
+    Get statistics.
+
+    :param GLObject obj: Object to get counters for. If None, a dictionary
+                         is returned with the number of closed frames
+                         (``frames``) and the counters of the current frame
+                         (``frame``), the last closed frame (``last``) and
+                         all closed frames (``total``).
+    """
+
+    if obj is not None:
+        # Views share the counters of their base
+        while hasattr(getattr(obj, "base", None), "_stats"):
+            obj = obj.base
+        return dict(obj._stats or dict.fromkeys(keys, 0))
+
+    return { "frames" : __frames__,
+             "frame"  : dict(__frame__),
+             "last"   : dict(__last__),
+             "total"  : dict(__total__) }
@@ -0,0 +1,65 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import unittest
+import numpy as np
+
+from glumpy import gl
+from glumpy.benchmarks import harness
+
+def setUpModule():
+    global backend
+    backend = gl.use("mock")
+
+
+def tearDownModule():
+    if backend is not None:
+        gl.use(backend)
+
+
+@harness.benchmark("test.upload", repeat=2)
+def upload():
+    def run():
+        handle = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, handle)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, 16, np.zeros(4, np.float32),
+                        gl.GL_DYNAMIC_DRAW)
+    return run
+
+@harness.benchmark("test.error")
+def error():
+    raise ValueError("broken")
+
+
+# --------------------------------------------------------------- Benchmarks ---
+class BenchmarkTest(unittest.TestCase):
+
+    def test_run(self):
+        results = harness.run(["test.*"])
+        assert sorted(results["benchmarks"].keys()) == ["test.error", "test.upload"]
+        result = results["benchmarks"]["test.upload"]
+        assert result["repeat"] == 2
+        assert result["calls"] == 3
+        assert result["best"] <= result["mean"]
+        assert results["benchmarks"]["test.error"]["error"] == "ValueError: broken"
+
+    def test_backend(self):
+        previous = gl.use("pyopengl")
+        try:
+            results = harness.run(["test.upload"])
+            assert "error" not in results["benchmarks"]["test.upload"]
+            assert gl.__backend__ == "pyopengl"
+        finally:
+            gl.use(previous)
+
+    def test_compare(self):
+        before = { "benchmarks": { "a": {"best": 1.0}, "b": {"best": 1.0},
+                                   "c": {"error": "..."} } }
+        after  = { "benchmarks": { "a": {"best": 2.0}, "b": {"best": 1.05},
+                                   "c": {"best": 1.0} } }
+        assert harness.compare(before, after, 0.1) == [("a", 1.0, 2.0, 2.0)]
+
+
+if __name__ == "__main__":
+    unittest.main()
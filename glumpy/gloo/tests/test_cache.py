@@ -0,0 +1,165 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import os
+import gc
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from glumpy import gl
+from glumpy.gloo import cache
+from glumpy.gloo.program import Program
+
+def setUpModule():
+    global backend
+    backend = gl.use("mock")
+
+
+def tearDownModule():
+    if backend is not None:
+        gl.use(backend)
+
+
+vertex = """
+uniform float scale;
+attribute vec2 position;
+void main() { gl_Position = vec4(scale*position, 0.0, 1.0); }
+"""
+
+fragment = """
+void main() { gl_FragColor = vec4(1.0); }
+"""
+
+
+# ------------------------------------------------------------ ProgramCache ---
+class ProgramCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        gl.mockgl.reset()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def program(self, scale=1):
+        program = Program(vertex, fragment, count=4)
+        program["position"] = np.zeros((4,2))
+        program["scale"] = scale
+        return program
+
+    def test_shared(self):
+        P1, P2 = self.program(), self.program()
+        P1.draw(gl.GL_TRIANGLES)
+        P2.draw(gl.GL_TRIANGLES)
+        assert P1.handle == P2.handle
+        assert gl.recorder.count("glCompileShader") == 2
+        assert gl.recorder.count("glLinkProgram") == 1
+        assert cache.get_default().hits == 1
+
+    def test_different(self):
+        P1 = self.program()
+        P2 = Program(vertex, fragment.replace("1.0", "0.5"), count=4)
+        P2["position"] = np.zeros((4,2))
+        P1.draw(gl.GL_TRIANGLES)
+        P2.draw(gl.GL_TRIANGLES)
+        assert P1.handle != P2.handle
+        assert gl.recorder.count("glLinkProgram") == 2
+
+        # Vertex shader is shared
+        assert gl.recorder.count("glCompileShader") == 3
+
+    def test_uniforms(self):
+        P1, P2 = self.program(1), self.program(2)
+        P1.draw(gl.GL_TRIANGLES)
+        P2.draw(gl.GL_TRIANGLES)
+        gl.recorder.clear()
+        P1.draw(gl.GL_TRIANGLES)
+        P1.draw(gl.GL_TRIANGLES)
+        P2.draw(gl.GL_TRIANGLES)
+        assert gl.recorder.count("glUniform1fv") == 2
+
+    def test_shared_uniforms(self):
+        P1, P2 = self.program(), self.program()
+        P1.draw(gl.GL_TRIANGLES)
+        P2.draw(gl.GL_TRIANGLES)
+        gl.recorder.clear()
+        for i in range(3):
+            P1.draw(gl.GL_TRIANGLES)
+            P2.draw(gl.GL_TRIANGLES)
+        assert gl.recorder.count("glUniform1fv") == 0
+
+        # Only values differing from the shared program are uploaded
+        P2["scale"] = 2
+        P1.draw(gl.GL_TRIANGLES)
+        P2.draw(gl.GL_TRIANGLES)
+        P2.draw(gl.GL_TRIANGLES)
+        assert gl.recorder.count("glUniform1fv") == 1
+        P1.draw(gl.GL_TRIANGLES)
+        assert gl.recorder.count("glUniform1fv") == 2
+
+    def test_release(self):
+        P1, P2 = self.program(), self.program()
+        P1.draw(gl.GL_TRIANGLES)
+        P2.draw(gl.GL_TRIANGLES)
+        handle = P1.handle
+        P1.delete()
+        assert gl.recorder.count("glDeleteProgram") == 0
+        P2.delete()
+        assert gl.recorder.count("glDeleteProgram") == 1
+        assert handle not in gl.mockgl.state.programs
+
+    def test_collect(self):
+        program = self.program()
+        program.draw(gl.GL_TRIANGLES)
+        del program
+        gc.collect()
+        assert len(cache.get_default()) == 0
+
+    def test_binary(self):
+        cache.get_default().directory = self.directory
+        self.program().draw(gl.GL_TRIANGLES)
+        assert gl.recorder.count("glGetProgramBinary") == 1
+        assert len(os.listdir(self.directory)) == 1
+
+        # A new context loads the binary
+        gl.mockgl.reset()
+        cache.get_default().directory = self.directory
+        program = self.program()
+        program.draw(gl.GL_TRIANGLES)
+        assert cache.get_default().loads == 1
+        assert gl.recorder.count("glCompileShader") == 0
+        assert gl.recorder.count("glLinkProgram") == 0
+        assert [name for name, gtype in program.active_uniforms] == ["scale"]
+
+    def test_rejected_binary(self):
+        cache.get_default().directory = self.directory
+        self.program().draw(gl.GL_TRIANGLES)
+        filename = os.path.join(self.directory, os.listdir(self.directory)[0])
+        with open(filename, "r+b") as file:
+            file.write(b"\0\0\0\0")
+
+        gl.mockgl.reset()
+        cache.get_default().directory = self.directory
+        self.program().draw(gl.GL_TRIANGLES)
+        assert cache.get_default().loads == 0
+        assert gl.recorder.count("glProgramBinary") == 1
+        assert gl.recorder.count("glLinkProgram") == 1
+
+        # Binary has been replaced
+        gl.mockgl.reset()
+        cache.get_default().directory = self.directory
+        self.program().draw(gl.GL_TRIANGLES)
+        assert cache.get_default().loads == 1
+
+    def test_clear(self):
+        cache.get_default().directory = self.directory
+        self.program().draw(gl.GL_TRIANGLES)
+        cache.get_default().clear()
+        assert os.listdir(self.directory) == []
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import unittest
+import numpy as np
+
+from glumpy.gloo.gpudata import GPUData, merge_range
+
+
+# -------------------------------------------------------------- merge_range ---
+class MergeRangeTest(unittest.TestCase):
+
+    def test_disjoint(self):
+        ranges = []
+        merge_range(ranges, 100, 200)
+        merge_range(ranges, 0, 10)
+        merge_range(ranges, 300, 400)
+        assert ranges == [[0, 10], [100, 200], [300, 400]]
+
+    def test_overlap(self):
+        ranges = [[0, 10], [100, 200], [300, 400]]
+        merge_range(ranges, 150, 350)
+        assert ranges == [[0, 10], [100, 400]]
+
+    def test_threshold(self):
+        ranges = [[0, 10], [100, 200]]
+        merge_range(ranges, 20, 30, threshold=10)
+        assert ranges == [[0, 30], [100, 200]]
+
+    def test_count(self):
+        ranges = [[0, 10], [100, 200], [300, 400]]
+        merge_range(ranges, 210, 220, count=3)
+        assert ranges == [[0, 10], [100, 220], [300, 400]]
+
+
+# ------------------------------------------------------------------ GPUData ---
+class GPUDataTest(unittest.TestCase):
+
+    def test_init(self):
+        Z = np.zeros(1000, np.float32).view(GPUData)
+        assert Z.pending_ranges == [(0, 4000)]
+        assert Z.pending_data == (0, 4000)
+
+    def test_sparse_setitem(self):
+        Z = np.zeros(1000, np.float32).view(GPUData)
+        Z._pending_data = None
+        Z[0] = 1
+        Z[-1] = 1
+        assert Z.pending_ranges == [(0, 4), (3996, 4000)]
+        assert Z.pending_data == (0, 4000)
+
+    def test_merge_threshold(self):
+        Z = np.zeros(1000, np.float32).view(GPUData)
+        Z._pending_data = None
+        Z.merge_threshold = 0
+        Z[0] = 1
+        Z[2] = 1
+        assert Z.pending_ranges == [(0, 4), (8, 12)]
+        Z.merge_threshold = 4
+        Z[4] = 1
+        assert Z.pending_ranges == [(0, 4), (8, 20)]
+        Z[1] = 1
+        assert Z.pending_ranges == [(0, 20)]
+
+    def test_max_ranges(self):
+        Z = np.zeros(1000, np.float32).view(GPUData)
+        Z._pending_data = None
+        Z.merge_threshold = 0
+        Z.max_ranges = 2
+        Z[0] = Z[10] = Z[500] = 1
+        assert Z.pending_ranges == [(0, 44), (2000, 2004)]
+
+    def test_view_setitem(self):
+        Z = np.zeros((100, 4), np.float32).view(GPUData)
+        Z._pending_data = None
+        Z.merge_threshold = 0
+        V = Z[50:]
+        V[0] = 1
+        V[-1] = 1
+        assert Z.pending_ranges == [(800, 816), (1584, 1600)]
+
+
+    def test_reversed_view(self):
+        Z = np.zeros(100, np.float32).view(GPUData)
+        Z._pending_data = None
+        Z.merge_threshold = 0
+        Z[::-1] = np.arange(100)
+        assert Z.pending_ranges == [(0, 400)]
+        Z._pending_data = None
+        Z[80:10:-2] = 1
+        Z[90:95] = 5
+        assert Z.pending_ranges == [(48, 324), (360, 380)]
+
+    def test_invalid_range(self):
+        self.assertRaises(AssertionError, merge_range, [], 10, 0)
+
+
+# ---------------------------------------------------------- GPUData (index) ---
+class GPUDataIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Z = np.zeros((1000, 3), np.float32).view(GPUData)
+        self.Z._pending_data = None
+        self.Z.merge_threshold = 0
+        self.Z.max_ranges = 10000
+
+    def test_integer_array(self):
+        Z = self.Z
+        Z[[10, 500, 12]] = 1
+        assert Z.pending_ranges == [(120, 132), (144, 156), (6000, 6012)]
+        assert np.all(Z[[10, 500, 12]] == 1)
+
+    def test_negative_integer_array(self):
+        Z = self.Z
+        Z[np.array([-1])] = 1
+        assert Z.pending_ranges == [(11988, 12000)]
+
+    def test_boolean_mask(self):
+        Z = self.Z
+        mask = np.zeros(len(Z), dtype=bool)
+        mask[[3, 4, 900]] = True
+        Z[mask] = 1
+        assert Z.pending_ranges == [(36, 60), (10800, 10812)]
+
+    def test_mixed_index(self):
+        Z = self.Z
+        Z[[3, 5], 1] = 1
+        assert Z.pending_ranges == [(40, 44), (64, 68)]
+
+    def test_random_subset(self):
+        Z = self.Z
+        index = np.random.choice(len(Z), len(Z)//100, replace=False)
+        Z[index] = 1
+        nbytes = sum(stop-start for start, stop in Z.pending_ranges)
+        assert nbytes == len(index) * 3 * 4
+
+    def test_view_index(self):
+        Z = self.Z
+        Z[::-1][[0]] = 1
+        assert Z.pending_ranges == [(11988, 12000)]
+
+    def test_boolean_scalar(self):
+        Z = self.Z
+        Z[True] = 1
+        assert Z.pending_ranges == [(0, 12000)]
+        Z._pending_data = None
+        Z[np.bool_(True), 1] = 2
+        assert Z.pending_ranges == [(12, 24)]
+        Z._pending_data = None
+        Z[False] = 3
+        assert Z.pending_ranges == []
+        C = Z[True]
+        C[0, 0] = 4
+        assert Z.pending_ranges == []
+        assert C.pending_ranges == [(0, 12000)]
+
+    def test_getitem_copy(self):
+        Z = self.Z
+        C = Z[[1, 2]]
+        C[0] = 1
+        assert Z.pending_ranges == []
+        assert C.pending_ranges == [(0, 24)]
+
+
+# ---------------------------------------------------------- GPUData (ufunc) ---
+class GPUDataUfuncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Z = np.zeros(1000, np.float32).view(GPUData)
+        self.Z._pending_data = None
+        self.Z.merge_threshold = 0
+
+    def test_inplace_operators(self):
+        Z = self.Z
+        Z[10:20] += 1
+        Z[30:40] /= 2
+        Z[50:60] //= 2
+        assert Z.pending_ranges == [(40, 80), (120, 160), (200, 240)]
+
+    def test_out(self):
+        Z = self.Z
+        np.add(Z[10:20], 1, out=Z[10:20])
+        assert Z.pending_ranges == [(40, 80)]
+        assert np.all(Z[10:20] == 1)
+
+    def test_at(self):
+        Z = self.Z
+        np.add.at(Z, [5, 5, 900], 1)
+        assert Z.pending_ranges == [(20, 24), (3600, 3604)]
+        assert Z[5] == 2
+
+    def test_copyto(self):
+        Z = self.Z
+        np.copyto(Z[100:200], 1)
+        assert Z.pending_ranges == [(400, 800)]
+
+    def test_fill(self):
+        Z = self.Z
+        Z[100:200].fill(1)
+        assert Z.pending_ranges == [(400, 800)]
+
+    def test_no_out(self):
+        Z = self.Z
+        Y = Z + 1
+        assert Z.pending_ranges == []
+        assert np.all(Y == 1)
+
+    def test_no_out_setitem(self):
+        Z = self.Z
+        Y = Z + 1
+        Y[0] = 3
+        assert Y.pending_ranges == [(0, 4000)]
+        assert Z.pending_ranges == []
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from glumpy import library
+from glumpy.gloo import parser
+
+
+# ----------------------------------------------------------------- Library ---
+class LibraryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.interval = library.interval
+        library.refresh()
+
+    def tearDown(self):
+        library.interval = self.interval
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content, mtime):
+        filename = os.path.join(self.directory, name)
+        with open(filename, "w") as file:
+            file.write(content)
+        os.utime(filename, (mtime, mtime))
+        return filename
+
+    def test_find(self):
+        filename = library.find("transforms/pvm.glsl")
+        assert filename.endswith(os.path.join("transforms", "pvm.glsl"))
+        assert library.find("pvm.glsl") == filename
+        assert library.find("math/constants.glsl") == library.find("constants.glsl")
+        assert library.find("unknown.glsl") is None
+        assert library.get("void main() {}") == "void main() {}"
+
+    def test_indexed(self):
+        library.interval = 3600
+        library.find("transforms/pvm.glsl")
+        with mock.patch("os.listdir") as listdir, mock.patch("os.path.exists") as exists:
+            for i in range(100):
+                library.find("transforms/pvm.glsl")
+                library.get("transforms/pvm.glsl")
+            assert listdir.call_count == 0
+            assert exists.call_count == 0
+
+    def test_modified(self):
+        library.interval = 0
+        filename = self.write("include.glsl", "float a; // a\n", 1000)
+        code = '#include "%s"\nvoid main() {}\n' % filename
+        assert "float a;" in parser.merge_includes(code)
+        assert "// a" not in parser.merge_includes(code)
+        self.write("include.glsl", "float b;\n", 2000)
+        assert library.get(filename) == "float b;\n"
+        assert "float b;" in parser.merge_includes(code)
+
+    def test_cached(self):
+        library.interval = 3600
+        filename = self.write("include.glsl", "float a;\n", 1000)
+        code = '#include "%s"\nvoid main() {}\n' % filename
+        parser.preprocess(code)
+        with mock.patch("builtins.open") as open:
+            for i in range(100):
+                parser.merge_includes(code)
+                parser.preprocess(code)
+            assert open.call_count == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
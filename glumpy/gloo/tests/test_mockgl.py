@@ -0,0 +1,319 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import unittest
+import numpy as np
+
+from glumpy import gl
+from glumpy.gloo.program import Program
+from glumpy.gloo.snippet import Snippet
+from glumpy.gloo.buffer import VertexBuffer, IndexBuffer, UniformBuffer, std140
+from glumpy.gloo.texture import Texture2DArray
+
+def setUpModule():
+    global backend
+    backend = gl.use("mock")
+
+
+def tearDownModule():
+    if backend is not None:
+        gl.use(backend)
+
+
+vertex = """
+uniform float scale;
+uniform vec4 colors[3];
+attribute vec2 position;
+void main() { gl_Position = vec4(scale*position, 0.0, 1.0); }
+"""
+
+fragment = """
+uniform vec4 color; // uniform vec4 comment;
+void main() { gl_FragColor = color; }
+"""
+
+
+# ------------------------------------------------------------------ MockGL ---
+class MockGLTest(unittest.TestCase):
+
+    def setUp(self):
+        gl.mockgl.reset()
+
+    def test_recorder(self):
+        handle = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, handle)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, 100, None, gl.GL_DYNAMIC_DRAW)
+        gl.glBufferSubData(gl.GL_ARRAY_BUFFER, 10, 20, np.zeros(20, np.ubyte))
+        assert gl.recorder.count() == 4
+        assert gl.recorder.count("glBufferSubData") == 1
+        assert gl.recorder.nbytes == 20
+        assert gl.recorder.calls[-1].args == (gl.GL_ARRAY_BUFFER, 10, 20, None)
+
+    def test_buffer_overflow(self):
+        handle = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, handle)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, 100, None, gl.GL_DYNAMIC_DRAW)
+        self.assertRaises(gl.mockgl.GLError, gl.glBufferSubData,
+                          gl.GL_ARRAY_BUFFER, 90, 20, None)
+
+    def test_unknown_function(self):
+        gl.glHint(gl.GL_NICEST, gl.GL_NICEST)
+        assert gl.recorder.count("glHint") == 1
+
+    def test_program(self):
+        program = Program(vertex, fragment, count=4)
+        program["position"] = np.zeros((4,2))
+        program["scale"] = 1
+        program["colors[1]"] = 1, 0, 0, 1
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        draws = [call for call in gl.recorder.calls if call.name == "glDrawArrays"]
+        assert draws[0].args == (gl.GL_TRIANGLE_STRIP, 0, 4)
+        assert sorted(name for name, gtype in program.active_uniforms) == \
+            ["color", "colors[0]", "colors[1]", "colors[2]", "scale"]
+        assert program.active_attributes == [("position", gl.GL_FLOAT_VEC2)]
+        assert program._uniforms["colors[1]"].handle == 2
+
+    def test_redundant_uniforms(self):
+        program = Program(vertex, fragment, count=4)
+        program["position"] = np.zeros((4,2))
+        program["scale"] = 1
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        uploads = lambda: gl.recorder.count("glUniform1fv")
+        assert uploads() == 1
+
+        # Same value
+        gl.recorder.clear()
+        program["scale"] = 1.0
+        assert not program._uniforms["scale"].need_update
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert uploads() == 0
+
+        # Value changed and changed back before drawing
+        program["scale"] = 2
+        program["scale"] = 1
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert uploads() == 0
+
+        program["scale"] = 2
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert uploads() == 1
+        location = program._uniforms["scale"].handle
+        assert program._uniform_values[location] == np.float32(2).tobytes()
+
+    def test_vertex_arrays(self):
+        program = Program(vertex, fragment, count=4)
+        program["position"] = np.zeros((4,2))
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert gl.recorder.count("glGenVertexArrays") == 1
+
+        # Cached vertex array: no attribute setup
+        gl.recorder.clear()
+        program["position"] = np.ones((4,2))
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert gl.recorder.count("glVertexAttribPointer") == 0
+        assert gl.recorder.count("glEnableVertexAttribArray") == 0
+        assert gl.recorder.count("glBindVertexArray") == 4
+        assert gl.recorder.count("glBufferSubData") == 1
+
+        # New buffer
+        gl.recorder.clear()
+        V = np.zeros(6, [("position", np.float32, 2)]).view(VertexBuffer)
+        program.bind(V)
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert gl.recorder.count("glDeleteVertexArrays") == 1
+        assert gl.recorder.count("glVertexAttribPointer") == 1
+        draws = [call.args for call in gl.recorder.calls if call.name == "glDrawArrays"]
+        assert draws == [(gl.GL_TRIANGLE_STRIP, 0, 6)]
+
+        # Buffer regions use one vertex array each (first region being
+        # still described by the current one)
+        gl.recorder.clear()
+        V.regions = 2
+        for i in range(4):
+            V[0] = i
+            program.draw(gl.GL_TRIANGLE_STRIP)
+        assert len(program._vertex_arrays) == 2
+        assert gl.recorder.count("glVertexAttribPointer") == 1
+
+    def test_unbound_buffer(self):
+        program = Program(vertex, fragment, count=4)
+        program["position"] = np.zeros((4,2))
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        program["position"] = np.ones((4,2))
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert gl.mockgl.state.bindings[gl.GL_ARRAY_BUFFER] == 0
+        assert gl.mockgl.state.bindings.get(gl.GL_ELEMENT_ARRAY_BUFFER, 0) == 0
+
+    def test_recreated_buffer(self):
+        program = Program(vertex, fragment)
+        V = np.zeros(4, [("position", np.float32, 2)]).view(VertexBuffer)
+        program.bind(V)
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        handle = V.handle
+
+        # Deleted buffer (as evicted by a resource manager) whose GL name
+        # is re-used when it is created again
+        V.delete()
+        gl.mockgl.state.handle = handle - 1
+        gl.recorder.clear()
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert V.handle == handle
+        assert gl.recorder.count("glGenVertexArrays") == 1
+        assert gl.recorder.count("glVertexAttribPointer") == 1
+
+    def test_instances(self):
+        vertex = """
+        attribute vec2 position;
+        attribute vec2 offset;
+        attribute vec4 color;
+        varying vec4 v_color;
+        void main() { gl_Position = vec4(position+offset, 0.0, 1.0); v_color = color; }
+        """
+        program = Program(vertex, fragment)
+        instances = np.zeros(10, [("offset", np.float32, 2),
+                                  ("color",  np.uint8,   4)]).view(VertexBuffer)
+        instances.divisor = 1
+        program.bind(instances)
+        program["position"] = np.zeros((3,2))
+        program.draw(gl.GL_TRIANGLES, instances=10)
+        divisors = sorted(call.args for call in gl.recorder.calls
+                          if call.name == "glVertexAttribDivisor")
+        handle = lambda name: program._attributes[name].handle
+        assert divisors == sorted([(handle("offset"), 1), (handle("color"), 1)])
+        draws = [call.args for call in gl.recorder.calls if call.name == "glDrawArraysInstanced"]
+        assert draws == [(gl.GL_TRIANGLES, 0, 3, 10)]
+
+        indices = np.array([0, 1, 2], np.uint16).view(IndexBuffer)
+        program.draw(gl.GL_TRIANGLES, indices, instances=5)
+        draws = [call.args for call in gl.recorder.calls if call.name == "glDrawElementsInstanced"]
+        assert draws[0][:3] == (gl.GL_TRIANGLES, 3, gl.GL_UNSIGNED_SHORT)
+        assert draws[0][4] == 5
+
+        # Divisor is part of the vertex array state
+        gl.recorder.clear()
+        instances.divisor = 2
+        program.draw(gl.GL_TRIANGLES, instances=20)
+        assert gl.recorder.count("glVertexAttribDivisor") == 2
+
+    def test_ranges(self):
+        program = Program(vertex, fragment, count=10)
+        program.draw(gl.GL_POINTS, first=2)
+        program.draw(gl.GL_POINTS, first=2, count=3)
+        program.draw(gl.GL_POINTS, first=[0, 5], count=[2, 3])
+        draws = [call.args for call in gl.recorder.calls if "Draw" in call.name]
+        assert draws == [(gl.GL_POINTS, 2, 8), (gl.GL_POINTS, 2, 3),
+                         (gl.GL_POINTS, (0, 5), (2, 3), 2)]
+
+        gl.recorder.clear()
+        indices = np.arange(10, dtype=np.uint32).view(IndexBuffer)
+        program.draw(gl.GL_POINTS, indices, first=4, count=2)
+        program.draw(gl.GL_POINTS, indices, first=[1, 6], count=[2, 4])
+        draws = [call.args for call in gl.recorder.calls if "Draw" in call.name]
+        assert draws[0][:3] == (gl.GL_POINTS, 2, gl.GL_UNSIGNED_INT)
+        assert draws[1] == (gl.GL_POINTS, (2, 4), gl.GL_UNSIGNED_INT, (4, 24), 2)
+        self.assertRaises(ValueError, program.draw, gl.GL_POINTS,
+                          first=[0, 5], count=[2, 3], instances=2)
+
+    def test_compact_attributes(self):
+        vertex = """
+        attribute vec2 position;
+        attribute vec4 color;
+        attribute vec3 normal;
+        void main() { gl_Position = vec4(position, 0.0, 1.0); }
+        """
+        program = Program(vertex, fragment)
+        dtype = [("position", np.float16, 2),
+                 ("color",    np.uint8,   4),
+                 ("normal",   np.int16,   3)]
+        V = np.zeros(10, dtype).view(VertexBuffer)
+        program.bind(V)
+        program.draw(gl.GL_POINTS)
+        pointers = { call.args[0]: call.args[1:5] for call in gl.recorder.calls
+                     if call.name == "glVertexAttribPointer" }
+        handle = lambda name: program._attributes[name].handle
+        assert pointers[handle("position")] == (2, gl.GL_HALF_FLOAT, gl.GL_FALSE, 14)
+        assert pointers[handle("color")] == (4, gl.GL_UNSIGNED_BYTE, gl.GL_TRUE, 14)
+        assert pointers[handle("normal")] == (3, gl.GL_SHORT, gl.GL_TRUE, 14)
+
+        program._attributes["color"].normalized = False
+        program.draw(gl.GL_POINTS)
+        pointers = [call.args[1:4] for call in gl.recorder.calls
+                    if call.name == "glVertexAttribPointer"
+                    and call.args[0] == handle("color")]
+        assert pointers[-1] == (4, gl.GL_UNSIGNED_BYTE, gl.GL_FALSE)
+
+    def test_texture_array(self):
+        fragment = """
+        uniform sampler2DArray images;
+        void main() { gl_FragColor = texture2DArray(images, vec3(0.0)); }
+        """
+        program = Program(vertex, fragment, count=4)
+        program["images"] = np.zeros((3,8,16,4), np.uint8)
+        assert isinstance(program["images"], Texture2DArray)
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        calls = [call.args[:6] for call in gl.recorder.calls if call.name == "glTexImage3D"]
+        assert calls == [(gl.GL_TEXTURE_2D_ARRAY, 0, gl.GL_RGBA, 16, 8, 3)]
+
+        gl.recorder.clear()
+        program["images"][1] = 255
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        calls = [call.args[2:8] for call in gl.recorder.calls if call.name == "glTexSubImage3D"]
+        assert calls == [(0, 0, 1, 16, 8, 1)]
+        assert gl.recorder.nbytes == 16*8*4
+
+    def test_uniform_block(self):
+        fragment = """
+        layout(std140) uniform Light { vec4 color; float intensity; };
+        void main() { gl_FragColor = intensity*color; }
+        """
+        program = Program(vertex, fragment, count=4)
+        light = np.zeros(1, std140([("color", "vec4"),
+                                    ("intensity", "float")])).view(UniformBuffer)
+        program["Light"] = light
+        assert program["Light"] is light
+        self.assertRaises(ValueError, program.__setitem__, "Light", np.zeros(5))
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        assert gl.recorder.count("glUniformBlockBinding") == 1
+        assert gl.recorder.count("glBindBufferBase") == 2
+        assert gl.mockgl.state.bindings[(gl.GL_UNIFORM_BUFFER, 0)] == light.handle
+
+    def test_snippet_block(self):
+        vertex = """
+        attribute vec2 position;
+        void main() { gl_Position = vec4(<transform(position)>, 0.0, 1.0); }
+        """
+        code = """
+        uniform vec2 scale, offset;
+        uniform sampler2D lut;
+        vec2 transform(vec2 position) { return scale*position + offset; }
+        """
+        transform = Snippet(code, block=True)
+        assert transform.block.dtype.itemsize == 16
+        programs = [Program(vertex, fragment, count=4) for i in range(3)]
+        for program in programs:
+            program["transform"] = transform
+            program["position"] = np.zeros((4,2))
+            transform["lut"] = np.zeros((4,4), np.float32)
+            assert "%s { vec2" % transform.block_name in program._vertex.code
+            assert "lut" in [name.split("_")[0] for name, gtype in program.all_uniforms]
+            program.draw(gl.GL_TRIANGLE_STRIP)
+
+        # Block values are uploaded once for all programs
+        gl.recorder.clear()
+        transform["scale"] = 2
+        assert (transform["scale"] == 2).all()
+        for program in programs:
+            program.draw(gl.GL_TRIANGLE_STRIP)
+        uploads = [call.args[1:3] for call in gl.recorder.calls
+                   if call.name == "glBufferSubData" and call.args[0] == gl.GL_UNIFORM_BUFFER]
+        assert uploads == [(0, 8)]
+        assert gl.recorder.count("glUniform2fv") == 0
+        assert gl.recorder.count("glBindBufferBase") == 3
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import unittest
+
+from glumpy.gloo import parser
+
+
+# ------------------------------------------------------------------ Parser ---
+class ParserTest(unittest.TestCase):
+
+    def test_declarations(self):
+        code = """
+        extern float extern_a[2], extern_b;
+        const float const_a = -1.0, const_b = 180.0/3.14159;
+        const vec3 const_c = vec3(1.0, 2.0, 3.0);
+        uniform highp vec2 uniform_a[2], uniform_b;
+        layout(location = 0) in vec2 attribute_a;
+        attribute float attribute_b;
+        flat varying vec4 varying_a;
+        """
+        objects = parser.parse(code)
+        assert objects["externs"] == [("extern_a[0]", "float"),
+                                      ("extern_a[1]", "float"),
+                                      ("extern_b", "float")]
+        assert objects["consts"] == [("const_a", "float"), ("const_b", "float"),
+                                     ("const_c", "vec3")]
+        assert objects["uniforms"] == [("uniform_a[0]", "vec2"),
+                                       ("uniform_a[1]", "vec2"),
+                                       ("uniform_b", "vec2")]
+        assert objects["attributes"] == [("attribute_a", "vec2"),
+                                         ("attribute_b", "float")]
+        assert objects["varyings"] == [("varying_a", "vec4")]
+
+    def test_zero_size(self):
+        self.assertRaises(RuntimeError, parser.parse, "uniform float a[0];")
+
+    def test_blocks(self):
+        code = """
+        layout(std140) uniform block { mat4 a; float b, c[2]; } instance;
+        uniform float d;
+        """
+        objects = parser.parse(code)
+        assert objects["blocks"] == [("block", [("a", "mat4"), ("b", "float"),
+                                                ("c[0]", "float"),
+                                                ("c[1]", "float")])]
+        assert objects["uniforms"] == [("d", "float")]
+
+    def test_functions(self):
+        code = """
+        float g(float x);
+        float f(vec2 p)
+        {
+            if (p.x > 0.0) { { { { { { return 1.0; } } } } } }
+            const float local = 2.0;
+            return g(local);
+        }
+        #define DEFINE(x) { x }
+        void main() { gl_Position = vec4(f(vec2(0.0)), 0.0, 0.0, 1.0); }
+        """
+        objects = parser.parse(code)
+        functions = objects["functions"]
+        assert [(rtype, name, args) for rtype, name, args, body in functions] == \
+            [("float", "f", "vec2 p"), ("void", "main", "")]
+        assert functions[0][3].strip().endswith("return g(local);")
+        assert objects["consts"] == []
+
+    def test_hooks(self):
+        code = """
+        #define HOOK <hook_a>
+        uniform float <hook_b>;
+        void main() { gl_Position = <hook_c.forward(position)> + <hook_d>; }
+        """
+        hooks = parser.parse(code)["hooks"]
+        assert sorted(hooks) == [("hook_a", None), ("hook_b", None),
+                                 ("hook_c", None), ("hook_d", None)]
+
+
+if __name__ == "__main__":
+    unittest.main()
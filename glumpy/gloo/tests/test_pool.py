@@ -0,0 +1,73 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import gc
+import unittest
+import numpy as np
+
+from glumpy import gl
+from glumpy.gloo.pool import BufferPool
+from glumpy.gloo.buffer import VertexBuffer, IndexBuffer
+
+
+# --------------------------------------------------------------- BufferPool ---
+class BufferPoolTest(unittest.TestCase):
+
+    def test_allocate(self):
+        pool = BufferPool(size=1024, alignment=16)
+        V1 = pool.allocate(np.zeros(10, np.float32))
+        V2 = pool.allocate(np.zeros(10, np.float32))
+        assert isinstance(V1, VertexBuffer)
+        assert V1.pool is pool
+        assert V1.offset == 0
+        assert V2.offset == 48
+        assert V2[5:].offset == 68
+        assert len(pool.arenas) == 1
+        assert pool.used == 80
+
+    def test_index_buffer(self):
+        pool = BufferPool(gl.GL_ELEMENT_ARRAY_BUFFER)
+        I = pool.allocate(np.arange(6, dtype=np.uint32))
+        assert isinstance(I, IndexBuffer)
+        self.assertRaises(ValueError, pool.allocate,
+                          np.zeros(3, np.float32).view(VertexBuffer))
+
+    def test_new_arena(self):
+        pool = BufferPool(size=64)
+        pool.allocate(np.zeros(10, np.float32))
+        V = pool.allocate(np.zeros(100, np.float32))
+        assert len(pool.arenas) == 2
+        assert pool.arenas[1].size == 400
+        assert V.offset == 0
+
+    def test_free(self):
+        pool = BufferPool(size=1024)
+        V1 = pool.allocate(np.zeros(10, np.float32))
+        V2 = pool.allocate(np.zeros(10, np.float32))
+        pool.free(V1)
+        V3 = pool.allocate(np.zeros(4, np.float32))
+        assert V3.offset == 0
+        assert pool.used == 56
+
+    def test_garbage_collection(self):
+        pool = BufferPool(size=1024)
+        V = pool.allocate(np.zeros(10, np.float32))
+        del V
+        gc.collect()
+        assert pool.used == 0
+        assert pool.arenas[0]._free == [[0, 1024]]
+
+    def test_defragment(self):
+        pool = BufferPool(size=1024)
+        V1 = pool.allocate(np.zeros(10, np.float32))
+        V2 = pool.allocate(np.zeros(10, np.float32))
+        pool.free(V1)
+        V2._pending_data = None
+        pool.defragment()
+        assert V2.offset == 0
+        assert V2.pending_ranges == [(0, 40)]
+
+
+if __name__ == "__main__":
+    unittest.main()
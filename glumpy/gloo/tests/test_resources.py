@@ -0,0 +1,126 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import gc
+import unittest
+from unittest import mock
+
+from glumpy import app
+from glumpy.gloo import resources, statistics
+from glumpy.gloo.globject import GLObject
+from glumpy.gloo.resources import ResourceManager
+
+
+class Resource(GLObject):
+    """ GL object that does not need any GL context """
+
+    _resource = "texture"
+
+    def __init__(self, nbytes):
+        GLObject.__init__(self)
+        self._nbytes = nbytes
+        self._deleted = 0
+
+    @property
+    def gpu_nbytes(self):
+        return self._nbytes
+
+    def _create(self):
+        self._handle = self._id
+
+    def _delete(self):
+        self._deleted += 1
+
+
+# --------------------------------------------------------- ResourceManager ---
+class ResourceManagerTest(unittest.TestCase):
+
+    def create(self, manager, nbytes, kind="texture"):
+        obj = Resource(nbytes)
+        obj._resource = kind
+        obj._create()
+        manager.register(obj)
+        return obj
+
+    def test_totals(self):
+        manager = ResourceManager()
+        T1 = self.create(manager, 100)
+        T2 = self.create(manager, 200)
+        B = self.create(manager, 50, "buffer")
+        assert manager.nbytes == 350
+        assert manager.totals == { "texture": (2, 300), "buffer": (1, 50) }
+        assert T1._manager is manager
+
+    def test_explicit_delete(self):
+        manager = ResourceManager()
+        T = self.create(manager, 100)
+        T.delete()
+        assert manager.nbytes == 0
+        assert T._manager is None
+        del T
+        gc.collect()
+        assert manager.pending == 0
+
+    def test_deferred_delete(self):
+        manager = ResourceManager()
+        T = self.create(manager, 100)
+        del T
+        gc.collect()
+        assert manager.nbytes == 0
+        assert manager.pending == 1
+
+    def test_evict_lru(self):
+        manager = ResourceManager()
+        T1 = self.create(manager, 100)
+        T2 = self.create(manager, 100)
+        T3 = self.create(manager, 100)
+        manager.process()
+        manager.touch(T1)
+        manager.process()
+        assert manager.evict(150) == 200
+        assert T2._deleted and T3._deleted and not T1._deleted
+        assert T2.need_create
+        assert manager.nbytes == 100
+
+    def test_evict_used_or_pinned(self):
+        manager = ResourceManager()
+        T1 = self.create(manager, 100)
+        T2 = self.create(manager, 100)
+        T2._pinned = True
+        assert manager.evict(100) == 0
+        manager.process()
+        assert manager.evict(200) == 100
+        assert T1._deleted and not T2._deleted
+
+    def test_end_frame(self):
+        class Window(object):
+            def __init__(self, context):
+                self.context = context
+            def activate(self):
+                Backend.context = self.context
+        class Backend(object):
+            context = None
+            @staticmethod
+            def windows():
+                return [Window(0), Window(1), Window(1)]
+        managers = { 0: ResourceManager(), 1: ResourceManager() }
+        statistics.reset()
+        with mock.patch.object(resources, "get_default",
+                               lambda: managers[Backend.context]):
+            app._end_frame(Backend)
+        # Each context is processed once and a single frame is counted
+        assert managers[0]._frame == 1 and managers[1]._frame == 1
+        assert statistics.stats()["frames"] == 1
+
+    def test_budget(self):
+        manager = ResourceManager(budget=250)
+        T1 = self.create(manager, 100)
+        T2 = self.create(manager, 100)
+        manager.process()
+        T3 = self.create(manager, 100)
+        manager.touch(T2)
+        manager.process()
+        assert T1._deleted
+        assert not T2._deleted and not T3._deleted
+        assert manager.nbytes == 200
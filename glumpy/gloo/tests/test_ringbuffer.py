@@ -0,0 +1,54 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import unittest
+import numpy as np
+
+from glumpy.gloo.buffer import RingBuffer
+
+
+# --------------------------------------------------------------- RingBuffer ---
+class RingBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.R = np.zeros((10, 4), np.float32).view(RingBuffer)
+        self.R._pending_data = None
+        self.R.merge_threshold = 0
+
+    def test_append_row(self):
+        R = self.R
+        R.append(np.ones(4))
+        assert R.head == 1
+        assert R.pending_ranges == [(0, 16)]
+        assert np.all(R[0] == 1)
+
+    def test_append_rows(self):
+        R = self.R
+        R.append(np.ones((3, 4)))
+        assert R.head == 3
+        assert R.pending_ranges == [(0, 48)]
+
+    def test_append_wrap(self):
+        R = self.R
+        R.append(np.ones((8, 4)))
+        R._pending_data = None
+        R.append(2*np.ones((3, 4)))
+        assert R.head == 1
+        assert R.pending_ranges == [(0, 16), (128, 160)]
+        assert np.all(R[8:] == 2) and np.all(R[0] == 2)
+
+    def test_append_overflow(self):
+        R = self.R
+        R.append(np.arange(12*4).reshape(12, 4))
+        assert R.head == 2
+        assert R[1,0] == 44 and R[2,0] == 8
+
+    def test_view_head(self):
+        R = self.R
+        R.append(np.ones(4))
+        assert R[2:].head == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,10 @@
 # -----------------------------------------------------------------------------
 import unittest
 
+from unittest import mock
+
 import glumpy.gl as gl
+from glumpy.gloo.snippet import Snippet
 from glumpy.gloo.shader import VertexShader, FragmentShader
 
 
@@ -70,6 +73,32 @@ class ShaderTest(unittest.TestCase):
         shader = VertexShader("attribute vec4 color;")
         assert shader.attributes == [("color", gl.GL_FLOAT_VEC4)]
 
+    def test_cached_declarations(self):
+        shader = VertexShader("uniform float scale; attribute vec2 position;"
+                              "void main() { gl_Position = <transform>; }")
+        shader["transform"] = Snippet("uniform float a; vec4 f(void) { return vec4(a); }")
+        uniforms = shader.uniforms
+        with mock.patch("glumpy.gloo.shader.scan") as scan:
+            for i in range(10):
+                assert shader.uniforms == uniforms
+                shader.attributes
+            assert scan.call_count == 0
+
+    def test_invalidated_declarations(self):
+        A = Snippet("uniform float a; vec4 f(void) { return vec4(a); }")
+        B = Snippet("uniform float b; float g(void) { return b; }")
+        shader = VertexShader("void main() { gl_Position = <transform>; }")
+        shader["transform"] = A
+        assert len(shader.uniforms) == 1
+
+        # Modified snippet
+        A(B)
+        assert len(shader.uniforms) == 2
+
+        # New snippet
+        shader["transform"] = B
+        assert len(shader.uniforms) == 1
+
 
 if __name__ == "__main__":
     unittest.main()
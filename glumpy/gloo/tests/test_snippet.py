@@ -0,0 +1,71 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import unittest
+from unittest import mock
+
+from glumpy.gloo.snippet import Snippet
+
+
+code_a = """
+uniform float scale;
+varying float v_scale;
+float forward(float x) { v_scale = scale; return scale*x; }
+"""
+
+code_b = """
+uniform vec2 offset;
+float shift(float x) { return x + offset.x; }
+"""
+
+
+# ----------------------------------------------------------------- Snippet ---
+class SnippetTest(unittest.TestCase):
+
+    def test_mangled_code(self):
+        A = Snippet(code_a)
+        code = A.mangled_code()
+        for name in ("scale", "v_scale", "forward"):
+            assert A.symbols[name] in code
+        assert " scale;" not in code
+        assert " forward(" not in code
+
+    def test_mangled_code_cached(self):
+        A = Snippet(code_a)
+        code = A.mangled_code()
+        with mock.patch("re.compile") as compile:
+            assert A.mangled_code() is code
+            assert compile.call_count == 0
+
+    def test_aliases(self):
+        A = Snippet(code_a)
+        code = A.mangled_code()
+        A(scale="v_scale")
+        assert A.mangled_code() != code
+        assert "v_scale * x" not in A.mangled_code()
+        assert "return v_scale*x" in A.mangled_code()
+
+    def test_call(self):
+        A, B = Snippet(code_a), Snippet(code_b)
+        A("x")
+        assert A.mangled_call() == "%s(x)" % A.symbols["forward"]
+        A(B("x"))
+        assert A.mangled_call() == "%s(%s(x))" % (A.symbols["forward"],
+                                                 B.symbols["shift"])
+        assert A.dependencies == [A, B]
+        assert A.globals["offset"] == B.symbols["offset"]
+
+    def test_next(self):
+        A, B = Snippet(code_a), Snippet(code_b)
+        A("x")
+        call = A.mangled_call()
+        C = A + B("y")
+        assert C.mangled_call() == "%s(x) + %s(y)" % (A.symbols["forward"],
+                                                    B.symbols["shift"])
+        assert C.dependencies == [C, B]
+        assert A.mangled_call() == call
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import unittest
+import numpy as np
+
+from glumpy.gloo import statistics
+from glumpy.gloo.globject import GLObject
+from glumpy.gloo.buffer import VertexBuffer
+
+
+# -------------------------------------------------------------- Statistics ---
+class StatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        statistics.reset()
+
+    def test_count(self):
+        obj = GLObject()
+        statistics.count(obj, "draws")
+        statistics.count(obj, "vertices", 30)
+        stats = statistics.stats()
+        assert stats["frame"]["draws"] == 1
+        assert stats["frame"]["vertices"] == 30
+        assert statistics.stats(obj)["vertices"] == 30
+        assert statistics.stats(GLObject())["vertices"] == 0
+
+    def test_end_frame(self):
+        obj = GLObject()
+        statistics.count(obj, "uploaded", 100)
+        statistics.end_frame()
+        statistics.count(obj, "uploaded", 10)
+        stats = statistics.stats()
+        assert stats["frames"] == 1
+        assert stats["frame"]["uploaded"] == 10
+        assert stats["last"]["uploaded"] == 100
+        assert stats["total"]["uploaded"] == 100
+        statistics.end_frame()
+        assert statistics.stats()["total"]["uploaded"] == 110
+        assert statistics.stats(obj)["uploaded"] == 110
+
+    def test_reset(self):
+        statistics.count(GLObject(), "draws")
+        statistics.end_frame()
+        statistics.reset()
+        stats = statistics.stats()
+        assert stats["frames"] == 0
+        assert stats["last"]["draws"] == 0
+
+    def test_view(self):
+        V = np.zeros(10, np.float32).view(VertexBuffer)
+        statistics.count(V, "buffer_binds")
+        assert statistics.stats(V[2:5])["buffer_binds"] == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
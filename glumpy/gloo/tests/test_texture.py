@@ -5,442 +5,285 @@
 import unittest
 import numpy as np
 
-from glumpy.gloo.texture import Texture, Texture1D, Texture2D
 from glumpy import gl
+from glumpy.gloo.texture import Texture1D, Texture2D, TextureFloat2D, TextureHalf2D
+from glumpy.gloo.texture import Texture3D, TextureCube, DepthTexture
+from glumpy.gloo.texture import Texture2DArray
+from glumpy.gloo.atlas import Atlas
+
+def setUpModule():
+    global backend
+    backend = gl.use("mock")
+
+
+def tearDownModule():
+    if backend is not None:
+        gl.use(backend)
 
 
 # ----------------------------------------------------------------- Texture ---
 class TextureTest(unittest.TestCase):
 
-    # No data, no dtype : forbidden
-    # ---------------------------------
-    def test_init_none(self):
-        # with self.assertRaises(ValueError):
-        #    T = Texture()
-        self.assertRaises(ValueError, Texture)
-
-    # Data only
-    # ---------------------------------
-    def test_init_data(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        assert T._shape == (10, 10)
-        assert T._dtype == np.uint8
-        assert T._offset == (0, 0)
-        assert T._store is True
-        assert T._copy is False
-        assert T._need_resize is True
-        assert T._need_update is True
-        assert T._data is data
-        assert len(T._pending_data) == 1
-
-    # Non contiguous data
-    # ---------------------------------
-    def test_init_non_contiguous_data(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data[::2, ::2])
-        assert T._shape == (5, 5)
-        assert T._dtype == np.uint8
-        assert T._offset == (0, 0)
-        assert T._store is True
-        assert T._copy is True
-        assert T._need_resize is True
-        assert T._need_update is True
-        assert T._data is not data
-        assert len(T._pending_data) == 1
-
-    # Dtype and shape
-    # ---------------------------------
-    def test_init_dtype_shape(self):
-        T = Texture(shape=(10, 10), dtype=np.uint8)
-        assert T._shape == (10, 10)
-        assert T._dtype == np.uint8
-        assert T._offset == (0, 0)
-        assert T._store is True
-        assert T._copy is False
-        assert T._need_resize is True
-        assert T._need_update is False
-        assert T._data is not None
-        assert T._data.shape == (10, 10)
-        assert T._data.dtype == np.uint8
-        assert len(T._pending_data) == 0
-
-    # Dtype only
-    # ---------------------------------
-    def test_init_dtype(self):
-        T = Texture(dtype=np.uint8)
-        assert T._shape == ()
-        assert T._dtype == np.uint8
-        assert T._offset == ()
-        assert T._store is True
-        assert T._copy is False
-        assert T._need_resize is False
-        assert T._need_update is False
-        assert T._data is not None
-        assert len(T._pending_data) == 0
-
-    # Data and dtype: dtype prevails
-    # ---------------------------------
-    def test_init_data_dtype(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data, dtype=np.uint16)
-        assert T._shape == (10, 10)
-        assert T._dtype == np.uint16
-        assert T._offset == (0, 0)
-        assert T._store is True
-        assert T._copy is False
-        assert T._need_resize is True
-        assert T._need_update is True
-        assert T._data is not data
-        assert len(T._pending_data) == 1
-
-    # Data, store but no copy
-    # ---------------------------------
-    def test_init_data_store(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data, store=True)
-        assert T._data is data
-
-    # Data, store and copy
-    # ---------------------------------
-    def test_init_data_store_copy(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data.copy(), store=True)
-        assert T._data is not data
-        assert T._data is not None
-
-    # Get a view of the whole texture
-    # ---------------------------------
-    def test_getitem_ellipsis(self):
-
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        Z = T[...]
-        assert Z._base is T
-        assert Z._data.base is T._data
-        assert Z._shape == (10, 10)
-        assert Z._resizeable is False
-        assert len(Z._pending_data) == 0
-
-    # Get a view using ellipsis at start
-    # ---------------------------------
-    def test_getitem_ellipsis_start(self):
-
-        data = np.zeros((10, 10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        Z = T[..., 0]
-        assert Z._base is T
-        assert Z._data.base is T._data
-        assert Z._shape == (10, 10, 1)
-        assert Z._resizeable is False
-        assert len(Z._pending_data) == 0
-
-    # Get a view using ellipsis at end
-    # ---------------------------------
-    def test_getitem_ellipsis_end(self):
-
-        data = np.zeros((10, 10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        Z = T[0, ...]
-        assert Z._base is T
-        assert Z._data.base is T._data
-        assert Z._shape == (1, 10, 10)
-        assert Z._resizeable is False
-        assert len(Z._pending_data) == 0
-
-    # Get a single item
-    # ---------------------------------
-    def test_getitem_single(self):
-
-        data = np.zeros((10, 10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        Z = T[0, 0, 0]
-        assert Z._base is T
-        assert Z._data.base is T._data
-        assert Z._shape == (1, 1, 1)
-        assert Z._resizeable is False
-        assert len(Z._pending_data) == 0
-
-    # Get a partial view
-    # ---------------------------------
-    def test_getitem_partial(self):
-
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        Z = T[2:5, 2:5]
-        assert Z._base is T
-        assert Z._data.base is T._data
-        assert Z._shape == (3, 3)
-        assert Z._offset == (2, 2)
-        assert Z._resizeable is False
-        assert len(Z._pending_data) == 0
-
-    # Get non contiguous view : forbidden
-    # ---------------------------------
-    def test_getitem_non_contiguous(self):
-
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        # with self.assertRaises(ValueError):
-        #    Z = T[::2, ::2]
-        #    print(Z)
-        s = slice(None, None, 2)
-        self.assertRaises(ValueError, T.__getitem__, (s, s))
-
-    # Set data with store
-    # ---------------------------------
-    def test_setitem_all(self):
-
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        T[...] = np.ones((10, 10))
-        assert len(T._pending_data) == 1
-        assert np.allclose(data, np.ones((10, 10)))
-
-    # Set data without store
-    # ---------------------------------
-    def test_setitem_all_no_store(self):
-
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data, store=False)
-        T[...] = np.ones((10, 10), np.uint8)
-        assert len(T._pending_data) == 1
-        assert np.allclose(data, np.zeros((10, 10)))
-
-    # Set a single data
-    # ---------------------------------
-    def test_setitem_single(self):
-
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        T[0, 0] = 1
-        assert len(T._pending_data) == 2
-        assert data[0, 0] == 1, 1
-
-    # Set some data
-    # ---------------------------------
-    def test_setitem_partial(self):
-
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        T[5:, 5:] = 1
-        assert len(T._pending_data) == 2
-        assert np.allclose(data[5:, 5:], np.ones((5, 5)))
-
-    # Set non contiguous data
-    # ---------------------------------
-    def test_setitem_wrong(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        # with self.assertRaises(ValueError):
-        #    T[::2, ::2] = 1
-        s = slice(None, None, 2)
-        self.assertRaises(ValueError, T.__setitem__, (s, s), 1)
-
-    # Set via get (pending data on base)
-    # ---------------------------------
-    def test_getitem_setitem(self):
-
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture(data=data)
-        Z = T[5:, 5:]
-        Z[...] = 1
-        assert len(Z._pending_data) == 0
-        assert len(T._pending_data) == 2
-        assert np.allclose(data[5:, 5:], np.ones((5, 5)))
-
-
-# --------------------------------------------------------------- Texture1D ---
-class Texture1DTest(unittest.TestCase):
-
-    # Shape extension
-    # ---------------------------------
-    def test_init(self):
-        data = np.zeros(10, dtype=np.uint8)
-        T = Texture1D(data=data)
-        assert T._shape == (10, 1)
-
-    # Width
-    # ---------------------------------
-    def test_width(self):
-        data = np.zeros(10, dtype=np.uint8)
-        T = Texture1D(data=data)
-        assert T.width == 10
+    def setUp(self):
+        gl.mockgl.reset()
 
-    # Set misshaped data
-    # ---------------------------------
-    def test_set_misshaped_data_1D(self):
-        data = np.zeros(10, dtype=np.uint8)
-        T = Texture1D(data=data)
-        # with self.assertRaises(ValueError):
-        #    T.set_data(np.ones((10, 10)))
-        self.assertRaises(ValueError, T.set_data, np.ones((10, 10)))
-
-
-# --------------------------------------------------------------- Texture2D ---
-class Texture2DTest(unittest.TestCase):
-    # Note: put many tests related to (re)sizing here, because Texture
-    # is not really aware of shape.
-
-    # Shape extension
-    # ---------------------------------
-    def test_init(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        assert T._shape == (10, 10, 1)
-
-    # Width & height
-    # ---------------------------------
-    def test_width_height(self):
-        data = np.zeros((10, 20), dtype=np.uint8)
-        T = Texture2D(data=data)
-        assert T.width == 20
-        assert T.height == 10
-
-    # Resize
-    # ---------------------------------
-    def test_resize(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        T.resize((5, 5))
-        assert T.shape == (5, 5, 1)
-        assert T._data.shape == (5, 5, 1)
-        assert T._need_resize is True
-        assert T._need_update is False
-        assert len(T._pending_data) == 0
-
-    # Resize with bad shape
-    # ---------------------------------
-    def test_resize_bad_shape(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        # with self.assertRaises(ValueError):
-        #    T.resize((5, 5, 5))
-        self.assertRaises(ValueError, T.resize, (5, 5, 5))
-
-    # Resize view (forbidden)
-    # ---------------------------------
-    def test_resize_view(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        # with self.assertRaises(RuntimeError):
-        #    T[...].resize((5, 5))
-        Z = T[...]
-        self.assertRaises(RuntimeError, Z.resize, (5, 5))
-
-    # Resize not resizeable
-    # ---------------------------------
-    def test_resize_unresizeable(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data, resizeable=False)
-        # with self.assertRaises(RuntimeError):
-        #    T.resize((5, 5))
-        self.assertRaises(RuntimeError, T.resize, (5, 5))
-
-    # Set oversized data (-> resize)
-    # ---------------------------------
-    def test_set_oversized_data(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        T.set_data(np.ones((20, 20), np.uint8))
-        assert T.shape == (20, 20, 1)
-        assert T._data.shape == (20, 20, 1)
-        assert len(T._pending_data) == 1
-
-    # Set undersized data
-    # ---------------------------------
-    def test_set_undersized_data(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        T.set_data(np.ones((5, 5), np.uint8))
-        assert T.shape == (5, 5, 1)
-        assert len(T._pending_data) == 1
-
-    # Set misplaced data
-    # ---------------------------------
-    def test_set_misplaced_data(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        # with self.assertRaises(ValueError):
-        #    T.set_data(np.ones((5, 5)), offset=(8, 8))
-        self.assertRaises(ValueError, T.set_data,
-                          np.ones((5, 5)), offset=(8, 8))
-
-    # Set misshaped data
-    # ---------------------------------
-    def test_set_misshaped_data_2D(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        # with self.assertRaises(ValueError):
-        #    T.set_data(np.ones((10, 10)))
-        self.assertRaises(ValueError, T.set_data, np.ones((10,)))
-
-    # Set whole data (clear pending data)
-    # ---------------------------------
-    def test_set_whole_data(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        T.set_data(np.ones((10, 10), np.uint8))
-        assert T.shape == (10, 10, 1)
-        assert len(T._pending_data) == 1
-
-    # Test view get invalidated when base is resized
-    # ----------------------------------------------
-    def test_invalid_views(self):
-        data = np.zeros((10, 10), dtype=np.uint8)
-        T = Texture2D(data=data)
-        Z = T[5:, 5:]
-        T.resize((5, 5))
-        assert Z._valid is False
-
-    # Test set data with different shape
-    # ---------------------------------
-    def test_reset_data_shape(self):
-        shape1 = 10, 10
-        shape3 = 10, 10, 3
-
-        # Init data (explicit shape)
-        data = np.zeros((10, 10, 1), dtype=np.uint8)
-        T = Texture2D(data=data)
-        assert T.shape == (10, 10, 1)
-        assert T._format == gl.GL_LUMINANCE
-
-        # Set data to rgb
-        T.set_data(np.zeros(shape3, np.uint8))
-        assert T.shape == (10, 10, 3)
-        assert T._format == gl.GL_RGB
-
-
-        # Set data to grayscale
-        T.set_data(np.zeros(shape1, np.uint8))
-        assert T.shape == (10, 10, 1)
-        assert T._format == gl.GL_LUMINANCE
-
-        # Set size to rgb
-        T.resize(shape3)
-        assert T.shape == (10, 10, 3)
-        assert T._format == gl.GL_RGB
-
-        # Set size to grayscale
-        T.resize(shape1)
-        assert T.shape == (10, 10, 1)
-        assert T._format == gl.GL_LUMINANCE
-
-    # Test set data with different shape
-    # ---------------------------------
-    def test_reset_data_type(self):
-        shape = 10, 10
-        T = Texture2D(data=np.zeros(shape, dtype=np.uint8))
-        assert T.dtype == np.uint8
-        assert T._gtype == gl.GL_UNSIGNED_BYTE
-
-        newdata = np.zeros(shape, dtype=np.float32)
-        self.assertRaises(ValueError, T.set_data, newdata)
-
-        newdata = np.zeros(shape, dtype=np.int32)
-        self.assertRaises(ValueError, T.set_data, newdata)
+    def uploads(self, name="glTexSubImage2D"):
+        return [call for call in gl.recorder.calls if call.name == name]
+
+    def test_init_1D(self):
+        T = np.zeros((10,3), np.uint8).view(Texture1D)
+        assert T.target == gl.GL_TEXTURE_1D
+        assert T.width == 10
+        assert T.cpu_format == gl.GL_RGB
+
+    def test_init_2D(self):
+        T = np.zeros((10,20), np.uint8).view(Texture2D)
+        assert T.shape == (10,20,1)
+        assert T.width == 20 and T.height == 10
+        assert T.cpu_format == gl.GL_RED
+        assert T.gtype == gl.GL_UNSIGNED_BYTE
+        assert T.pending_data == (0, 200)
+
+    def test_init_float_2D(self):
+        T = np.zeros((10,10,4), np.float32).view(TextureFloat2D)
+        assert T.gpu_format == gl.GL_RGBA32F
+
+    def test_init_half_2D(self):
+        T = np.zeros((10,10,4), np.float16).view(TextureHalf2D)
+        assert T.gpu_format == gl.GL_RGBA16F
+        assert T.gtype == gl.GL_HALF_FLOAT
+        assert T.precision is np.float16
+
+    def test_precision(self):
+        T = np.zeros((10,10,3), np.float32).view(Texture2D)
+        assert T.precision is None
+        T.precision = np.uint8
+        assert T.gpu_format == gl.GL_RGB8
+        T.precision = np.uint16
+        assert T.gpu_format == gl.GL_RGB16
+        T.precision = np.float16
+        assert T.gpu_format == gl.GL_RGB16F
+        self.assertRaises(TypeError, setattr, T, "precision", np.int32)
+        T.activate()
+        assert [call.args[2] for call in gl.recorder.calls
+                if call.name == "glTexImage2D"] == [gl.GL_RGB16F]
+
+    def test_half_conversion(self):
+        T = np.zeros((10,20,4), np.float32).view(Texture2D)
+        T.precision = np.float16
+        T.activate()
+        assert self.uploads()[0].args[7] == gl.GL_HALF_FLOAT
+        assert gl.recorder.nbytes == T.size*2
+        gl.recorder.clear()
+        T[2:4, 5:10] = 0.5
+        T[6] = 0.25
+        T.activate()
+        assert [call.args[7] for call in self.uploads()] == [gl.GL_HALF_FLOAT]*2
+        assert gl.recorder.nbytes == (2*5 + 20)*4*2
+        assert (T._half == T).all()
+        assert T._half.dtype == np.float16
+
+        # Staging array is reused
+        half = T._half
+        T[0] = 1
+        T.activate()
+        assert T._half is half
+
+    def test_init_depth(self):
+        T = np.zeros((10,10), np.float32).view(DepthTexture)
+        assert T.cpu_format == gl.GL_DEPTH_COMPONENT
+
+    def test_invalid_shape(self):
+        self.assertRaises(ValueError, np.zeros(10).view, Texture2D)
+        self.assertRaises(ValueError, np.zeros((2,2,5)).view, Texture2D)
+        self.assertRaises(RuntimeError, np.zeros((5,2,2)).view, TextureCube)
+
+    def test_create_1D(self):
+        T = np.zeros((10,4), np.float32).view(Texture1D)
+        T.activate()
+        assert T.handle > 0
+        assert gl.recorder.count("glTexImage1D") == 1
+        assert [call.args[2:4] for call in self.uploads("glTexSubImage1D")] == [(0, 10)]
+
+    def test_create_2D(self):
+        T = np.zeros((10,20,4), np.float32).view(Texture2D)
+        T.activate()
+        assert T.handle > 0
+        assert T.pending_data is None
+        assert gl.recorder.count("glTexImage2D") == 1
+        assert len(self.uploads()) == 1
+        assert gl.recorder.nbytes == T.nbytes
+
+    def test_partial_update(self):
+        T = np.zeros((10,20,4), np.float32).view(Texture2D)
+        T.activate()
+        gl.recorder.clear()
+        T[2:4] = 1
+        T[3,5] = 2
+        T.activate()
+        x, y, width, height = self.uploads()[0].args[2:6]
+        assert (x, y, width, height) == (0, 2, 20, 2)
+        assert gl.recorder.nbytes == 2*20*4*4
+
+    def test_sub_rectangle(self):
+        T = np.zeros((100,200,4), np.uint8).view(Texture2D)
+        T.activate()
+        gl.recorder.clear()
+        T[10:20, 30:50] = 1
+        T[50:60, 100:110][...] = 2
+        assert T.pending_boxes == [((10,20),(30,50)), ((50,60),(100,110))]
+        T.activate()
+        assert [call.args[2:6] for call in self.uploads()] == [(30,10,20,10),
+                                                               (100,50,10,10)]
+        assert gl.recorder.nbytes == (20*10 + 10*10)*4
+        assert gl.mockgl.state.parameters[gl.GL_UNPACK_ROW_LENGTH] == 0
+
+    def test_mixed_boxes(self):
+        T = np.zeros((100,100,3), np.uint8).view(Texture2D)
+        T.merge_threshold = 0
+        T.activate()
+        gl.recorder.clear()
+        T[50:52, 10:20] = 1
+        T[90:92, :] = 1
+        T.activate()
+        assert [call.args[2:6] for call in self.uploads()] == [(10,50,10,2),
+                                                               (0,90,100,2)]
+        assert gl.mockgl.state.parameters[gl.GL_UNPACK_SKIP_ROWS] == 0
+
+    def test_reshaped_view(self):
+        T = np.zeros((10,20,4), np.float32).view(Texture2D)
+        T.activate()
+        T.reshape(-1,4)[25:30] = 1
+        assert T.pending_boxes == [((1,2),(5,10))]
+        T.reshape(-1,4)[15:25] = 1
+        assert T.pending_boxes == [((0,2),(0,20))]
+
+    def test_sub_box_3D(self):
+        T = np.zeros((8,16,32,2), np.float32).view(Texture3D)
+        T.activate()
+        gl.recorder.clear()
+        T[2:4, 3:5, 6:9] = 1
+        T.activate()
+        uploads = self.uploads("glTexSubImage3D")
+        assert [call.args[2:8] for call in uploads] == [(6,3,2,3,2,2)]
+        assert gl.recorder.nbytes == 2*2*3*2*4
+
+    def test_mixed_boxes_3D(self):
+        for cls in (Texture3D, Texture2DArray):
+            gl.mockgl.reset()
+            T = np.zeros((8,16,32,2), np.float32).view(cls)
+            T.merge_threshold = 0
+            T.activate()
+            gl.recorder.clear()
+            T[2:4, 3:5, 6:9] = 1
+            T[6:8] = 1
+            T.activate()
+            uploads = self.uploads("glTexSubImage3D")
+            assert [call.args[2:8] for call in uploads] == [(6,3,2,3,2,2),
+                                                            (0,0,6,32,16,2)]
+            assert gl.mockgl.state.parameters[gl.GL_UNPACK_SKIP_IMAGES] == 0
+
+    def test_atlas(self):
+        T = np.zeros((256,256,3), np.uint8).view(Atlas)
+        T.activate()
+        gl.recorder.clear()
+        x, y, width, height = T.allocate((10,12))
+        T[y:y+height, x:x+width] = 255
+        T.activate()
+        assert gl.recorder.nbytes == 10*12*3
+
+    def test_pixel_buffers(self):
+        T = np.zeros((100,200,4), np.uint8).view(Texture2D)
+        T.pixel_buffers = 2
+        T.activate()
+        assert gl.recorder.count("glGenBuffers") == 1
+        assert len(gl.mockgl.state.syncs) == 1
+        gl.recorder.clear()
+        T[10:20, 30:50] = 1
+        T.activate()
+        T[50] = 2
+        T.activate()
+        T[60] = 3
+        T.activate()
+        assert [call.args[1:3] for call in gl.recorder.calls
+                if call.name == "glMapBufferRange"] == [(10*800, 10*800),
+                                                        (50*800, 800),
+                                                        (60*800, 800)]
+        # Client memory is only read when copying into pixel buffers
+        assert gl.recorder.nbytes == 12*800
+        assert gl.recorder.count("glClientWaitSync") == 2
+        assert len(gl.mockgl.state.syncs) == 2
+        assert gl.mockgl.state.bindings[gl.GL_PIXEL_UNPACK_BUFFER] == 0
+        T.delete()
+        assert len(gl.mockgl.state.syncs) == 0
+        assert gl.recorder.count("glDeleteBuffers") == 1
+
+    def test_pixel_buffers_accounting(self):
+        T = np.zeros((100,200,4), np.uint8).view(Texture2D)
+        T.activate()
+        manager = T._manager
+        assert manager.nbytes == T.nbytes
+        T.pixel_buffers = 2
+        assert manager.nbytes == 3*T.nbytes
+        T[0] = 1
+        T.activate()
+        assert len(T._pixel_handles) == 2
+        T.pixel_buffers = 0
+        assert manager.nbytes == T.nbytes
+        T[0] = 2
+        T.activate()
+        assert T._pixel_handles == []
+        assert gl.recorder.count("glDeleteBuffers") == 1
+
+    def test_pixel_buffers_mixed_boxes(self):
+        T = np.zeros((100,100,3), np.uint8).view(Texture2D)
+        T.merge_threshold = 0
+        T.pixel_buffers = 2
+        T.activate()
+        gl.recorder.clear()
+        T[50:52, 10:20] = 1
+        T[90:92, :] = 1
+        T.activate()
+        uploads = self.uploads()
+        assert [call.args[2:6] for call in uploads] == [(10,50,10,2),
+                                                        (0,90,100,2)]
+        # Both rectangles are read in place from the start of the pixel buffer
+        assert [call.args[8].value for call in uploads] == [None, None]
+        assert gl.mockgl.state.parameters[gl.GL_UNPACK_SKIP_ROWS] == 0
+
+    def test_cube(self):
+        T = np.zeros((6,8,8,4), np.uint8).view(TextureCube)
+        T.activate()
+        gl.recorder.clear()
+        T[2,1:3] = 1
+        T.activate()
+        uploads = self.uploads()
+        assert len(uploads) == 1
+        assert uploads[0].args[0] == gl.GL_TEXTURE_CUBE_MAP_POSITIVE_Y
+        assert uploads[0].args[3:6] == (1, 8, 2)
+
+    def test_cube_mixed_boxes(self):
+        T = np.zeros((6,8,8,4), np.uint8).view(TextureCube)
+        T.merge_threshold = 0
+        T.activate()
+        gl.recorder.clear()
+        T[2,1:3,2:4] = 1
+        T[2,6:8] = 1
+        T.activate()
+        assert [call.args[2:6] for call in self.uploads()] == [(2,1,2,2),
+                                                               (0,6,8,2)]
+
+    def test_delete(self):
+        T = np.zeros((10,20,4), np.float32).view(Texture2D)
+        T.activate()
+        T.delete()
+        assert T.handle == -1
+        assert T.pending_data == (0, T.nbytes)
+        gl.recorder.clear()
+        T.activate()
+        assert gl.recorder.count("glTexImage2D") == 1
+        assert gl.recorder.nbytes == T.nbytes
 
 
-# -----------------------------------------------------------------------------
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,126 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+import unittest
+import numpy as np
+
+from glumpy import gl
+from glumpy.gloo.program import Program
+from glumpy.gloo.virtual import VirtualTexture
+
+def setUpModule():
+    global backend
+    backend = gl.use("mock")
+
+
+def tearDownModule():
+    if backend is not None:
+        gl.use(backend)
+
+
+vertex = """
+attribute vec2 position;
+varying vec2 v_texcoord;
+void main() { gl_Position = vec4(position, 0.0, 1.0); v_texcoord = position; }
+"""
+
+fragment = """
+varying vec2 v_texcoord;
+void main() { gl_FragColor = <texture>(v_texcoord); }
+"""
+
+
+# ---------------------------------------------------------- VirtualTexture ---
+class VirtualTextureTest(unittest.TestCase):
+
+    def setUp(self):
+        gl.mockgl.reset()
+        # Each texel holds its (row, column)
+        rows, cols = np.mgrid[0:1000, 0:1500]
+        self.image = np.dstack([rows, cols]).astype(np.float32)
+
+    def region(self, row, col):
+        """ Region inside given finest tile """
+        return (col+0.1)/15, (row+0.1)/10, (col+0.5)/15, (row+0.5)/10
+
+    def test_pyramid(self):
+        T = VirtualTexture(self.image, tile=100, workers=0)
+        assert T.levels == 5
+        assert T.tiles(0) == (10, 15)
+        assert T.tiles(4) == (1, 1)
+        assert T.resident == [(4, 0, 0)]
+        assert T.table.shape == (10, 15, 4)
+        assert (T.table[..., 2] == 16).all()
+
+    def test_level(self):
+        T = VirtualTexture(self.image, tile=100, workers=0)
+        assert T.level((0,0,1,1), (1500,1000)) == 0
+        assert T.level((0,0,1,1), (375,250)) == 2
+        assert T.level((0,0,1,1), (10,10)) == 4
+        assert T.visible((0.5,0.5,0.6,0.6), 0) == [(0,5,7), (0,5,8)]
+
+    def test_update(self):
+        T = VirtualTexture(self.image, tile=100, cache=(4,4), workers=0)
+        T.update(self.region(0,0), (40,40))
+        assert T.resident[-1] == (0, 0, 0)
+        slot = T.table[0, 0]
+        assert slot[2] == 1
+        y, x = int(slot[1]*400), int(slot[0]*400)
+        assert (T.cache[y+10, x+20] == (10, 20)).all()
+
+        # Coarser tiles are still used elsewhere
+        assert T.table[5, 5, 2] == 16
+
+        # Tile at level 1 is decimated
+        T.update((0.5,0.5,0.6,0.6), (60,40))
+        assert (1, 2, 3) in T.resident
+        slot = T.table[5, 7]
+        y, x = int(slot[1]*400), int(slot[0]*400)
+        assert (T.cache[y+1, x+1] == (402, 602)).all()
+
+    def test_eviction(self):
+        T = VirtualTexture(self.image, tile=100, cache=(2,2), workers=0)
+        for col in range(3):
+            T.update(self.region(0,col), (40,40))
+        assert T.resident == [(4,0,0), (0,0,0), (0,0,1), (0,0,2)]
+        T.update(self.region(0,0), (40,40))
+        T.update(self.region(0,3), (40,40))
+        assert T.resident == [(4,0,0), (0,0,2), (0,0,0), (0,0,3)]
+        assert T.table[0, 1, 2] == 16
+        assert T.table[0, 3, 2] == 1
+
+    def test_coarser_level(self):
+        T = VirtualTexture(self.image, tile=100, cache=(2,2), workers=0)
+        T.update((0,0,1,1), (1500,1000))
+        assert len(T.resident) <= 4
+        assert all(level > 0 for level, row, col in T.resident)
+
+    def test_threads(self):
+        T = VirtualTexture(self.image, tile=100, cache=(4,4), workers=2)
+        T.update((0,0,0.1,0.1), (150,100), wait=True)
+        assert (0, 0, 0) in T.resident
+        assert T.pending == []
+        T.delete()
+
+    def test_program(self):
+        T = VirtualTexture(self.image, tile=100, workers=0)
+        program = Program(vertex, fragment, count=4)
+        program["texture"] = T
+        program["position"] = np.zeros((4,2))
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        uniforms = [name for name, gtype in program.active_uniforms]
+        assert len([name for name in uniforms if name.startswith("vtexture")]) == 6
+        assert gl.recorder.count("glTexImage2D") == 2
+
+        # Only changed table entries are uploaded
+        gl.recorder.clear()
+        T.update(self.region(0,0), (40,40))
+        program.draw(gl.GL_TRIANGLE_STRIP)
+        uploads = [call.args[2:6] for call in gl.recorder.calls
+                   if call.name == "glTexSubImage2D"]
+        assert (0, 0, 1, 1) in uploads
+
+
+if __name__ == "__main__":
+    unittest.main()
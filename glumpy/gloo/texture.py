@@ -9,6 +9,20 @@ source of a texture access from a Shader, or it can be used as a render target.
 
 Read more on framebuffers on `OpenGL Wiki <https://www.opengl.org/wiki/Texture>`_
 
+Modified regions are tracked as boxes (rectangles for 2D textures) and only
+these boxes are uploaded, the data being read in place from the whole array
+using the ``GL_UNPACK_ROW_LENGTH``, ``GL_UNPACK_SKIP_PIXELS`` and
+``GL_UNPACK_SKIP_ROWS`` (and image equivalents for 3D textures) parameters.
+
+2D textures that are rewritten every frame (e.g. video) can stage their
+uploads through a ring of pixel buffer objects such that the CPU copies the
+next frame while the GPU consumes the previous one:
+
+  .. code::
+
+     frame = np.zeros((height,width,3), np.uint8).view(gloo.Texture2D)
+     frame.pixel_buffers = 2
+
 **Example usage**:
 
   .. code::
@@ -28,11 +42,73 @@ Read more on framebuffers on `OpenGL Wiki <https://www.opengl.org/wiki/Texture>`
     ...
 """
 
+import ctypes
 import numpy as np
 from glumpy import gl
 from glumpy.log import log
-from glumpy.gloo.gpudata import GPUData
+from glumpy.gloo.gpudata import GPUData, merge_ranges
 from glumpy.gloo.globject import GLObject
+from glumpy.gloo import statistics
+
+
+def _reset_unpack():
+    """ Restore default pixel unpacking parameters """
+
+    gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, 0)
+    gl.glPixelStorei(gl.GL_UNPACK_SKIP_PIXELS, 0)
+    gl.glPixelStorei(gl.GL_UNPACK_SKIP_ROWS, 0)
+    gl.glPixelStorei(gl.GL_UNPACK_IMAGE_HEIGHT, 0)
+    gl.glPixelStorei(gl.GL_UNPACK_SKIP_IMAGES, 0)
+
+
+def _volume(box):
+    """ Number of texels in box """
+
+    return int(np.prod([stop - start for start, stop in box]))
+
+
+def _waste(A, B):
+    """ Number of unmodified texels in the box enclosing boxes A and B """
+
+    union = [(min(a0,b0), max(a1,b1)) for (a0,a1), (b0,b1) in zip(A, B)]
+    inter = [max(0, min(a1,b1) - max(a0,b0)) for (a0,a1), (b0,b1) in zip(A, B)]
+    return _volume(union) - _volume(A) - _volume(B) + int(np.prod(inter))
+
+
+def merge_box(boxes, box, threshold=0, count=None):
+    """
+    Insert a box (one [start,stop[ texel range per texture axis) into a list
+    of boxes, merging it with any box such that their enclosing box does not
+    contain more than threshold unmodified texels. If count is given, the
+    boxes whose merge wastes the fewest texels are then merged until there
+    are no more than count boxes.
+
+    :param list boxes: List of boxes (modified in place)
+    :param list box: Box to insert
+    :param int threshold: Number of unmodified texels below which boxes are merged
+    :param int count: Maximum number of boxes
+    """
+
+    box = [list(axis) for axis in box]
+    i = 0
+    while i < len(boxes):
+        if _waste(boxes[i], box) <= threshold:
+            other = boxes.pop(i)
+            box = [[min(a0,b0), max(a1,b1)] for (a0,a1), (b0,b1) in zip(box, other)]
+            i = 0
+        else:
+            i += 1
+    boxes.append(box)
+
+    if count is not None:
+        while len(boxes) > max(count,1):
+            pairs = [(_waste(boxes[i], boxes[j]), i, j)
+                     for i in range(len(boxes)) for j in range(i+1, len(boxes))]
+            _, i, j = min(pairs)
+            B = boxes.pop(j)
+            A = boxes[i]
+            boxes[i] = [[min(a0,b0), max(a1,b1)] for (a0,a1), (b0,b1) in zip(A, B)]
+    return boxes
 
 
 class Texture(GPUData,GLObject):
@@ -53,14 +129,44 @@ class Texture(GPUData,GLObject):
                            3: gl.GL_RGB32F,
                            4: gl.GL_RGBA32F }
 
+    _gpu_half_formats = { 1: gl.GL_R16F,
+                          2: gl.GL_RG16F,
+                          3: gl.GL_RGB16F,
+                          4: gl.GL_RGBA16F }
+
+    _gpu_norm16_formats = { 1: gl.GL_R16,
+                            2: gl.GL_RG16,
+                            3: gl.GL_RGB16,
+                            4: gl.GL_RGBA16 }
+
+    _gpu_norm8_formats = { 1: gl.GL_R8,
+                           2: gl.GL_RG8,
+                           3: gl.GL_RGB8,
+                           4: gl.GL_RGBA8 }
+
+    # GPU formats corresponding to a given precision
+    _precisions = { np.dtype(np.float32): _gpu_float_formats,
+                    np.dtype(np.float16): _gpu_half_formats,
+                    np.dtype(np.uint16):  _gpu_norm16_formats,
+                    np.dtype(np.uint8):   _gpu_norm8_formats }
+
     _gtypes = { np.dtype(np.int8):    gl.GL_BYTE,
                 np.dtype(np.uint8):   gl.GL_UNSIGNED_BYTE,
                 np.dtype(np.int16):   gl.GL_SHORT,
                 np.dtype(np.uint16):  gl.GL_UNSIGNED_SHORT,
                 np.dtype(np.int32):   gl.GL_INT,
                 np.dtype(np.uint32):  gl.GL_UNSIGNED_INT,
+                np.dtype(np.float16): gl.GL_HALF_FLOAT,
                 np.dtype(np.float32): gl.GL_FLOAT }
 
+    _resource = "texture"
+
+    # Pending boxes (None means they are to be computed from pending ranges)
+    _pending_boxes = None
+
+    # Half float staging array (float32 data uploaded to half float textures)
+    _half = None
+
     def __init__(self, target):
         GLObject.__init__(self)
         self._target = target
@@ -92,6 +198,132 @@ class Texture(GPUData,GLObject):
         return self.pending_data is not None
 
 
+    @property
+    def gpu_nbytes(self):
+        """ Number of bytes used on GPU """
+
+        return self.nbytes
+
+
+    @property
+    def pending_boxes(self):
+        """
+        Pending regions as boxes, a box being a [start,stop[ texel range
+        for each texture axis (numpy order, channels excluded).
+        """
+
+        if isinstance(self.base, GPUData):
+            return self.base.pending_boxes
+        return [tuple(tuple(axis) for axis in box) for box in self._boxes()]
+
+
+    def _boxes(self):
+        """ Pending boxes (computed from pending ranges if not known yet) """
+
+        if self._pending_boxes is None:
+            self._pending_boxes = []
+            for start, stop in self.pending_ranges:
+                self._add_pending_box(self._range_box(start, stop))
+        return self._pending_boxes
+
+
+    def _add_pending_box(self, box):
+        """ Add a pending box, merging it with previous ones """
+
+        texel = self.shape[-1]*self.itemsize
+        merge_box(self._pending_boxes, box,
+                  self._merge_threshold // texel, self._max_ranges)
+
+
+    def _unravel(self, offset):
+        """ Index (along each axis) of the given byte offset """
+
+        index, offset = [], offset // self.itemsize
+        for n in reversed(self.shape):
+            index.insert(0, offset % n)
+            offset //= n
+        return index
+
+
+    def _range_box(self, start, stop):
+        """
+        Smallest box enclosing the [start,stop[ byte range, i.e. a range
+        along the first differing axis and full following axes.
+        """
+
+        lo, hi = self._unravel(start), self._unravel(max(stop-1, start))
+        box, full = [], False
+        for k, n in enumerate(self.shape[:-1]):
+            box.append([0, n] if full else [lo[k], hi[k]+1])
+            full = full or lo[k] != hi[k]
+        return box
+
+
+    def _view_box(self, Z):
+        """
+        Box enclosing a view Z of this texture or None if the view axes
+        cannot be mapped onto texture axes (e.g. reshaped view).
+        """
+
+        if not self.flags.c_contiguous:
+            return None
+        base = self.__array_interface__['data'][0]
+        offset = Z.__array_interface__['data'][0] - base
+        for n, stride in zip(Z.shape, Z.strides):
+            offset += min(0, (n-1)*stride)
+        strides = np.cumprod((self.shape[1:] + (1,))[::-1])[::-1] * self.itemsize
+        lo = self._unravel(offset)
+        hi = list(lo)
+        for n, stride in zip(Z.shape, Z.strides):
+            if n < 2 or stride == 0:
+                continue
+            index = self._unravel(offset + (n-1)*abs(stride))
+            axes = [k for k in range(self.ndim) if index[k] != lo[k]]
+            if len(axes) != 1 or abs(stride) % strides[axes[0]]:
+                return None
+            hi[axes[0]] += index[axes[0]] - lo[axes[0]]
+        if any(i >= n for i, n in zip(hi, self.shape)):
+            return None
+        return [[lo[k], hi[k]+1] for k in range(self.ndim-1)]
+
+
+    def _add_pending_data(self, start, stop):
+        """ Add pending data and the box enclosing it """
+
+        if isinstance(self.base, GPUData):
+            return self.base._add_pending_data(start, stop)
+        self._boxes()
+        GPUData._add_pending_data(self, start, stop)
+        self._add_pending_box(self._range_box(start, stop))
+
+
+    def _add_pending_ranges(self, starts, stops):
+        """ Add pending ranges and the boxes enclosing them """
+
+        if isinstance(self.base, GPUData):
+            return self.base._add_pending_ranges(starts, stops)
+        self._boxes()
+        GPUData._add_pending_ranges(self, starts, stops)
+        for start, stop in merge_ranges([], starts, stops,
+                                        self._merge_threshold, self._max_ranges):
+            self._add_pending_box(self._range_box(start, stop))
+
+
+    def _add_pending_view(self, Z):
+        """ Add pending data corresponding to a modified view """
+
+        if isinstance(self.base, GPUData):
+            return self.base._add_pending_view(Z)
+        if Z.size == 0:
+            return
+        box = self._view_box(Z)
+        if box is None:
+            return self._add_pending_data(Z._extents[0], Z._extents[1])
+        self._boxes()
+        GPUData._add_pending_data(self, Z._extents[0], Z._extents[1])
+        self._add_pending_box(box)
+
+
     @property
     def cpu_format(self):
         """
@@ -131,6 +363,40 @@ class Texture(GPUData,GLObject):
         self._need_setup = True
 
 
+    @property
+    def precision(self):
+        """
+        Texture GPU precision (read/write) given as a numpy type, or None
+        if the GPU format is not a sized one (and is chosen by the driver).
+
+        * np.float32: 32 bits float (gl.GL_R32F ... gl.GL_RGBA32F)
+        * np.float16: 16 bits float (gl.GL_R16F ... gl.GL_RGBA16F)
+        * np.uint16:  16 bits normalized (gl.GL_R16 ... gl.GL_RGBA16)
+        * np.uint8:   8 bits normalized (gl.GL_R8 ... gl.GL_RGBA8)
+
+        Data is converted at upload time such that the CPU data type is
+        independent of the GPU precision. Float32 data uploaded to a float16
+        texture is converted on CPU (only pending boxes, into a reused
+        staging array) such that half as many bytes are transferred. Other
+        conversions are made by the driver.
+        """
+
+        for dtype, formats in Texture._precisions.items():
+            if formats.get(self.shape[-1]) == self._gpu_format:
+                return dtype.type
+        return None
+
+
+    @precision.setter
+    def precision(self, value):
+        """ Texture GPU precision """
+
+        dtype = np.dtype(value)
+        if dtype not in Texture._precisions.keys():
+            raise TypeError("Unknown texture precision (%s)" % dtype)
+        self.gpu_format = Texture._precisions[dtype][self.shape[-1]]
+
+
     @property
     def gtype(self):
         if self.dtype in Texture._gtypes.keys():
@@ -185,7 +451,7 @@ class Texture(GPUData,GLObject):
     def _activate(self):
         """ Activate texture on GPU """
 
-        log.debug("GPU: Activate texture")
+        statistics.count(self, "texture_binds")
         gl.glBindTexture(self.target, self._handle)
         if self._need_setup:
             self._setup()
@@ -194,7 +460,6 @@ class Texture(GPUData,GLObject):
     def _deactivate(self):
         """ Deactivate texture on GPU """
 
-        log.debug("GPU: Deactivate texture")
         gl.glBindTexture(self._target, 0)
 
 
@@ -210,6 +475,68 @@ class Texture(GPUData,GLObject):
         log.debug("GPU: Deleting texture")
         if self.handle > -1:
             gl.glDeleteTextures(np.array([self.handle], dtype=np.uint32))
+        # Data will need to be uploaded again if texture is re-created
+        self._add_pending_data(0, self.nbytes)
+
+    def _source(self):
+        """
+        Array pending data is uploaded from and its GL type: the texture
+        itself or, for float32 data and float16 precision, a float16 staging
+        array (with the same shape) pending boxes are converted into.
+        """
+
+        half = Texture._gpu_half_formats.values()
+        if self.dtype != np.float32 or self._gpu_format not in half:
+            return self, self.gtype
+        if self._half is None or self._half.shape != self.shape:
+            self._half = np.empty(self.shape, np.float16)
+        data = self.view(np.ndarray)
+        for box in self._boxes():
+            index = tuple(slice(start, stop) for start, stop in box)
+            np.copyto(self._half[index], data[index], casting="same_kind")
+        return self._half, gl.GL_HALF_FLOAT
+
+
+    def _update_volume(self):
+        """
+        Upload pending boxes of a (depth,height,width) texture, numpy axes
+        (0,1,2) being respectively the GL (z,y,x) axes (3D textures and
+        2D texture arrays).
+        """
+
+        if self.pending_data:
+            gl.glBindTexture(self._target, self.handle)
+            source, gtype = self._source()
+            texel = self.shape[-1]*source.itemsize
+            unpack = False
+            # One upload per pending box (full slabs are read in place as well
+            # once unpack parameters have been set by a previous one)
+            for (z, stop_z), (y, stop_y), (x, stop_x) in self._boxes():
+                width, height, depth = stop_x - x, stop_y - y, stop_z - z
+                if width == self.shape[2] and height == self.shape[1] and not unpack:
+                    data = source[z:stop_z]
+                elif source.flags.c_contiguous:
+                    # Box is read in place from the whole array
+                    if not unpack:
+                        gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, self.shape[2])
+                        gl.glPixelStorei(gl.GL_UNPACK_IMAGE_HEIGHT, self.shape[1])
+                    gl.glPixelStorei(gl.GL_UNPACK_SKIP_PIXELS, x)
+                    gl.glPixelStorei(gl.GL_UNPACK_SKIP_ROWS, y)
+                    gl.glPixelStorei(gl.GL_UNPACK_SKIP_IMAGES, z)
+                    data, unpack = source, True
+                else:
+                    data = np.ascontiguousarray(source[z:stop_z, y:stop_y, x:stop_x])
+                gl.glTexSubImage3D(self.target, 0, x, y, z, width, height, depth,
+                                   self._cpu_format, gtype, data)
+                statistics.count(self, "uploads")
+                statistics.count(self, "uploaded", width*height*depth*texel)
+            if unpack:
+                _reset_unpack()
+
+        self._pending_data = None
+        self._pending_boxes = None
+        self._need_update = False
+
 
     def get(self):
         """ Read the texture data back into CPU memory """
@@ -257,22 +584,18 @@ class Texture1D(Texture):
         self._need_setup = False
 
     def _update(self):
+        """ Update texture on GPU """
 
-        log.debug("GPU: Updating texture")
         if self.pending_data:
-            start, stop = self.pending_data
-            offset, nbytes = start, stop-start
-            itemsize = self.strides[0]
-            x = offset // itemsize
-            width = nbytes//itemsize
-            gl.glTexSubImage1D(self.target, 0, x, width, self._cpu_format, self.gtype, self)
-
-            # x,width = self.pending_data
-            # itemsize = self.strides[0]
-            # x /= itemsize
-            # width /= itemsize
-            # gl.glTexSubImage1D(self.target, 0, x, width, self._cpu_format, self.gtype, self)
+            source, gtype = self._source()
+            for (x, stop), in self._boxes():
+                width = stop - x
+                gl.glTexSubImage1D(self.target, 0, x, width, self._cpu_format,
+                                   gtype, source[x:x+width])
+                statistics.count(self, "uploads")
+                statistics.count(self, "uploaded", width*source.strides[0])
         self._pending_data = None
+        self._pending_boxes = None
         self._need_update = False
 
 
@@ -287,14 +610,65 @@ class TextureFloat1D(Texture1D):
 
 
 
+class TextureHalf1D(Texture1D):
+    """
+    One dimensional half float texture.
+    """
+
+    def __init__(self):
+        Texture1D.__init__(self)
+        self._gpu_format = Texture._gpu_half_formats[self.shape[-1]]
+
+
+
 class Texture2D(Texture):
     """ 2D texture """
 
+    # Number of pixel buffers uploads are staged through
+    _pixel_buffers = 0
+
     def __init__(self):
         Texture.__init__(self, gl.GL_TEXTURE_2D)
         self.shape = self._check_shape(self.shape, 2)
         self._cpu_format = Texture._cpu_formats[self.shape[-1]]
         self._gpu_format = Texture._gpu_formats[self.shape[-1]]
+        # Pixel buffers, their fences and index of the next one to be used
+        self._pixel_handles = []
+        self._pixel_fences = []
+        self._pixel_index = 0
+
+    @property
+    def pixel_buffers(self):
+        """
+        Number of pixel buffer objects uploads are staged through
+        (read/write). When non zero, pending data is copied into the next
+        pixel buffer and transferred to the texture asynchronously, each
+        buffer being protected by a fence until the GPU has consumed it.
+        Default is 0 (data is uploaded directly from client memory).
+        """
+
+        if isinstance(self.base, Texture2D):
+            return self.base.pixel_buffers
+        return self._pixel_buffers
+
+    @pixel_buffers.setter
+    def pixel_buffers(self, value):
+        """ Number of pixel buffer objects uploads are staged through """
+
+        if isinstance(self.base, Texture2D):
+            self.base.pixel_buffers = value
+        else:
+            # Pixel buffers are (re)created on next update
+            self._pixel_buffers = max(int(value), 0)
+            # GPU footprint changed
+            if self._manager is not None:
+                self._manager.register(self)
+
+    @property
+    def gpu_nbytes(self):
+        """ Number of bytes used on GPU """
+
+        return (1 + self._pixel_buffers) * self.nbytes
 
     @property
     def width(self):
@@ -348,31 +722,116 @@ class Texture2D(Texture):
         """ Update texture on GPU """
 
         if self.pending_data:
-            log.debug("GPU: Updating texture")
+            gl.glBindTexture(self._target, self.handle)
+            source, gtype = self._source()
+            texel = self.shape[-1]*source.itemsize
+            unpack = False
+            staged = self._pixel_buffers > 0 and source.flags.c_contiguous
+            if staged:
+                self._stage(source)
+            elif self._pixel_handles:
+                self._delete_pixel_buffers()
+            # One upload per pending rectangle (full rows are read in place as
+            # well once unpack parameters have been set by a previous one)
+            for (y, stop_y), (x, stop_x) in self._boxes():
+                width, height = stop_x - x, stop_y - y
+                if width == self.width and not unpack:
+                    data, offset = source[y:stop_y], y*source.strides[0]
+                elif source.flags.c_contiguous:
+                    # Rectangle is read in place from the whole array
+                    if not unpack:
+                        gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, self.width)
+                    gl.glPixelStorei(gl.GL_UNPACK_SKIP_PIXELS, x)
+                    gl.glPixelStorei(gl.GL_UNPACK_SKIP_ROWS, y)
+                    data, offset, unpack = source, 0, True
+                else:
+                    data = np.ascontiguousarray(source[y:stop_y, x:stop_x])
+                if staged:
+                    # Data is read from the bound pixel buffer
+                    data = ctypes.c_void_p(offset)
+                gl.glTexSubImage2D(self.target, 0, x, y, width, height,
+                                   self._cpu_format, gtype, data)
+                statistics.count(self, "uploads")
+                if not staged:
+                    statistics.count(self, "uploaded", width*height*texel)
+            if unpack:
+                _reset_unpack()
+            if staged:
+                self._unstage()
 
-            start, stop = self.pending_data
-            offset, nbytes = start, stop-start
+        self._pending_data = None
+        self._pending_boxes = None
+        self._need_update = False
 
-            itemsize = self.strides[1]
-            offset /= itemsize
-            nbytes /= itemsize
 
-            nbytes += offset % self.width
-            offset -= offset % self.width
-            nbytes += (self.width - ((offset + nbytes) % self.width)) % self.width
 
-            x = 0
-            y = offset // self.width
-            width = self.width
-            height = nbytes // self.width
-            gl.glBindTexture(self._target, self.handle)
-            gl.glTexSubImage2D(self.target, 0, x, y, width, height,
-                               self._cpu_format, self.gtype, self)
-            gl.glBindTexture(self._target, self.handle)
+    def _stage(self, source):
+        """
+        Copy pending rows of source (texture data or its converted copy)
+        into the next pixel buffer, waiting for the GPU to have consumed its
+        previous content. The pixel buffer is left bound such that texture
+        uploads read from it.
+        """
+
+        if len(self._pixel_handles) != self._pixel_buffers:
+            self._delete_pixel_buffers()
+            handles = gl.glGenBuffers(self._pixel_buffers)
+            self._pixel_handles = [int(h) for h in np.atleast_1d(handles)]
+            self._pixel_fences = [None] * self._pixel_buffers
+            for handle in self._pixel_handles:
+                gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, handle)
+                gl.glBufferData(gl.GL_PIXEL_UNPACK_BUFFER, self.nbytes,
+                                None, gl.GL_STREAM_DRAW)
+
+        index = self._pixel_index
+        fence = self._pixel_fences[index]
+        if fence is not None:
+            while gl.glClientWaitSync(fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT,
+                                      1000000) == gl.GL_TIMEOUT_EXPIRED:
+                pass
+            gl.glDeleteSync(fence)
+            self._pixel_fences[index] = None
+
+        # Rows spanned by pending rectangles are copied at the same offset
+        boxes = self._boxes()
+        start = min(box[0][0] for box in boxes) * source.strides[0]
+        stop = max(box[0][1] for box in boxes) * source.strides[0]
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, self._pixel_handles[index])
+        address = gl.glMapBufferRange(gl.GL_PIXEL_UNPACK_BUFFER, start, stop-start,
+                                      gl.GL_MAP_WRITE_BIT | gl.GL_MAP_INVALIDATE_RANGE_BIT)
+        ctypes.memmove(address, source.ctypes.data + start, stop-start)
+        gl.glUnmapBuffer(gl.GL_PIXEL_UNPACK_BUFFER)
+        statistics.count(self, "uploaded", stop-start)
+
+
+    def _unstage(self):
+        """ Fence current pixel buffer and unbind it """
+
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+        index = self._pixel_index
+        self._pixel_fences[index] = gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self._pixel_index = (index + 1) % len(self._pixel_handles)
+
+
+    def _delete_pixel_buffers(self):
+        """ Delete pixel buffers and their fences """
+
+        for fence in self._pixel_fences:
+            if fence is not None:
+                gl.glDeleteSync(fence)
+        if self._pixel_handles:
+            gl.glDeleteBuffers(len(self._pixel_handles),
+                               np.array(self._pixel_handles, dtype=np.uint32))
+        self._pixel_handles = []
+        self._pixel_fences = []
+        self._pixel_index = 0
 
-        self._pending_data = None
-        self._need_update = False
 
+    def _delete(self):
+        """ Delete texture (and pixel buffers) from GPU """
+
+        Texture._delete(self)
+        self._delete_pixel_buffers()
 
 
 class TextureFloat2D(Texture2D):
@@ -383,6 +842,14 @@ class TextureFloat2D(Texture2D):
         self._gpu_format = Texture._gpu_float_formats[self.shape[-1]]
 
 
+class TextureHalf2D(Texture2D):
+    """ 2D half float texture """
+
+    def __init__(self):
+        Texture2D.__init__(self)
+        self._gpu_format = Texture._gpu_half_formats[self.shape[-1]]
+
+
 class Texture3D(Texture):
     """ 2D texture """
 
@@ -456,50 +923,80 @@ class Texture3D(Texture):
     def _update(self):
         """ Update texture on GPU """
 
-        #FIXME: lazy alternative -- update complet texture
-        if self.pending_data:    
-            gl.glBindTexture(self._target, self.handle)
-            #the swizzled order of the dimensions assures the right interpretation of the underlying array
-            gl.glTexImage3D(self.target, 0, self._gpu_format, self.depth, self.width, self.height,
-                            0, self._cpu_format, self.gtype, np.ascontiguousarray( self ))
-            gl.glBindTexture(self._target, self.handle)
+        self._update_volume()
 
 
-        if False: 
-            if self.pending_data:
-                log.debug("GPU: Updating texture")
 
-                start, stop = self.pending_data
-                offset, nbytes = start, stop-start
+class TextureFloat3D(Texture3D):
+    """ 3D float texture """
 
-                itemsize = self.strides[1]
-                offset /= itemsize
-                nbytes /= itemsize
+    def __init__(self):
+        Texture3D.__init__(self)
+        self._gpu_format = Texture._gpu_float_formats[self.shape[-1]]
 
-                nbytes += offset % self.width
-                offset -= offset % self.width
-                nbytes += (self.width - ((offset + nbytes) % self.width)) % self.width
 
-                x = 0
-                y = offset // self.width
-                width = self.width
-                height = nbytes // self.width
-                gl.glBindTexture(self._target, self.handle)
-                gl.glTexSubImage2D(self.target, 0, x, y, width, height,
-                                self._cpu_format, self.gtype, self)
-                gl.glBindTexture(self._target, self.handle)
+class TextureHalf3D(Texture3D):
+    """ 3D half float texture """
 
-        self._pending_data = None
-        self._need_update = False
+    def __init__(self):
+        Texture3D.__init__(self)
+        self._gpu_format = Texture._gpu_half_formats[self.shape[-1]]
 
 
+class Texture2DArray(Texture):
+    """
+    Array of 2D textures (layers) having the same shape and format, that
+    are bound together and sampled in shaders using a sampler2DArray (with
+    a (u,v,layer) texture coordinate). Pending data is tracked and uploaded
+    per layer region.
 
-class TextureFloat3D(Texture3D):
-    """ 3D float texture """
+    **Example usage**:
+
+      .. code::
+
+         images = np.zeros((count,height,width,4), np.uint8).view(gloo.Texture2DArray)
+         images[3] = image
+    """
 
     def __init__(self):
-        Texture3D.__init__(self)
-        self._gpu_format = Texture._gpu_float_formats[self.shape[-1]]
+        Texture.__init__(self, gl.GL_TEXTURE_2D_ARRAY)
+        self.shape = self._check_shape(self.shape, 3)
+        self._cpu_format = Texture._cpu_formats[self.shape[-1]]
+        self._gpu_format = Texture._gpu_formats[self.shape[-1]]
+
+    @property
+    def layers(self):
+        """ Number of layers """
+
+        return self.shape[0]
+
+    @property
+    def width(self):
+        """ Texture (layer) width """
+
+        return self.shape[2]
+
+    @property
+    def height(self):
+        """ Texture (layer) height """
+
+        return self.shape[1]
+
+
+    def _setup(self):
+        """ Setup texture on GPU """
+
+        Texture._setup(self)
+        gl.glBindTexture(self.target, self._handle)
+        gl.glTexImage3D(self.target, 0, self._gpu_format, self.width, self.height,
+                        self.layers, 0, self._cpu_format, self.gtype, None)
+        self._need_setup = False
+
+
+    def _update(self):
+        """ Update texture on GPU """
+
+        self._update_volume()
 
 
 class DepthTexture(Texture2D):
@@ -560,7 +1057,7 @@ class TextureCube(Texture):
 
 
     def _update(self):
-        log.debug("GPU: Updating texture cube")
+        """ Update texture on GPU """
 
         if self.need_update:
             gl.glEnable(gl.GL_TEXTURE_CUBE_MAP)
@@ -573,36 +1070,41 @@ class TextureCube(Texture):
                         gl.GL_TEXTURE_CUBE_MAP_POSITIVE_Z,
                         gl.GL_TEXTURE_CUBE_MAP_NEGATIVE_Z ]
 
-            for i,target in enumerate(targets):
-                face = self[i]
-                pending = self.pending_data
-                extents = face._extents
-                if pending is None:         continue
-                if pending[1] < extents[0]: continue
-                if pending[0] > extents[1]: continue
-                start = max(extents[0], pending[0]) - extents[0]
-                stop = min(extents[1], pending[1]) - extents[0]
-                offset,nbytes = start, stop-start
-                itemsize = face.strides[1]
-                offset /= itemsize
-                nbytes /= itemsize
-                nbytes += offset % self.width
-                offset -= offset % self.width
-                nbytes += (self.width - ((offset + nbytes) % self.width)) % self.width
-                x = 0
-                y = offset // self.width
-                width = self.width
-                height = nbytes // self.width
-                gl.glTexSubImage2D(target, 0, x, y, width, height,
-                                   self._cpu_format, self.gtype, face)
+            source, gtype = self._source()
+            texel = self.shape[-1]*source.itemsize
+            unpack = False
+            # One upload per face of each pending box (full rows are read in
+            # place as well once unpack parameters have been set)
+            for (start, stop), (y, stop_y), (x, stop_x) in self._boxes():
+                width, height = stop_x - x, stop_y - y
+                for i in range(start, stop):
+                    face = source[i]
+                    if width == self.width and not unpack:
+                        data = face[y:stop_y]
+                    elif face.flags.c_contiguous:
+                        # Rectangle is read in place from the whole face
+                        if not unpack:
+                            gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, self.width)
+                        gl.glPixelStorei(gl.GL_UNPACK_SKIP_PIXELS, x)
+                        gl.glPixelStorei(gl.GL_UNPACK_SKIP_ROWS, y)
+                        data, unpack = face, True
+                    else:
+                        data = np.ascontiguousarray(face[y:stop_y, x:stop_x])
+                    gl.glTexSubImage2D(targets[i], 0, x, y, width, height,
+                                       self._cpu_format, gtype, data)
+                    statistics.count(self, "uploads")
+                    statistics.count(self, "uploaded", width*height*texel)
+            if unpack:
+                _reset_unpack()
 
         self._pending_data = None
+        self._pending_boxes = None
         self._need_update = False
 
     def _activate(self):
         """ Activate texture on GPU """
 
-        log.debug("GPU: Activate texture cube")
+        statistics.count(self, "texture_binds")
         gl.glEnable(gl.GL_TEXTURE_CUBE_MAP)
         gl.glBindTexture(self.target, self._handle)
         if self._need_setup:
@@ -612,6 +1114,5 @@ class TextureCube(Texture):
     def _deactivate(self):
         """ Deactivate texture on GPU """
 
-        log.debug("GPU: Deactivate texture cube")
         gl.glBindTexture(self._target, 0)
         gl.glDisable(gl.GL_TEXTURE_CUBE_MAP)
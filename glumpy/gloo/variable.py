@@ -8,29 +8,30 @@ the GPU. For OpenGL ES 2.0, there are mainly two types: uniforms and
 attributes. The correspondance betwenn GPU and CPU data types is given in the
 table below.
 
-=========== ================== == ================== ==============
-GLSL Type   GLSL/GL Type       #  GL elementary type Numpy type
-=========== ================== == ================== ==============
-float       gl.GL_FLOAT        1  gl.GL_FLOAT        np.float32
-vec2        gl.GL_FLOAT_VEC2   2  gl.GL_FLOAT        np.float32
-vec3        gl.GL_FLOAT_VEC3   3  gl.GL_FLOAT        np.float32
-vec4        gl.GL_FLOAT_VEC4   4  gl.GL_FLOAT        np.float32
-int         gl.GL_INT          1  gl.GL_INT          np.int32
-ivec2       gl.GL_INT_VEC2     2  gl.GL_INT          np.int32
-ivec3       gl.GL_INT_VEC3     3  gl.GL_INT          np.int32
-ivec4       gl.GL_INT_VEC4     4  gl.GL_INT          np.int32
-bool        gl.GL_BOOL         1  gl.GL_BOOL         np.bool_
-bvec2       gl.GL_BOOL_VEC2    2  gl.GL_BOOL         np.bool_
-bvec3       gl.GL_BOOL_VEC3    3  gl.GL_BOOL         np.bool_
-bvec4       gl.GL_BOOL_VEC4    4  gl.GL_BOOL         np.bool_
-mat2        gl.GL_FLOAT_MAT2   4  gl.GL_FLOAT        np.float32
-mat3        gl.GL_FLOAT_MAT3   9  gl.GL_FLOAT        np.float32
-mat4        gl.GL_FLOAT_MAT4   16 gl.GL_FLOAT        np.float32
-sampler1D   gl.GL_SAMPLER_1D   1  gl.GL_UNSIGNED_INT np.uint32
-sampler2D   gl.GL_SAMPLER_2D   1  gl.GL_UNSIGNED_INT np.uint32
-sampler3D   gl.GL_SAMPLER_3D   1  gl.GL_UNSIGNED_INT np.uint32
-samplerCube gl.GL_SAMPLER_CUBE 1  gl.GL_UNSIGNED_INT np.uint32
-=========== ================== == ================== ==============
+============== ====================== == ================== ==============
+GLSL Type      GLSL/GL Type           #  GL elementary type Numpy type
+============== ====================== == ================== ==============
+float          gl.GL_FLOAT            1  gl.GL_FLOAT        np.float32
+vec2           gl.GL_FLOAT_VEC2       2  gl.GL_FLOAT        np.float32
+vec3           gl.GL_FLOAT_VEC3       3  gl.GL_FLOAT        np.float32
+vec4           gl.GL_FLOAT_VEC4       4  gl.GL_FLOAT        np.float32
+int            gl.GL_INT              1  gl.GL_INT          np.int32
+ivec2          gl.GL_INT_VEC2         2  gl.GL_INT          np.int32
+ivec3          gl.GL_INT_VEC3         3  gl.GL_INT          np.int32
+ivec4          gl.GL_INT_VEC4         4  gl.GL_INT          np.int32
+bool           gl.GL_BOOL             1  gl.GL_BOOL         np.bool_
+bvec2          gl.GL_BOOL_VEC2        2  gl.GL_BOOL         np.bool_
+bvec3          gl.GL_BOOL_VEC3        3  gl.GL_BOOL         np.bool_
+bvec4          gl.GL_BOOL_VEC4        4  gl.GL_BOOL         np.bool_
+mat2           gl.GL_FLOAT_MAT2       4  gl.GL_FLOAT        np.float32
+mat3           gl.GL_FLOAT_MAT3       9  gl.GL_FLOAT        np.float32
+mat4           gl.GL_FLOAT_MAT4       16 gl.GL_FLOAT        np.float32
+sampler1D      gl.GL_SAMPLER_1D       1  gl.GL_UNSIGNED_INT np.uint32
+sampler2D      gl.GL_SAMPLER_2D       1  gl.GL_UNSIGNED_INT np.uint32
+sampler3D      gl.GL_SAMPLER_3D       1  gl.GL_UNSIGNED_INT np.uint32
+samplerCube    gl.GL_SAMPLER_CUBE     1  gl.GL_UNSIGNED_INT np.uint32
+sampler2DArray gl.GL_SAMPLER_2D_ARRAY 1  gl.GL_UNSIGNED_INT np.uint32
+============== ====================== == ================== ==============
 
 .. note:: 
 
@@ -61,12 +62,11 @@ import ctypes
 import numpy as np
 
 from glumpy import gl
-from glumpy.log import log
 from glumpy.gloo.globject import GLObject
 from glumpy.gloo.array import VertexArray
-from glumpy.gloo.buffer import VertexBuffer
+from glumpy.gloo.buffer import VertexBuffer, RingBuffer
 from glumpy.gloo.texture import TextureCube
-from glumpy.gloo.texture import Texture1D, Texture2D, Texture3D
+from glumpy.gloo.texture import Texture1D, Texture2D, Texture3D, Texture2DArray
 from glumpy.gloo.texture import TextureFloat1D, TextureFloat2D, TextureFloat3D
 
 
@@ -90,7 +90,8 @@ gl_typeinfo = {
     gl.GL_SAMPLER_1D   : ( 1, gl.GL_UNSIGNED_INT, np.uint32),
     gl.GL_SAMPLER_2D   : ( 1, gl.GL_UNSIGNED_INT, np.uint32),
     gl.GL_SAMPLER_3D   : ( 1, gl.GL_UNSIGNED_INT, np.uint32),
-    gl.GL_SAMPLER_CUBE : ( 1, gl.GL_UNSIGNED_INT, np.uint32)
+    gl.GL_SAMPLER_CUBE : ( 1, gl.GL_UNSIGNED_INT, np.uint32),
+    gl.GL_SAMPLER_2D_ARRAY : ( 1, gl.GL_UNSIGNED_INT, np.uint32)
 }
 
 
@@ -108,7 +109,8 @@ class Variable(GLObject):
                          gl.GL_INT,        gl.GL_BOOL,
                          gl.GL_FLOAT_MAT2, gl.GL_FLOAT_MAT3,
                          gl.GL_FLOAT_MAT4, gl.GL_SAMPLER_1D,
-                         gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D, gl.GL_SAMPLER_CUBE]:
+                         gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D, gl.GL_SAMPLER_CUBE,
+                         gl.GL_SAMPLER_2D_ARRAY]:
             raise TypeError("Unknown variable type")
 
         GLObject.__init__(self)
@@ -184,20 +186,23 @@ class Variable(GLObject):
 class Uniform(Variable):
     """ A Uniform represents a program uniform variable. """
 
+    # GL functions are looked up by name when needed since GL backend may be
+    # selected after this module has been imported
     _ufunctions = {
-        gl.GL_FLOAT:        gl.glUniform1fv,
-        gl.GL_FLOAT_VEC2:   gl.glUniform2fv,
-        gl.GL_FLOAT_VEC3:   gl.glUniform3fv,
-        gl.GL_FLOAT_VEC4:   gl.glUniform4fv,
-        gl.GL_INT:          gl.glUniform1iv,
-        gl.GL_BOOL:         gl.glUniform1iv,
-        gl.GL_FLOAT_MAT2:   gl.glUniformMatrix2fv,
-        gl.GL_FLOAT_MAT3:   gl.glUniformMatrix3fv,
-        gl.GL_FLOAT_MAT4:   gl.glUniformMatrix4fv,
-        gl.GL_SAMPLER_1D:   gl.glUniform1i,
-        gl.GL_SAMPLER_2D:   gl.glUniform1i,
-        gl.GL_SAMPLER_3D:   gl.glUniform1i,
-        gl.GL_SAMPLER_CUBE: gl.glUniform1i
+        gl.GL_FLOAT:        "glUniform1fv",
+        gl.GL_FLOAT_VEC2:   "glUniform2fv",
+        gl.GL_FLOAT_VEC3:   "glUniform3fv",
+        gl.GL_FLOAT_VEC4:   "glUniform4fv",
+        gl.GL_INT:          "glUniform1iv",
+        gl.GL_BOOL:         "glUniform1iv",
+        gl.GL_FLOAT_MAT2:   "glUniformMatrix2fv",
+        gl.GL_FLOAT_MAT3:   "glUniformMatrix3fv",
+        gl.GL_FLOAT_MAT4:   "glUniformMatrix4fv",
+        gl.GL_SAMPLER_1D:   "glUniform1i",
+        gl.GL_SAMPLER_2D:   "glUniform1i",
+        gl.GL_SAMPLER_3D:   "glUniform1i",
+        gl.GL_SAMPLER_CUBE: "glUniform1i",
+        gl.GL_SAMPLER_2D_ARRAY: "glUniform1i"
     }
 
 
@@ -207,7 +212,7 @@ class Uniform(Variable):
         Variable.__init__(self, program, name, gtype)
         size, _, dtype = gl_typeinfo[self._gtype]
         self._data = np.zeros(size, dtype)
-        self._ufunction = Uniform._ufunctions[self._gtype]
+        self._ufunction = getattr(gl, Uniform._ufunctions[self._gtype])
         self._texture_unit = -1
 
 
@@ -226,8 +231,8 @@ class Uniform(Variable):
 
             # Automatic texture creation if required
             else:
-                data = np.array(data,copy=False)
-                if data.dtype in [np.float16, np.float32, np.float64]:
+                data = np.asarray(data)
+                if data.dtype in [np.float32, np.float64]:
                     self._data = data.astype(np.float32).view(Texture1D)
                 else:
                     self._data = data.view(Texture1D)
@@ -241,8 +246,8 @@ class Uniform(Variable):
 
             # Automatic texture creation if required
             else:
-                data = np.array(data,copy=False)
-                if data.dtype in [np.float16, np.float32, np.float64]:
+                data = np.asarray(data)
+                if data.dtype in [np.float32, np.float64]:
                     self._data = data.astype(np.float32).view(Texture2D)
                 else:
                     self._data = data.view(Texture2D)
@@ -256,8 +261,8 @@ class Uniform(Variable):
 
             # Automatic texture creation if required
             else:
-                data = np.array(data,copy=False)
-                if data.dtype in [np.float16, np.float32, np.float64]:
+                data = np.asarray(data)
+                if data.dtype in [np.float32, np.float64]:
                     self._data = data.astype(np.float32).view(Texture3D)
                 else:
                     self._data = data.view(Texture3D)
@@ -270,22 +275,40 @@ class Uniform(Variable):
 
             # Automatic texture creation if required
             else:
-                data = np.array(data,copy=False)
-                if data.dtype in [np.float16, np.float32, np.float64]:
+                data = np.asarray(data)
+                if data.dtype in [np.float32, np.float64]:
                     self._data = data.astype(np.float32).view(TextureCube)
                 else:
                     self._data = data.view(TextureCube)
 
+        elif self._gtype == gl.GL_SAMPLER_2D_ARRAY:
+            if isinstance(data, Texture2DArray):
+                self._data = data
+            elif isinstance(self._data, Texture2DArray):
+                self._data[...] = data.reshape(self._data.shape)
+
+            # Automatic texture creation if required
+            else:
+                data = np.asarray(data)
+                if data.dtype in [np.float32, np.float64]:
+                    self._data = data.astype(np.float32).view(Texture2DArray)
+                else:
+                    self._data = data.view(Texture2DArray)
+
         else:
-            self._data[...] = np.array(data,copy=False).ravel()
+            data = np.asarray(data, dtype=self._data.dtype).ravel()
+            # Identical values do not need to be uploaded again
+            if (self._data == data).all():
+                return
+            self._data[...] = data
 
         self._need_update = True
 
 
     def _activate(self):
-        if self._gtype in (gl.GL_SAMPLER_1D, gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D, gl.GL_SAMPLER_CUBE):
+        if self._gtype in (gl.GL_SAMPLER_1D, gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D,
+                           gl.GL_SAMPLER_CUBE, gl.GL_SAMPLER_2D_ARRAY):
             if self.data is not None:
-                log.debug("GPU: Active texture is %d" % self._texture_unit)
                 gl.glActiveTexture(gl.GL_TEXTURE0 + self._texture_unit)
                 self.data.activate()
 
@@ -301,6 +324,18 @@ class Uniform(Variable):
         #           every machine, we can expect nasty bugs from this early
         #           return
 
+        # Nothing to do if the (possibly shared) program already holds this
+        # value (last uploaded values are shadowed per uniform location)
+        if self._gtype in (gl.GL_SAMPLER_1D, gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D,
+                           gl.GL_SAMPLER_CUBE, gl.GL_SAMPLER_2D_ARRAY):
+            uploaded = self._texture_unit
+        else:
+            uploaded = self._data.tobytes()
+        values = self._program._uniform_values
+        if values.get(self._handle) == uploaded:
+            return
+        values[self._handle] = uploaded
+
         # Matrices (need a transpose argument)
         if self._gtype in (gl.GL_FLOAT_MAT2, gl.GL_FLOAT_MAT3, gl.GL_FLOAT_MAT4):
             # OpenGL ES 2.0 does not support transpose
@@ -308,9 +343,9 @@ class Uniform(Variable):
             self._ufunction(self._handle, 1, transpose, self._data)
 
         # Textures (need to get texture count)
-        elif self._gtype in (gl.GL_SAMPLER_1D, gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D, gl.GL_SAMPLER_CUBE):
+        elif self._gtype in (gl.GL_SAMPLER_1D, gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D,
+                             gl.GL_SAMPLER_CUBE, gl.GL_SAMPLER_2D_ARRAY):
             # texture = self.data
-            log.debug("GPU: Activactin texture %d" % self._texture_unit)
             # gl.glActiveTexture(gl.GL_TEXTURE0 + self._unit)
             # gl.glBindTexture(texture.target, texture.handle)
             gl.glUniform1i(self._handle, self._texture_unit)
@@ -333,10 +368,22 @@ class Attribute(Variable):
     """ An Attribute represents a program attribute variable """
 
     _afunctions = {
-        gl.GL_FLOAT:      gl.glVertexAttrib1f,
-        gl.GL_FLOAT_VEC2: gl.glVertexAttrib2f,
-        gl.GL_FLOAT_VEC3: gl.glVertexAttrib3f,
-        gl.GL_FLOAT_VEC4: gl.glVertexAttrib4f
+        gl.GL_FLOAT:      "glVertexAttrib1f",
+        gl.GL_FLOAT_VEC2: "glVertexAttrib2f",
+        gl.GL_FLOAT_VEC3: "glVertexAttrib3f",
+        gl.GL_FLOAT_VEC4: "glVertexAttrib4f"
+    }
+
+    # GL types of vertex buffer fields that can feed float attributes
+    _ptypes = {
+        np.dtype(np.int8):    gl.GL_BYTE,
+        np.dtype(np.uint8):   gl.GL_UNSIGNED_BYTE,
+        np.dtype(np.int16):   gl.GL_SHORT,
+        np.dtype(np.uint16):  gl.GL_UNSIGNED_SHORT,
+        np.dtype(np.int32):   gl.GL_INT,
+        np.dtype(np.uint32):  gl.GL_UNSIGNED_INT,
+        np.dtype(np.float16): gl.GL_HALF_FLOAT,
+        np.dtype(np.float32): gl.GL_FLOAT
     }
 
     def __init__(self, program, name, gtype):
@@ -350,6 +397,57 @@ class Attribute(Variable):
         # Whether this attribure is generic
         self._generic = False
 
+        # Whether integer data is normalized (None means automatic)
+        self._normalized = None
+
+
+    @property
+    def normalized(self):
+        """
+        Whether integer vertex data is normalized (read/write), i.e. mapped
+        to [0,1] (unsigned) or [-1,1] (signed) when read as float. Default
+        (None) is to normalize integer fields of a vertex buffer bound to a
+        float attribute (e.g. colors as 4 np.uint8 or normals as 3 np.int16).
+        """
+
+        return self._normalized
+
+    @normalized.setter
+    def normalized(self, value):
+        """ Whether integer vertex data is normalized """
+
+        self._normalized = value
+        self._need_update = True
+        self._invalidate()
+
+
+    def _invalidate(self):
+        """ Invalidate program vertex arrays (bound data has changed) """
+
+        if self._program is not None:
+            self._program._invalidate_vertex_arrays()
+
+
+    def _pointer(self):
+        """
+        Size, GL type and normalization flag describing the bound vertex
+        data, as expected by glVertexAttribPointer.
+        """
+
+        size, gtype, _ = gl_typeinfo[self._gtype]
+        if gtype != gl.GL_FLOAT:
+            return size, gtype, gl.GL_FALSE
+
+        # Float attributes may be fed with compact (integer or half) fields
+        dtype = self.data.dtype
+        if dtype.names:
+            dtype = dtype[0]
+        gtype = Attribute._ptypes.get(dtype.base, gl.GL_FLOAT)
+        normalized = self._normalized
+        if normalized is None:
+            normalized = gtype not in (gl.GL_FLOAT, gl.GL_HALF_FLOAT)
+        return size, gtype, gl.GL_TRUE if normalized else gl.GL_FALSE
+
 
 
     def set_data(self, data):
@@ -360,10 +458,13 @@ class Attribute(Variable):
         # New vertex buffer
         if isinstance(data, (VertexBuffer,VertexArray)):
             self._data = data
+            if isinstance(data, RingBuffer):
+                data.attach(self._program)
 
         # We already have a vertex buffer
         elif isinstance(self._data, (VertexBuffer,VertexArray)):
             self._data[...] = data
+            return
 
         # Data is a tuple with size <= 4, we assume this designates a generate
         # vertex attribute.
@@ -373,38 +474,46 @@ class Attribute(Variable):
             # Let numpy convert the data for us
             _, _, dtype = gl_typeinfo[self._gtype]
             self._data = np.array(data).astype(dtype)
+            if not self._generic:
+                self._invalidate()
             self._generic = True
             self._need_update = True
-            self._afunction = Attribute._afunctions[self._gtype]
+            self._afunction = getattr(gl, Attribute._afunctions[self._gtype])
             return
 
         # For array-like, we need to build a proper VertexBuffer to be able to
         # upload it later to GPU memory.
         else: #lif not isinstance(data, VertexBuffer):
             name,base,count = self.dtype
-            data = np.array(data,dtype=base,copy=False)
+            data = np.asarray(data,dtype=base)
             data = data.ravel().view([self.dtype])
             # WARNING : transform data with the right type
-            # data = np.array(data,copy=False)
+            # data = np.asarray(data)
             self._data = data.view(VertexBuffer)
 
+        # Program vertex arrays refer to the previous buffer
+        self._invalidate()
         self._generic = False
 
 
     def _activate(self):
         if isinstance(self.data, (VertexBuffer, VertexArray)):
             self.data.activate()
-            size, gtype, dtype = gl_typeinfo[self._gtype]
+            size, gtype, normalized = self._pointer()
             stride = self.data.stride
             offset = ctypes.c_void_p(self.data.offset)
             gl.glEnableVertexAttribArray(self.handle)
-            gl.glVertexAttribPointer(self.handle, size, gtype, gl.GL_FALSE, stride, offset)
+            gl.glVertexAttribPointer(self.handle, size, gtype, normalized, stride, offset)
+            if isinstance(self.data, VertexBuffer) and self.data.divisor:
+                gl.glVertexAttribDivisor(self.handle, self.data.divisor)
 
     def _deactivate(self):
         if isinstance(self.data,VertexBuffer):
             self.data.deactivate()
             if self.handle >= 0:
                 gl.glDisableVertexAttribArray(self.handle)
+                if self.data.divisor:
+                    gl.glVertexAttribDivisor(self.handle, 0)
         elif isinstance(self.data,VertexArray):
             self.data.deactivate()
 
@@ -412,8 +521,6 @@ class Attribute(Variable):
     def _update(self):
         """ Actual upload of data to GPU memory  """
 
-        log.debug("GPU: Updating %s" % self.name)
-
         # Check active status (mandatory)
 #        if not self._active:
 #            raise RuntimeError("Attribute variable is not active")
@@ -432,15 +539,15 @@ class Attribute(Variable):
             #    self.data._update()
             #    self._need_update = False
 
-            # Get relevant information from gl_typeinfo
-            size, gtype, dtype = gl_typeinfo[self._gtype]
+            # Get relevant information from gl_typeinfo and bound data
+            size, gtype, normalized = self._pointer()
             stride = self.data.stride
 
             # Make offset a pointer, or it will be interpreted as a small array
             offset = ctypes.c_void_p(self.data.offset)
             gl.glEnableVertexAttribArray(self.handle)
             gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.data.handle)
-            gl.glVertexAttribPointer(self.handle, size, gtype,  gl.GL_FALSE, stride, offset)
+            gl.glVertexAttribPointer(self.handle, size, gtype, normalized, stride, offset)
 
 
     def _create(self):
@@ -0,0 +1,375 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+"""
+A virtual texture allows to display images that are too large to fit into
+memory or into a single texture (e.g. 100k×100k microscopy mosaics). The
+image is split into a pyramid of tiles (level 0 being the full resolution and
+each level halving the resolution of the previous one) and only the tiles
+needed by the current view are decoded and stored into a fixed size tile
+cache texture, least recently used tiles being evicted first.
+
+Tiles are decoded in a thread pool while the texture is updated from the
+application thread (at most once per frame). An indirection table (one texel
+per finest tile) gives for each part of the image the position of the finest
+resident tile covering it such that a coarser tile is displayed while finer
+ones are being decoded.
+
+**Example usage**:
+
+  .. code:: python
+
+     fragment = '''
+     varying vec2 v_texcoord;
+     void main() { gl_FragColor = <texture>(v_texcoord); } '''
+
+     image = np.load("mosaic.npy", mmap_mode="r")
+     transform = PanZoom(aspect=1)
+     texture = gloo.VirtualTexture(image, transform=transform)
+     program['texture'] = texture
+     program['transform'] = transform
+     window.attach(transform)
+     window.attach(texture)
+"""
+import math
+import collections
+import concurrent.futures
+import numpy as np
+from glumpy import gl, library
+from glumpy.log import log
+from . snippet import Snippet
+from . texture import Texture2D, TextureFloat2D
+
+
+class VirtualTexture(Snippet):
+    """
+    Virtual (tiled) texture.
+
+    :param array source:
+       Full resolution image (height, width[, channels]). Any object having a
+       shape and supporting slicing can be used (e.g. a numpy memmap) since
+       only the needed tiles are read.
+
+    :param int tile:
+       Tile size (in texels). Default is 256.
+
+    :param (int,int) cache:
+       Tile cache size (in tiles, rows × columns). Default is 8×8.
+
+    :param int workers:
+       Number of decoding threads. If 0, tiles are decoded synchronously when
+       updating. Default is 4.
+
+    :param callable loader:
+       Function returning the tile at given (level, row, column). Default
+       loader decimates the source array.
+
+    :param Transform transform:
+       PanZoom transform the view is taken from when drawing (the image being
+       displayed over the [-1,1]×[-1,1] square). Default is None.
+
+    The snippet is a function of the texture coordinates returning the
+    texture color. The tile cache is updated automatically from the
+    transform view at each ``on_draw`` event (once the virtual texture has
+    been attached to the window) or explicitly by calling :meth:`update`.
+    """
+
+    def __init__(self, source, tile=256, cache=(8,8), workers=4,
+                 loader=None, transform=None):
+
+        code = library.get("misc/virtual-texture.glsl")
+        Snippet.__init__(self, code, "vtexture")
+
+        self._source = source
+        self._loader = loader or self._decimate
+        self._tile = int(tile)
+        self._transform = transform
+        self._resolution = 512, 512
+
+        height, width = source.shape[:2]
+        channels = source.shape[2] if len(source.shape) > 2 else 1
+        self._size = height, width
+        self._levels = 1 + max(0, int(math.ceil(math.log2(max(height, width)/self._tile))))
+
+        # Tile cache (texture + slot -> key and key -> slot in LRU order)
+        rows, cols = cache
+        shape = rows*self._tile, cols*self._tile, channels
+        self._cache = np.zeros(shape, dtype=source.dtype).view(Texture2D)
+        self._cache.interpolation = gl.GL_LINEAR
+        self._count = rows*cols
+        self._free = list(range(self._count))[::-1]
+        self._slots = collections.OrderedDict()
+        self._cols = cols
+
+        # Indirection table (one texel per finest tile)
+        pages = self.tiles(0)
+        self._table = np.zeros(pages + (4,), np.float32).view(TextureFloat2D)
+
+        # Decoding (key -> future)
+        self._pending = collections.OrderedDict()
+        self._executor = None
+        if workers > 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+        # Coarsest tile is always resident
+        self._pinned = (self._levels-1, 0, 0)
+        self._insert(self._pinned, np.asarray(self._loader(*self._pinned)))
+        self._update_table()
+
+
+    @property
+    def levels(self):
+        """ Number of levels in the tile pyramid """
+
+        return self._levels
+
+    @property
+    def cache(self):
+        """ Tile cache texture """
+
+        return self._cache
+
+    @property
+    def table(self):
+        """ Indirection table texture """
+
+        return self._table
+
+    @property
+    def resident(self):
+        """ Resident tiles as (level, row, column), least recently used first """
+
+        return list(self._slots.keys())
+
+    @property
+    def pending(self):
+        """ Tiles being decoded as (level, row, column) """
+
+        return list(self._pending.keys())
+
+
+    def tiles(self, level):
+        """ Number of tiles (rows, columns) at given level """
+
+        size = self._tile * 2**level
+        height, width = self._size
+        return (height+size-1)//size, (width+size-1)//size
+
+
+    def level(self, region, resolution):
+        """
+        Level needed to display the given region at given resolution
+
+        :param (float,float,float,float) region:
+           Region (u0,v0,u1,v1) in texture coordinates
+
+        :param (int,int) resolution:
+           Size (width,height) of the region on screen (pixels)
+        """
+
+        u0, v0, u1, v1 = region
+        height, width = self._size
+        texels = max((u1-u0)*width / max(resolution[0], 1),
+                     (v1-v0)*height / max(resolution[1], 1))
+        level = int(math.floor(math.log2(max(texels, 1.0))))
+        return min(level, self._levels-1)
+
+
+    def visible(self, region, level):
+        """
+        Tiles covering the given region at given level
+
+        :param (float,float,float,float) region:
+           Region (u0,v0,u1,v1) in texture coordinates
+
+        :param int level:
+           Pyramid level
+        """
+
+        u0, v0, u1, v1 = np.clip(region, 0, 1)
+        size = self._tile * 2**level
+        height, width = self._size
+        rows, cols = self.tiles(level)
+        r0 = min(int(v0*height)//size, rows-1)
+        c0 = min(int(u0*width)//size, cols-1)
+        r1 = min(int(math.ceil(v1*height/size)), rows)
+        c1 = min(int(math.ceil(u1*width/size)), cols)
+        return [(level, row, col) for row in range(r0, max(r1, r0+1))
+                                  for col in range(c0, max(c1, c0+1))]
+
+
+    def update(self, region=(0,0,1,1), resolution=None, wait=False):
+        """
+        Request tiles needed by the given view and store decoded tiles into
+        the cache.
+
+        :param (float,float,float,float) region:
+           Visible region (u0,v0,u1,v1) in texture coordinates
+
+        :param (int,int) resolution:
+           Size (width,height) of the region on screen (pixels)
+
+        :param bool wait:
+           Whether to wait for needed tiles to be decoded
+        """
+
+        resolution = resolution or self._resolution
+
+        # Coarser level if needed tiles do not fit into the cache
+        level = self.level(region, resolution)
+        needed = self.visible(region, level)
+        while len(needed) > self._count-1 and level < self._levels-1:
+            level += 1
+            needed = self.visible(region, level)
+
+        # Request missing tiles (most recently needed are used last)
+        for key in needed:
+            if key in self._slots:
+                self._slots.move_to_end(key)
+            elif key not in self._pending:
+                self._pending[key] = self._submit(key)
+
+        # Cancel requests that are not needed anymore
+        needed = set(needed)
+        for key, future in list(self._pending.items()):
+            if key not in needed and future.cancel():
+                del self._pending[key]
+
+        if wait and self._executor is not None:
+            futures = [future for key, future in self._pending.items() if key in needed]
+            concurrent.futures.wait(futures)
+
+        # Store decoded tiles
+        changed = False
+        for key, future in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[key]
+            try:
+                tile = np.asarray(future.result())
+            except Exception as error:
+                log.warning("Cannot decode tile %s (%s)" % (str(key), error))
+                continue
+            if self._insert(key, tile, needed):
+                changed = True
+
+        if changed:
+            self._update_table()
+
+
+    def delete(self):
+        """ Stop decoding threads and delete textures """
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+        self._cache.delete()
+        self._table.delete()
+
+
+    def attach(self, program):
+        """ Attach the virtual texture to a program and set its uniforms """
+
+        Snippet.attach(self, program)
+
+        rows, cols = self.tiles(0)
+        height, width = self._size
+        cache_height, cache_width = self._cache.shape[:2]
+        self["vtexture_cache"] = self._cache
+        self["vtexture_table"] = self._table
+        self["vtexture_tile"] = self._tile/width, self._tile/height
+        self["vtexture_pages"] = cols, rows
+        self["vtexture_slot"] = self._tile/cache_width, self._tile/cache_height
+        self["vtexture_border"] = 0.5/self._tile, 0.5/self._tile
+
+
+    def on_resize(self, width, height):
+        self._resolution = width, height
+
+
+    def on_draw(self, dt):
+        if self._transform is None:
+            return
+
+        # Visible part of the [-1,1]×[-1,1] square (flipping y such that the
+        # first image row is at the top of the window)
+        scale = np.asarray(self._transform.scale) * np.ones(2)
+        pan = np.asarray(self._transform.pan) * np.ones(2)
+        x0, y0 = (-1 - pan) / scale
+        x1, y1 = (+1 - pan) / scale
+        region = (x0+1)/2, (1-y1)/2, (x1+1)/2, (1-y0)/2
+        self.update(region, self._resolution)
+
+
+    def _submit(self, key):
+        """ Request decoding of a tile """
+
+        if self._executor is not None:
+            return self._executor.submit(self._loader, *key)
+
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(self._loader(*key))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+    def _decimate(self, level, row, col):
+        """ Default loader (decimation of the source) """
+
+        step = 2**level
+        size = self._tile * step
+        height, width = self._size
+        rows = slice(row*size, min((row+1)*size, height), step)
+        cols = slice(col*size, min((col+1)*size, width), step)
+        return np.asarray(self._source[rows, cols])
+
+
+    def _insert(self, key, tile, needed=()):
+        """
+        Store a tile into the cache, evicting the least recently used tile
+        if necessary (but not needed or pinned ones).
+        """
+
+        if not self._free:
+            for victim in self._slots.keys():
+                if victim != self._pinned and victim not in needed:
+                    self._free.append(self._slots.pop(victim))
+                    break
+            else:
+                return False
+
+        slot = self._free.pop()
+        self._slots[key] = slot
+        y, x = (slot // self._cols)*self._tile, (slot % self._cols)*self._tile
+        height, width = tile.shape[:2]
+        self._cache[y:y+height, x:x+width] = tile.reshape(height, width, -1)
+        return True
+
+
+    def _update_table(self):
+        """ Update the indirection table from resident tiles """
+
+        table = np.empty(self._table.shape, np.float32)
+        cache_height, cache_width = self._cache.shape[:2]
+
+        # Coarser tiles first such that finer ones override them
+        for key in sorted(self._slots.keys(), reverse=True):
+            level, row, col = key
+            slot = self._slots[key]
+            step = 2**level
+            u = (slot % self._cols)*self._tile / cache_width
+            v = (slot // self._cols)*self._tile / cache_height
+            table[row*step:(row+1)*step, col*step:(col+1)*step] = u, v, step, 1
+
+        # Only upload the bounding box of changed entries
+        changed = np.any(table != self._table.view(np.ndarray), axis=-1)
+        rows, = np.nonzero(changed.any(axis=1))
+        cols, = np.nonzero(changed.any(axis=0))
+        if len(rows):
+            r0, r1 = rows[0], rows[-1]+1
+            c0, c1 = cols[0], cols[-1]+1
+            self._table[r0:r1, c0:c1] = table[r0:r1, c0:c1]
@@ -353,6 +353,32 @@ class BaseCollection(object):
 
         self._need_update = True
 
+    def ranges(self, items):
+        """
+        Ranges of the given items as (first, count) arrays, in vertices or in
+        indices if the collection is indexed. Consecutive items are merged
+        into a single range.
+
+        :param int|array items: Item indices or boolean mask
+        """
+
+        data = self._vertices_list
+        if self._indices_list is not None:
+            data = self._indices_list
+        items = np.atleast_1d(items)
+        if items.dtype != bool:
+            items = items.astype(int)
+        ranges = data._items[:len(data)][items]
+        if not len(ranges):
+            return np.zeros(0, int), np.zeros(0, int)
+
+        starts, stops = ranges[:,0], ranges[:,1]
+        begin = np.ones(len(ranges), bool)
+        begin[1:] = starts[1:] != stops[:-1]
+        end = np.append(begin[1:], True)
+        return starts[begin], stops[end] - starts[begin]
+
+
     def __getitem__(self, key):
         """ """
 
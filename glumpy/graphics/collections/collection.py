@@ -100,6 +100,10 @@ class Collection(BaseCollection):
         itype = np.dtype(itype) if itype else None
         utype = np.dtype(utype) if utype else None
 
+        # Uniforms of all programs indexed by name (see _lookup)
+        self._index = {}
+        self._index_state = None
+
         BaseCollection.__init__(self, vtype=vtype, utype=utype, itype=itype)
         self._declarations = declarations
         self._defaults = defaults
@@ -169,33 +173,51 @@ class Collection(BaseCollection):
 
 
 
+    def _lookup(self, key):
+        """ Uniforms named key in all the collection programs """
+
+        # Index is rebuilt when programs or their uniforms have changed
+        state = [(program, program._generation) for program in self._programs]
+        if state != self._index_state:
+            self._index = {}
+            for program in self._programs:
+                for name, uniform in program._uniforms.items():
+                    self._index.setdefault(name, []).append(uniform)
+            self._index_state = state
+        return self._index.get(key, [])
+
+
     def __getitem__(self, key):
 
         program = self._programs[0]
         if key in program.hooks:
             return program[key]
 
-        for (name,gtype) in program.all_uniforms:
-            if name == key:
-                return program[key]
+        for uniform in self._lookup(key):
+            if uniform._program is program:
+                return uniform.data
 
         return BaseCollection.__getitem__(self, key)
 
 
     def __setitem__(self, key, value):
 
-        found = False
-        for program in self._programs:
-            for (name,gtype) in program.all_uniforms:
-                if name == key:
-                    found = True
-                    program[key] = value
-        if not found:
+        uniforms = self._lookup(key)
+        for uniform in uniforms:
+            uniform.set_data(value)
+        if not uniforms:
             BaseCollection.__setitem__(self, key, value)
 
 
-    def draw(self, mode = None):
-        """ Draw collection """
+    def draw(self, mode = None, items = None):
+        """
+        Draw collection
+
+        :param int|array|None items:
+            Items to be drawn (indices or boolean mask), e.g. visible or
+            selected ones. All items are drawn by default. Items ranges are
+            drawn using a single (multi) draw call.
+        """
 
         if self._need_update:
             self._update()
@@ -203,10 +225,14 @@ class Collection(BaseCollection):
         program = self._programs[0]
 
         mode = mode or self._mode
+        indices = None
         if self._indices_list is not None:
-            program.draw(mode, self._indices_buffer)
+            indices = self._indices_buffer
+        if items is None:
+            program.draw(mode, indices)
         else:
-            program.draw(mode)
+            first, count = self.ranges(items)
+            program.draw(mode, indices, first=first, count=count)
 
 
 
@@ -3,8 +3,19 @@
 # Distributed under the (new) BSD License.
 # -----------------------------------------------------------------------------
 import unittest
+from unittest import mock
 import numpy as np
-from . collection import BaseCollection
+from glumpy import gl
+from . collection import BaseCollection, Collection
+
+def setUpModule():
+    global backend
+    backend = gl.use("mock")
+
+
+def tearDownModule():
+    if backend is not None:
+        gl.use(backend)
 
 vtype = [('position', 'f4', 2)]
 utype = [('color',    'f4', 3)]
@@ -56,6 +67,39 @@ class BaseCollectionDefault(unittest.TestCase):
         del C[:9]
         assert np.allclose(C[0].indices , indices)
 
+    def test_ranges(self):
+        C = BaseCollection(vtype, None, itype)
+        C.append(np.zeros(40, dtype=vtype), indices=indices, itemsize=4)
+        first, count = C.ranges([1, 2, 3, 7, 5])
+        assert list(first) == [6, 42, 30]
+        assert list(count) == [18, 6, 6]
+        first, count = C.ranges(np.arange(10) % 2 == 0)
+        assert list(first) == [0, 12, 24, 36, 48]
+        assert list(count) == [6, 6, 6, 6, 6]
+        first, count = C.ranges([])
+        assert len(first) == len(count) == 0
+
+
+class CollectionUniforms(unittest.TestCase):
+
+    vertex = """
+    void main() { fetch_uniforms(); gl_Position = vec4(scale*position, 0.0, 1.0); }
+    """
+    fragment = "void main() { gl_FragColor = vec4(1.0); }"
+
+    def test_uniforms(self):
+        dtype = [("position", (np.float32, 2), "!local", (0,0)),
+                 ("scale",    (np.float32, 1), "global", 1.0)]
+        C = Collection(dtype, None, gl.GL_POINTS, self.vertex, self.fragment)
+        view = C.view(None)
+        assert C["scale"] == 1
+        with mock.patch("glumpy.gloo.shader.scan") as scan:
+            for i in range(10):
+                C["scale"] = i
+            assert scan.call_count == 0
+        assert C["scale"] == 9
+        assert view["scale"] == 9
+
 
 # -----------------------------------------------------------------------------
 if __name__ == "__main__":
@@ -47,7 +47,7 @@ class Filter(object):
         for i in range(3):
             depth = gloo.DepthBuffer(width, height)
             # depth = np.zeros((height,width),np.float32).view(gloo.DepthTexture)
-            color = np.zeros((height,width,3),np.float32).view(gloo.Texture2D)
+            color = np.zeros((height,width,3),np.uint8).view(gloo.Texture2D)
             framebuffer = gloo.FrameBuffer(color=color, depth=depth)
             self._framebuffers.append(framebuffer)
 
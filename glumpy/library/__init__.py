@@ -2,27 +2,139 @@
 # Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
 # Distributed under the (new) BSD License.
 # -----------------------------------------------------------------------------
+"""
+The shader library is indexed once such that locating a file does not scan
+the library directories. Filenames and file contents are cached and the
+library is checked for modifications (directory and file modification
+times) at most every ``interval`` seconds, in which case caches are
+invalidated and the library is indexed again.
+"""
 import os
+import time
 from glumpy.log import log
 
+
+# Interval (in seconds) between two checks of library modifications
+interval = 1.0
+
+# Library directory
+_path = os.path.dirname(__file__) or '.'
+
+# Library index (name -> filename) and directory modification times
+_index = None
+_mtimes = {}
+
+# Located names (name -> filename or None)
+_found = {}
+
+# File contents (filename -> (modification time, content))
+_files = {}
+
+# Last check time and library version (incremented on modifications)
+_checked = 0
+_version = 0
+
+
+def _mtime(path):
+    """ Modification time of path (None if it does not exist) """
+
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _build():
+    """ Index library files by their names relative to the library or to
+    one of its top-level directories """
+
+    global _index, _mtimes
+
+    index, mtimes = {}, {}
+    roots = [_path] + [os.path.join(_path, d) for d in sorted(os.listdir(_path))
+                       if os.path.isdir(os.path.join(_path, d))]
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith("__")]
+            mtimes[dirpath] = _mtime(dirpath)
+            for filename in filenames:
+                filename = os.path.abspath(os.path.join(dirpath, filename))
+                name = os.path.relpath(filename, root)
+                index.setdefault(os.path.normpath(name), filename)
+    _index, _mtimes = index, mtimes
+    log.debug("Shader library indexed (%d names)" % len(index))
+
+
+def _check():
+    """ Invalidate caches if the library has been modified """
+
+    global _checked, _version
+
+    now = time.time()
+    if _index is not None and now - _checked < interval:
+        return
+    _checked = now
+    _found.clear()
+
+    modified = False
+    for filename, (mtime, content) in list(_files.items()):
+        if _mtime(filename) != mtime:
+            del _files[filename]
+            modified = True
+    if _index is None or any(_mtime(d) != mtime for d, mtime in _mtimes.items()):
+        _build()
+        modified = True
+    if modified:
+        _version += 1
+
+
+def refresh():
+    """ Force a check of library modifications """
+
+    global _checked
+
+    _checked = 0
+    _check()
+
+
+def version():
+    """ Library version (changes whenever the library has been modified) """
+
+    _check()
+    return _version
+
+
 def find(name):
     """ Locate a filename into the shader library """
 
+    _check()
+    try:
+        return _found[name]
+    except KeyError:
+        pass
+
     if os.path.exists(name):
-        return name
+        filename = name
+    else:
+        filename = _index.get(os.path.normpath(name), None)
+    _found[name] = filename
+    return filename
+
+
+def read(filename):
+    """ Read (cached) content of the given file """
 
-    path = os.path.dirname(__file__) or '.'
-    filename = os.path.abspath(os.path.join(path,name))
-    if os.path.exists(filename):
-        return filename
+    _check()
+    try:
+        return _files[filename][1]
+    except KeyError:
+        pass
 
-    for d in os.listdir(path):
-        fullpath = os.path.abspath(os.path.join(path,d))
-        if os.path.isdir(fullpath):
-            filename = os.path.abspath(os.path.join(fullpath,name))
-            if os.path.exists(filename):
-                return filename
-    return None
+    mtime = _mtime(filename)
+    with open(filename) as file:
+        content = file.read()
+    _files[filename] = mtime, content
+    return content
 
 
 def get(name):
@@ -31,4 +143,4 @@ def get(name):
     filename = find(name)
     if filename == None:
         return name
-    return open(filename).read()
+    return read(filename)
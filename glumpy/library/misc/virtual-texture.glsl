@@ -0,0 +1,26 @@
+// -----------------------------------------------------------------------------
+// Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+// Distributed under the (new) BSD License.
+// -----------------------------------------------------------------------------
+// Virtual texture lookup
+//
+// The indirection table holds one texel per finest tile, giving the position
+// of the resident tile covering it in the cache (xy) and its level scale (z,
+// a power of two, 1 for finest tiles).
+// -----------------------------------------------------------------------------
+
+uniform sampler2D vtexture_cache;  // Tile cache
+uniform sampler2D vtexture_table;  // Indirection table
+uniform vec2 vtexture_tile;        // Finest tile size (texture coordinates)
+uniform vec2 vtexture_pages;       // Indirection table size (tiles)
+uniform vec2 vtexture_slot;        // Cache slot size (cache coordinates)
+uniform vec2 vtexture_border;      // Half texel (slot coordinates)
+
+vec4 vtexture(vec2 texcoord)
+{
+    vec2 p = texcoord / vtexture_tile;
+    vec4 page = texture2D(vtexture_table, p / vtexture_pages);
+    vec2 local = fract(p / page.z);
+    local = clamp(local, vtexture_border, 1.0 - vtexture_border);
+    return texture2D(vtexture_cache, page.xy + local*vtexture_slot);
+}
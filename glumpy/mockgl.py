@@ -0,0 +1,1067 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2009-2016 Nicolas P. Rougier. All rights reserved.
+# Distributed under the (new) BSD License.
+# -----------------------------------------------------------------------------
+"""
+Recording mock of the GL API.
+
+This module implements the subset of the GL API used by glumpy without
+requiring any GL context (or even PyOpenGL). Objects get fake handles, a
+minimal state is tracked (bindings, buffer sizes, shader sources, program
+uniforms and attributes) and every call is recorded together with the
+number of bytes it transfers. This allows to exercise and to benchmark the
+CPU side of glumpy on headless machines.
+
+The mock backend is selected by setting the ``GLUMPY_GL`` environment
+variable to ``mock`` or using ``glumpy.gl.use("mock")`` before any GL object
+is created.
+
+**Example usage**:
+
+  .. code:: python
+
+     from glumpy import gl, gloo
+     gl.use("mock")
+
+     program = gloo.Program(vertex, fragment, count=4)
+     program.draw(gl.GL_TRIANGLE_STRIP)
+     print(gl.recorder.count("glDrawArrays"), gl.recorder.nbytes)
+"""
+import re
+import ast
+import sys
+import collections
+import numpy as np
+
+
+# --------------------------------------------------------------- Constants ---
+GL_ACTIVE_ATTRIBUTES                     = 0x8B89
+GL_ACTIVE_UNIFORMS                       = 0x8B86
+GL_ACTIVE_UNIFORM_BLOCKS                 = 0x8A36
+GL_ALREADY_SIGNALED                      = 0x911A
+GL_ARRAY_BUFFER                          = 0x8892
+GL_BLEND                                 = 0x0BE2
+GL_BOOL                                  = 0x8B56
+GL_BOOL_VEC2                             = 0x8B57
+GL_BOOL_VEC3                             = 0x8B58
+GL_BOOL_VEC4                             = 0x8B59
+GL_BYTE                                  = 0x1400
+GL_CLAMP                                 = 0x2900
+GL_CLAMP_TO_EDGE                         = 0x812F
+GL_COLOR_ATTACHMENT0                     = 0x8CE0
+GL_COLOR_ATTACHMENT1                     = 0x8CE1
+GL_COLOR_BUFFER_BIT                      = 0x4000
+GL_COMPILE_STATUS                        = 0x8B81
+GL_CONDITION_SATISFIED                   = 0x911C
+GL_DEPTH                                 = 0x1801
+GL_DEPTH_ATTACHMENT                      = 0x8D00
+GL_DEPTH_BUFFER_BIT                      = 0x0100
+GL_DEPTH_COMPONENT                       = 0x1902
+GL_DEPTH_COMPONENT16                     = 0x81A5
+GL_DEPTH_TEST                            = 0x0B71
+GL_DOUBLEBUFFER                          = 0x0C32
+GL_DYNAMIC_DRAW                          = 0x88E8
+GL_ELEMENT_ARRAY_BUFFER                  = 0x8893
+GL_EXTENSIONS                            = 0x1F03
+GL_FALSE                                 = 0x0000
+GL_FLOAT                                 = 0x1406
+GL_FLOAT_MAT2                            = 0x8B5A
+GL_FLOAT_MAT3                            = 0x8B5B
+GL_FLOAT_MAT4                            = 0x8B5C
+GL_FLOAT_VEC2                            = 0x8B50
+GL_FLOAT_VEC3                            = 0x8B51
+GL_FLOAT_VEC4                            = 0x8B52
+GL_FRAGMENT_SHADER                       = 0x8B30
+GL_FRAMEBUFFER                           = 0x8D40
+GL_FRAMEBUFFER_ATTACHMENT_ALPHA_SIZE     = 0x8215
+GL_FRAMEBUFFER_ATTACHMENT_BLUE_SIZE      = 0x8214
+GL_FRAMEBUFFER_ATTACHMENT_COLOR_ENCODING = 0x8210
+GL_FRAMEBUFFER_ATTACHMENT_DEPTH_SIZE     = 0x8216
+GL_FRAMEBUFFER_ATTACHMENT_GREEN_SIZE     = 0x8213
+GL_FRAMEBUFFER_ATTACHMENT_RED_SIZE       = 0x8212
+GL_FRAMEBUFFER_ATTACHMENT_STENCIL_SIZE   = 0x8217
+GL_FRAMEBUFFER_COMPLETE                  = 0x8CD5
+GL_FRAMEBUFFER_INCOMPLETE_ATTACHMENT     = 0x8CD6
+GL_FRAMEBUFFER_INCOMPLETE_DIMENSIONS     = 0x8CD9
+GL_FRAMEBUFFER_INCOMPLETE_FORMATS        = 0x8CDA
+GL_FRAMEBUFFER_INCOMPLETE_MISSING_ATTACHMENT = 0x8CD7
+GL_FRAMEBUFFER_UNSUPPORTED               = 0x8CDD
+GL_FRONT                                 = 0x0404
+GL_FRONT_AND_BACK                        = 0x0408
+GL_FRONT_LEFT                            = 0x0400
+GL_GEOMETRY_INPUT_TYPE_EXT               = 0x8DDB
+GL_GEOMETRY_OUTPUT_TYPE_EXT              = 0x8DDC
+GL_GEOMETRY_SHADER                       = 0x8DD9
+GL_GEOMETRY_SHADER_EXT                   = 0x8DD9
+GL_GEOMETRY_VERTICES_OUT_EXT             = 0x8DDA
+GL_HALF_FLOAT                            = 0x140B
+GL_INT                                   = 0x1404
+GL_INT_VEC2                              = 0x8B53
+GL_INT_VEC3                              = 0x8B54
+GL_INT_VEC4                              = 0x8B55
+GL_INVALID_INDEX                         = 0xFFFFFFFF
+GL_LINE                                  = 0x1B01
+GL_LINEAR                                = 0x2601
+GL_LINES                                 = 0x0001
+GL_LINES_ADJACENCY_EXT                   = 0x000A
+GL_LINE_LOOP                             = 0x0002
+GL_LINE_SMOOTH                           = 0x0B20
+GL_LINE_SMOOTH_HINT                      = 0x0C52
+GL_LINE_STRIP                            = 0x0003
+GL_LINE_STRIP_ADJACENCY_EXT              = 0x000B
+GL_LINK_STATUS                           = 0x8B82
+GL_LUMINANCE                             = 0x1909
+GL_MAP_INVALIDATE_BUFFER_BIT             = 0x0008
+GL_MAP_INVALIDATE_RANGE_BIT              = 0x0004
+GL_MAP_UNSYNCHRONIZED_BIT                = 0x0020
+GL_MAP_WRITE_BIT                         = 0x0002
+GL_MAX_RENDERBUFFER_SIZE                 = 0x84E8
+GL_MAX_TEXTURE_IMAGE_UNITS               = 0x8872
+GL_MAX_TEXTURE_SIZE                      = 0x0D33
+GL_NEAREST                               = 0x2600
+GL_NICEST                                = 0x1102
+GL_NO_ERROR                              = 0x0000
+GL_NUM_PROGRAM_BINARY_FORMATS            = 0x87FE
+GL_ONE                                   = 0x0001
+GL_ONE_MINUS_DST_ALPHA                   = 0x0305
+GL_ONE_MINUS_SRC_ALPHA                   = 0x0303
+GL_ONE_MINUS_SRC_COLOR                   = 0x0301
+GL_PACK_ALIGNMENT                        = 0x0D05
+GL_PIXEL_UNPACK_BUFFER                   = 0x88EC
+GL_POINTS                                = 0x0000
+GL_POINT_SPRITE                          = 0x8861
+GL_POLYGON_OFFSET_FILL                   = 0x8037
+GL_PROGRAM_BINARY_FORMATS                = 0x87FF
+GL_PROGRAM_BINARY_LENGTH                 = 0x8741
+GL_PROGRAM_BINARY_RETRIEVABLE_HINT       = 0x8257
+GL_R16                                   = 0x822A
+GL_R16F                                  = 0x822D
+GL_R32F                                  = 0x822E
+GL_R8                                    = 0x8229
+GL_RED                                   = 0x1903
+GL_RENDERBUFFER                          = 0x8D41
+GL_RENDERER                              = 0x1F01
+GL_REPEAT                                = 0x2901
+GL_RG                                    = 0x8227
+GL_RG16                                  = 0x822C
+GL_RG16F                                 = 0x822F
+GL_RG32F                                 = 0x8230
+GL_RG8                                   = 0x822B
+GL_RGB                                   = 0x1907
+GL_RGB16                                 = 0x8054
+GL_RGB16F                                = 0x881B
+GL_RGB32F                                = 0x8815
+GL_RGB565                                = 0x8D62
+GL_RGB5_A1                               = 0x8057
+GL_RGB8                                  = 0x8051
+GL_RGBA                                  = 0x1908
+GL_RGBA16                                = 0x805B
+GL_RGBA16F                               = 0x881A
+GL_RGBA32F                               = 0x8814
+GL_RGBA4                                 = 0x8056
+GL_RGBA8                                 = 0x8058
+GL_SAMPLER_1D                            = 0x8B5D
+GL_SAMPLER_2D                            = 0x8B5E
+GL_SAMPLER_2D_ARRAY                      = 0x8DC1
+GL_SAMPLER_3D                            = 0x8B5F
+GL_SAMPLER_CUBE                          = 0x8B60
+GL_SAMPLES                               = 0x80A9
+GL_SCISSOR_BIT                           = 0x80000
+GL_SCISSOR_BOX                           = 0x0C10
+GL_SCISSOR_TEST                          = 0x0C11
+GL_SHADING_LANGUAGE_VERSION              = 0x8B8C
+GL_SHORT                                 = 0x1402
+GL_SRC_ALPHA                             = 0x0302
+GL_SRGB                                  = 0x8C40
+GL_STATIC_DRAW                           = 0x88E4
+GL_STENCIL                               = 0x1802
+GL_STENCIL_ATTACHMENT                    = 0x8D20
+GL_STENCIL_BUFFER_BIT                    = 0x0400
+GL_STENCIL_INDEX                         = 0x1901
+GL_STENCIL_INDEX8                        = 0x8D48
+GL_STEREO                                = 0x0C33
+GL_STREAM_DRAW                           = 0x88E0
+GL_SYNC_FLUSH_COMMANDS_BIT               = 0x0001
+GL_SYNC_GPU_COMMANDS_COMPLETE            = 0x9117
+GL_TEXTURE0                              = 0x84C0
+GL_TEXTURE_1D                            = 0x0DE0
+GL_TEXTURE_2D                            = 0x0DE1
+GL_TEXTURE_2D_ARRAY                      = 0x8C1A
+GL_TEXTURE_3D                            = 0x806F
+GL_TEXTURE_CUBE_MAP                      = 0x8513
+GL_TEXTURE_CUBE_MAP_NEGATIVE_X           = 0x8516
+GL_TEXTURE_CUBE_MAP_NEGATIVE_Y           = 0x8518
+GL_TEXTURE_CUBE_MAP_NEGATIVE_Z           = 0x851A
+GL_TEXTURE_CUBE_MAP_POSITIVE_X           = 0x8515
+GL_TEXTURE_CUBE_MAP_POSITIVE_Y           = 0x8517
+GL_TEXTURE_CUBE_MAP_POSITIVE_Z           = 0x8519
+GL_TEXTURE_MAG_FILTER                    = 0x2800
+GL_TEXTURE_MIN_FILTER                    = 0x2801
+GL_TEXTURE_WRAP_R                        = 0x8072
+GL_TEXTURE_WRAP_S                        = 0x2802
+GL_TEXTURE_WRAP_T                        = 0x2803
+GL_TIMEOUT_EXPIRED                       = 0x911B
+GL_TRIANGLES                             = 0x0004
+GL_TRIANGLE_STRIP                        = 0x0005
+GL_TRUE                                  = 0x0001
+GL_UNIFORM_BUFFER                        = 0x8A11
+GL_UNPACK_ALIGNMENT                      = 0x0CF5
+GL_UNPACK_IMAGE_HEIGHT                   = 0x806E
+GL_UNPACK_ROW_LENGTH                     = 0x0CF2
+GL_UNPACK_SKIP_IMAGES                    = 0x806D
+GL_UNPACK_SKIP_PIXELS                    = 0x0CF4
+GL_UNPACK_SKIP_ROWS                      = 0x0CF3
+GL_UNSIGNED_BYTE                         = 0x1401
+GL_UNSIGNED_INT                          = 0x1405
+GL_UNSIGNED_SHORT                        = 0x1403
+GL_VENDOR                                = 0x1F00
+GL_VERSION                               = 0x1F02
+GL_VERTEX_ATTRIB_ARRAY_DIVISOR           = 0x88FE
+GL_VERTEX_PROGRAM_POINT_SIZE             = 0x8642
+GL_VERTEX_SHADER                         = 0x8B31
+GL_VIEWPORT                              = 0x0BA2
+GL_VIEWPORT_BIT                          = 0x0800
+GL_WAIT_FAILED                           = 0x911D
+GL_ZERO                                  = 0x0000
+
+
+# ----------------------------------------------------------------- GLError ---
+class GLError(RuntimeError):
+    """ Invalid GL operation (as detected by the mock backend) """
+    pass
+
+
+
+# ---------------------------------------------------------------- Recorder ---
+Call = collections.namedtuple("Call", ["name", "args", "nbytes"])
+
+class Recorder(object):
+    """
+    Recorder of GL calls.
+
+    Number of calls (per function) and of transferred bytes are always
+    accounted while the call stream itself (name, arguments and number of
+    bytes of each call, array arguments being replaced with None) is only
+    kept while the recorder is enabled.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.clear()
+
+
+    def clear(self):
+        """ Forget all recorded calls """
+
+        self._calls = []
+        self._counts = collections.Counter()
+        self._nbytes = 0
+
+
+    @property
+    def calls(self):
+        """ Recorded calls (list of (name, args, nbytes)) """
+
+        return list(self._calls)
+
+
+    @property
+    def nbytes(self):
+        """ Total number of transferred bytes """
+
+        return self._nbytes
+
+
+    def count(self, name=None):
+        """
+        Number of calls to the given function (or to any function if name
+        is None).
+        """
+
+        if name is None:
+            return sum(self._counts.values())
+        return self._counts[name]
+
+
+    def record(self, name, args, nbytes=0):
+        """ Record a call """
+
+        self._counts[name] += 1
+        self._nbytes += nbytes
+        if self.enabled:
+            args = tuple(None if isinstance(arg, (np.ndarray, bytes)) else arg
+                         for arg in args)
+            self._calls.append(Call(name, args, nbytes))
+
+
+recorder = Recorder()
+
+
+
+# ------------------------------------------------------------------- State ---
+class State(object):
+    """ Minimal GL state (objects and bindings) """
+
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self):
+        """ Reset state to its initial value (no object) """
+
+        self.handle = 0
+        self.buffers = {}
+        self.mapped = {}
+        self.syncs = set()
+        self.textures = {}
+        self.shaders = {}
+        self.programs = {}
+        self.framebuffers = set()
+        self.renderbuffers = set()
+        self.vertex_arrays = set()
+        self.bindings = {}
+        self.capabilities = set()
+        self.program = 0
+        self.parameters = { GL_VIEWPORT:                [0, 0, 0, 0],
+                            GL_SCISSOR_BOX:             [0, 0, 0, 0],
+                            GL_MAX_TEXTURE_SIZE:        16384,
+                            GL_MAX_TEXTURE_IMAGE_UNITS: 32,
+                            GL_UNPACK_ALIGNMENT:        4,
+                            GL_PACK_ALIGNMENT:          4 }
+
+
+    def generate(self, n=1):
+        """ Generate n new handles """
+
+        handles = np.arange(self.handle+1, self.handle+1+n, dtype=np.uint32)
+        self.handle += n
+        if n == 1:
+            return int(handles[0])
+        return handles
+
+
+state = State()
+
+
+def reset():
+    """ Reset GL state and forget all recorded calls """
+
+    state.reset()
+    recorder.clear()
+
+    # A reset state is a new context: objects cached for the previous one
+    # are gone
+    cache = sys.modules.get("glumpy.gloo.cache", None)
+    if cache is not None:
+        cache.__caches__.clear()
+
+
+
+# ----------------------------------------------------------------- Helpers ---
+def _nbytes(data):
+    """ Number of bytes of data (0 if None) """
+
+    if data is None:
+        return 0
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    if isinstance(data, bytes):
+        return len(data)
+    try:
+        return np.asarray(data).nbytes
+    except Exception:
+        return 0
+
+
+_channels = { GL_RED: 1, GL_DEPTH_COMPONENT: 1, GL_LUMINANCE: 1,
+              GL_RG: 2, GL_RGB: 3, GL_RGBA: 4 }
+
+_sizes = { GL_BYTE: 1, GL_UNSIGNED_BYTE: 1, GL_SHORT: 2, GL_UNSIGNED_SHORT: 2,
+           GL_HALF_FLOAT: 2, GL_INT: 4, GL_UNSIGNED_INT: 4, GL_FLOAT: 4 }
+
+
+def _pixels(format, type, data, width, height=1, depth=1):
+    """
+    Number of bytes read from data for a (width,height,depth) pixel
+    transfer, taking unpack parameters into account and checking data is
+    large enough.
+    """
+
+    pixel_buffer = state.bindings.get(GL_PIXEL_UNPACK_BUFFER, 0)
+    if data is None and not pixel_buffer:
+        return 0
+    texel = _channels.get(format, 4) * _sizes.get(type, 1)
+    parameters = state.parameters
+    row_length = parameters.get(GL_UNPACK_ROW_LENGTH, 0) or width
+    image_height = parameters.get(GL_UNPACK_IMAGE_HEIGHT, 0) or height
+    alignment = parameters.get(GL_UNPACK_ALIGNMENT, 4)
+    row = -(-row_length*texel // alignment) * alignment
+    first = ((parameters.get(GL_UNPACK_SKIP_IMAGES, 0)*image_height +
+              parameters.get(GL_UNPACK_SKIP_ROWS, 0))*row +
+             parameters.get(GL_UNPACK_SKIP_PIXELS, 0)*texel)
+    last = first + ((depth-1)*image_height + height-1)*row + width*texel
+
+    # Data is an offset in the bound pixel buffer (no client transfer)
+    if pixel_buffer:
+        offset = int(getattr(data, "value", data) or 0)
+        if offset + last > state.buffers.get(pixel_buffer, 0):
+            raise GLError("Pixel transfer reads %d bytes out of %d"
+                          % (offset + last, state.buffers.get(pixel_buffer, 0)))
+        return 0
+
+    if last > _nbytes(data):
+        raise GLError("Pixel transfer reads %d bytes out of %d"
+                      % (last, _nbytes(data)))
+    return width*height*depth*texel
+
+
+def _handles(handles):
+    """ Handles as a list of int """
+
+    return [int(handle) for handle in np.atleast_1d(handles)]
+
+
+def _function(name):
+    """ Create a function that only records its calls """
+
+    def function(*args):
+        recorder.record(name, args)
+    function.__name__ = name
+    function.__doc__ = "Record %s calls" % name
+    return function
+
+
+def __getattr__(name):
+    """ Unknown GL functions are created on the fly (and only recorded) """
+
+    if name.startswith("gl"):
+        function = _function(name)
+        globals()[name] = function
+        return function
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+_gtypes = { "float":          GL_FLOAT,
+            "vec2":           GL_FLOAT_VEC2,
+            "vec3":           GL_FLOAT_VEC3,
+            "vec4":           GL_FLOAT_VEC4,
+            "int":            GL_INT,
+            "ivec2":          GL_INT_VEC2,
+            "ivec3":          GL_INT_VEC3,
+            "ivec4":          GL_INT_VEC4,
+            "bool":           GL_BOOL,
+            "bvec2":          GL_BOOL_VEC2,
+            "bvec3":          GL_BOOL_VEC3,
+            "bvec4":          GL_BOOL_VEC4,
+            "mat2":           GL_FLOAT_MAT2,
+            "mat3":           GL_FLOAT_MAT3,
+            "mat4":           GL_FLOAT_MAT4,
+            "sampler1D":      GL_SAMPLER_1D,
+            "sampler2D":      GL_SAMPLER_2D,
+            "sampler3D":      GL_SAMPLER_3D,
+            "samplerCube":    GL_SAMPLER_CUBE,
+            "sampler2DArray": GL_SAMPLER_2D_ARRAY }
+
+_re_comments = re.compile(r"//.*?$|/\*.*?\*/", re.DOTALL | re.MULTILINE)
+_re_declaration = re.compile(r"""\b(?P<qualifier>uniform|attribute|in)\s+
+                                 (?:(?:lowp|mediump|highp)\s+)?
+                                 (?P<type>\w+)\s+(?P<names>[^;{}()]+);""",
+                             re.VERBOSE)
+_re_name = re.compile(r"(?P<name>\w+)\s*(\[\s*(?P<size>\d+)\s*\])?")
+
+
+def _declarations(code, qualifiers):
+    """ Parse (name, size, gtype) declarations with given qualifiers """
+
+    declarations = []
+    code = re.sub(_re_comments, "", code)
+    for match in re.finditer(_re_declaration, code):
+        gtype = _gtypes.get(match.group("type"), None)
+        if match.group("qualifier") not in qualifiers or gtype is None:
+            continue
+        for name in match.group("names").split(","):
+            name = re.match(_re_name, name.strip())
+            if name is not None:
+                size = int(name.group("size") or 1)
+                declarations.append((name.group("name"), size, gtype))
+    return declarations
+
+
+def _blocks(code):
+    """ Uniform block names declared in code """
+
+    code = re.sub(_re_comments, "", code)
+    return re.findall(r"\buniform\s+(\w+)\s*\{", code)
+
+
+def _location(variables, name):
+    """ Location of a variable (-1 if not found) """
+
+    if isinstance(name, bytes):
+        name = name.decode()
+    match = re.match(_re_name, name)
+    if match is None:
+        return -1
+    index = int(match.group("size") or 0)
+    location = 0
+    for vname, size, gtype in variables:
+        if vname == match.group("name") and index < size:
+            return location + index
+        location += size
+    return -1
+
+
+
+# ----------------------------------------------------------------- Buffers ---
+def glGenBuffers(n):
+    handles = state.generate(n)
+    for handle in _handles(handles):
+        state.buffers[handle] = 0
+    recorder.record("glGenBuffers", (n,))
+    return handles
+
+
+def glDeleteBuffers(n, handles):
+    for handle in _handles(handles)[:n]:
+        state.buffers.pop(handle, None)
+    recorder.record("glDeleteBuffers", (n, handles))
+
+
+def glBindBuffer(target, handle):
+    state.bindings[target] = int(handle)
+    recorder.record("glBindBuffer", (target, handle))
+
+
+def glBindBufferBase(target, index, handle):
+    state.bindings[target] = int(handle)
+    state.bindings[(target, index)] = int(handle)
+    recorder.record("glBindBufferBase", (target, index, handle))
+
+
+def glBufferData(target, size, data, usage):
+    handle = state.bindings.get(target, 0)
+    if not handle:
+        raise GLError("No buffer bound to target %d" % target)
+    state.buffers[handle] = int(size)
+    nbytes = int(size) if data is not None else 0
+    recorder.record("glBufferData", (target, size, data, usage), nbytes)
+
+
+def glBufferSubData(target, offset, size, data):
+    handle = state.bindings.get(target, 0)
+    if not handle:
+        raise GLError("No buffer bound to target %d" % target)
+    if offset < 0 or offset + size > state.buffers.get(handle, 0):
+        raise GLError("Buffer sub data out of range (%d+%d > %d)"
+                      % (offset, size, state.buffers.get(handle, 0)))
+    recorder.record("glBufferSubData", (target, offset, size, data), int(size))
+
+
+def glMapBufferRange(target, offset, length, access):
+    handle = state.bindings.get(target, 0)
+    if not handle:
+        raise GLError("No buffer bound to target %d" % target)
+    if handle in state.mapped:
+        raise GLError("Buffer %d is already mapped" % handle)
+    if offset < 0 or offset + length > state.buffers.get(handle, 0):
+        raise GLError("Buffer map out of range (%d+%d > %d)"
+                      % (offset, length, state.buffers.get(handle, 0)))
+    memory = np.zeros(length, np.ubyte)
+    state.mapped[handle] = memory
+    recorder.record("glMapBufferRange", (target, offset, length, access))
+    return memory.ctypes.data
+
+
+def glUnmapBuffer(target):
+    handle = state.bindings.get(target, 0)
+    if handle not in state.mapped:
+        raise GLError("Buffer %d is not mapped" % handle)
+    memory = state.mapped.pop(handle)
+    recorder.record("glUnmapBuffer", (target,), memory.nbytes)
+    return True
+
+
+def glFenceSync(condition, flags):
+    sync = state.generate(1)
+    state.syncs.add(sync)
+    recorder.record("glFenceSync", (condition, flags))
+    return sync
+
+
+def glClientWaitSync(sync, flags, timeout):
+    if sync not in state.syncs:
+        raise GLError("Unknown sync object %s" % sync)
+    recorder.record("glClientWaitSync", (sync, flags, timeout))
+    return GL_ALREADY_SIGNALED
+
+
+def glDeleteSync(sync):
+    state.syncs.discard(sync)
+    recorder.record("glDeleteSync", (sync,))
+
+
+
+# ---------------------------------------------------------------- Textures ---
+def glGenTextures(n):
+    handles = state.generate(n)
+    for handle in _handles(handles):
+        state.textures[handle] = None
+    recorder.record("glGenTextures", (n,))
+    return handles
+
+
+def glDeleteTextures(*args):
+    for handle in _handles(args[-1]):
+        state.textures.pop(handle, None)
+    recorder.record("glDeleteTextures", args)
+
+
+def glBindTexture(target, handle):
+    state.bindings[target] = int(handle)
+    recorder.record("glBindTexture", (target, handle))
+
+
+def glTexImage1D(target, level, internalformat, width, border,
+                 format, type, data):
+    state.textures[state.bindings.get(target, 0)] = (width,)
+    recorder.record("glTexImage1D", (target, level, internalformat, width,
+                                     border, format, type, data), _nbytes(data))
+
+
+def glTexImage2D(target, level, internalformat, width, height, border,
+                 format, type, data):
+    state.textures[state.bindings.get(target, 0)] = (width, height)
+    recorder.record("glTexImage2D", (target, level, internalformat, width,
+                                     height, border, format, type, data),
+                    _nbytes(data))
+
+
+def glTexImage3D(target, level, internalformat, width, height, depth, border,
+                 format, type, data):
+    state.textures[state.bindings.get(target, 0)] = (width, height, depth)
+    recorder.record("glTexImage3D", (target, level, internalformat, width,
+                                     height, depth, border, format, type, data),
+                    _nbytes(data))
+
+
+def glTexSubImage1D(target, level, x, width, format, type, data):
+    recorder.record("glTexSubImage1D", (target, level, x, width,
+                                        format, type, data),
+                    _pixels(format, type, data, width))
+
+
+def glTexSubImage2D(target, level, x, y, width, height, format, type, data):
+    recorder.record("glTexSubImage2D", (target, level, x, y, width, height,
+                                        format, type, data),
+                    _pixels(format, type, data, width, height))
+
+
+def glTexSubImage3D(target, level, x, y, z, width, height, depth,
+                    format, type, data):
+    recorder.record("glTexSubImage3D", (target, level, x, y, z, width, height,
+                                        depth, format, type, data),
+                    _pixels(format, type, data, width, height, depth))
+
+
+def glGetTexImage(target, level, format, type, data=None):
+    recorder.record("glGetTexImage", (target, level, format, type))
+    return data
+
+
+def glPixelStorei(pname, value):
+    state.parameters[pname] = value
+    recorder.record("glPixelStorei", (pname, value))
+
+
+
+# ----------------------------------------------------------------- Shaders ---
+def glCreateShader(type):
+    handle = state.generate(1)
+    state.shaders[handle] = { "type": type, "source": "", "uniforms": [],
+                              "attributes": [], "blocks": [] }
+    recorder.record("glCreateShader", (type,))
+    return handle
+
+
+def glShaderSource(handle, source):
+    if isinstance(source, (list, tuple)):
+        source = "".join(source)
+    if isinstance(source, bytes):
+        source = source.decode()
+    state.shaders[handle]["source"] = source
+    recorder.record("glShaderSource", (handle, source))
+
+
+def glCompileShader(handle):
+    shader = state.shaders[handle]
+    shader["uniforms"] = _declarations(shader["source"], ("uniform",))
+    shader["blocks"] = _blocks(shader["source"])
+    if shader["type"] == GL_VERTEX_SHADER:
+        shader["attributes"] = _declarations(shader["source"], ("attribute","in"))
+    recorder.record("glCompileShader", (handle,))
+
+
+def glGetShaderiv(handle, pname):
+    recorder.record("glGetShaderiv", (handle, pname))
+    if pname == GL_COMPILE_STATUS:
+        return GL_TRUE
+    return 0
+
+
+def glGetShaderInfoLog(handle):
+    recorder.record("glGetShaderInfoLog", (handle,))
+    return b""
+
+
+def glDeleteShader(handle):
+    state.shaders.pop(handle, None)
+    recorder.record("glDeleteShader", (handle,))
+
+
+
+# ---------------------------------------------------------------- Programs ---
+def glCreateProgram():
+    handle = state.generate(1)
+    state.programs[handle] = { "shaders": [], "uniforms": [], "attributes": [],
+                               "blocks": [], "bindings": {} }
+    recorder.record("glCreateProgram", ())
+    return handle
+
+
+def glAttachShader(program, shader):
+    if shader not in state.programs[program]["shaders"]:
+        state.programs[program]["shaders"].append(shader)
+    recorder.record("glAttachShader", (program, shader))
+
+
+def glDetachShader(program, shader):
+    if shader in state.programs[program]["shaders"]:
+        state.programs[program]["shaders"].remove(shader)
+    recorder.record("glDetachShader", (program, shader))
+
+
+def glGetAttachedShaders(program):
+    recorder.record("glGetAttachedShaders", (program,))
+    return list(state.programs[program]["shaders"])
+
+
+def glLinkProgram(program):
+    uniforms, attributes, blocks = [], [], []
+    for handle in state.programs[program]["shaders"]:
+        shader = state.shaders.get(handle, None)
+        if shader is None:
+            continue
+        for uniform in shader["uniforms"]:
+            if uniform[0] not in [name for name,size,gtype in uniforms]:
+                uniforms.append(uniform)
+        attributes.extend(shader["attributes"])
+        blocks.extend(name for name in shader["blocks"] if name not in blocks)
+    state.programs[program]["uniforms"] = uniforms
+    state.programs[program]["attributes"] = attributes
+    state.programs[program]["blocks"] = blocks
+    state.programs[program]["bindings"] = {}
+    state.programs[program]["linked"] = True
+    recorder.record("glLinkProgram", (program,))
+
+
+def glProgramParameteri(program, pname, value):
+    recorder.record("glProgramParameteri", (program, pname, value))
+
+
+# Format of mock program binaries
+MOCK_PROGRAM_BINARY_FORMAT = 0x6D6F636B
+
+def _binary(program):
+    """ Mock binary of a linked program (its active variables) """
+
+    program = state.programs[program]
+    return repr((program["uniforms"], program["attributes"],
+                 program["blocks"])).encode()
+
+
+def glGetProgramBinary(program, bufsize, length, format, binary):
+    data = _binary(program)[:bufsize]
+    binary[:len(data)] = np.frombuffer(data, dtype=np.ubyte)
+    length[0] = len(data)
+    format[0] = MOCK_PROGRAM_BINARY_FORMAT
+    recorder.record("glGetProgramBinary", (program, bufsize), len(data))
+
+
+def glProgramBinary(program, format, binary, length):
+    data = np.asarray(binary, dtype=np.ubyte)[:length].tobytes()
+    linked = False
+    if format == MOCK_PROGRAM_BINARY_FORMAT:
+        try:
+            uniforms, attributes, blocks = ast.literal_eval(data.decode())
+            state.programs[program]["uniforms"] = uniforms
+            state.programs[program]["attributes"] = attributes
+            state.programs[program]["blocks"] = blocks
+            state.programs[program]["bindings"] = {}
+            linked = True
+        except Exception:
+            pass
+    state.programs[program]["linked"] = linked
+    recorder.record("glProgramBinary", (program, format, None, length), length)
+
+
+def glGetProgramiv(program, pname):
+    recorder.record("glGetProgramiv", (program, pname))
+    if pname == GL_LINK_STATUS:
+        return GL_TRUE if state.programs[program].get("linked") else GL_FALSE
+    elif pname == GL_PROGRAM_BINARY_LENGTH:
+        if not state.programs[program].get("linked"):
+            return 0
+        return len(_binary(program))
+    elif pname == GL_ACTIVE_UNIFORMS:
+        return len(state.programs[program]["uniforms"])
+    elif pname == GL_ACTIVE_ATTRIBUTES:
+        return len(state.programs[program]["attributes"])
+    return 0
+
+
+def glGetProgramInfoLog(program):
+    recorder.record("glGetProgramInfoLog", (program,))
+    return b""
+
+
+def _active(program, kind, index):
+    name, size, gtype = state.programs[program][kind][index]
+    if size > 1:
+        name = "%s[0]" % name
+    return name.encode(), size, gtype
+
+
+def glGetActiveUniform(program, index):
+    recorder.record("glGetActiveUniform", (program, index))
+    return _active(program, "uniforms", index)
+
+
+def glGetActiveAttrib(program, index):
+    recorder.record("glGetActiveAttrib", (program, index))
+    return _active(program, "attributes", index)
+
+
+def glGetUniformLocation(program, name):
+    recorder.record("glGetUniformLocation", (program, name))
+    return _location(state.programs[program]["uniforms"], name)
+
+
+def glGetAttribLocation(program, name):
+    recorder.record("glGetAttribLocation", (program, name))
+    return _location(state.programs[program]["attributes"], name)
+
+
+def glGetUniformBlockIndex(program, name):
+    recorder.record("glGetUniformBlockIndex", (program, name))
+    if isinstance(name, bytes):
+        name = name.decode()
+    blocks = state.programs[program]["blocks"]
+    return blocks.index(name) if name in blocks else GL_INVALID_INDEX
+
+
+def glUniformBlockBinding(program, index, binding):
+    state.programs[program]["bindings"][index] = binding
+    recorder.record("glUniformBlockBinding", (program, index, binding))
+
+
+def glUseProgram(program):
+    state.program = int(program)
+    recorder.record("glUseProgram", (program,))
+
+
+def glDeleteProgram(program):
+    state.programs.pop(program, None)
+    recorder.record("glDeleteProgram", (program,))
+
+
+
+# ---------------------------------------------------------------- Uniforms ---
+def _uniform(name, count):
+    """ Create a glUniform function for count scalar values """
+
+    def function(location, *values):
+        recorder.record(name, (location,) + values, 4*count)
+    function.__name__ = name
+    return function
+
+
+def _uniformv(name, count):
+    """ Create a glUniform*v function for vectors of count scalar values """
+
+    def function(location, n, *args):
+        recorder.record(name, (location, n) + args, 4*count*n)
+    function.__name__ = name
+    return function
+
+
+for _count in (1,2,3,4):
+    for _type in ("f", "i", "ui"):
+        _name = "glUniform%d%s" % (_count, _type)
+        globals()[_name] = _uniform(_name, _count)
+        globals()[_name + "v"] = _uniformv(_name + "v", _count)
+for _count in (2,3,4):
+    _name = "glUniformMatrix%dfv" % _count
+    globals()[_name] = _uniformv(_name, _count*_count)
+
+
+
+# -------------------------------------------------------------- Attributes ---
+def glVertexAttribPointer(index, size, type, normalized, stride, pointer):
+    recorder.record("glVertexAttribPointer",
+                    (index, size, type, normalized, stride, pointer))
+
+
+def glVertexAttribDivisor(index, divisor):
+    recorder.record("glVertexAttribDivisor", (index, divisor))
+
+
+for _count in (1,2,3,4):
+    _name = "glVertexAttrib%df" % _count
+    globals()[_name] = _uniform(_name, _count)
+
+
+def glGenVertexArrays(n):
+    handles = state.generate(n)
+    state.vertex_arrays.update(_handles(handles))
+    recorder.record("glGenVertexArrays", (n,))
+    return handles
+
+
+def glDeleteVertexArrays(n, handles):
+    state.vertex_arrays.difference_update(_handles(handles))
+    recorder.record("glDeleteVertexArrays", (n, handles))
+
+
+
+# ------------------------------------------------------------ Framebuffers ---
+def glGenFramebuffers(n):
+    handles = state.generate(n)
+    state.framebuffers.update(_handles(handles))
+    recorder.record("glGenFramebuffers", (n,))
+    return handles
+
+
+def glDeleteFramebuffers(n, handles):
+    state.framebuffers.difference_update(_handles(handles))
+    recorder.record("glDeleteFramebuffers", (n, handles))
+
+
+def glGenRenderbuffers(n):
+    handles = state.generate(n)
+    state.renderbuffers.update(_handles(handles))
+    recorder.record("glGenRenderbuffers", (n,))
+    return handles
+
+
+def glDeleteRenderbuffers(n, handles):
+    state.renderbuffers.difference_update(_handles(handles))
+    recorder.record("glDeleteRenderbuffers", (n, handles))
+
+
+def glCheckFramebufferStatus(target):
+    recorder.record("glCheckFramebufferStatus", (target,))
+    return GL_FRAMEBUFFER_COMPLETE
+
+
+
+# ------------------------------------------------------------------- Draws ---
+def glDrawArrays(mode, first, count):
+    recorder.record("glDrawArrays", (mode, first, count))
+
+
+def glDrawElements(mode, count, type, indices):
+    nbytes = _nbytes(indices) if isinstance(indices, np.ndarray) else 0
+    recorder.record("glDrawElements", (mode, count, type, indices), nbytes)
+
+
+def glMultiDrawArrays(mode, first, count, drawcount):
+    first = tuple(int(value) for value in first[:drawcount])
+    count = tuple(int(value) for value in count[:drawcount])
+    recorder.record("glMultiDrawArrays", (mode, first, count, drawcount))
+
+
+def glMultiDrawElements(mode, count, type, indices, drawcount):
+    count = tuple(int(value) for value in count[:drawcount])
+    offsets = tuple(int(offset or 0) for offset in indices[:drawcount])
+    recorder.record("glMultiDrawElements", (mode, count, type, offsets, drawcount))
+
+
+def glDrawArraysInstanced(mode, first, count, instances):
+    recorder.record("glDrawArraysInstanced", (mode, first, count, instances))
+
+
+def glDrawElementsInstanced(mode, count, type, indices, instances):
+    nbytes = _nbytes(indices) if isinstance(indices, np.ndarray) else 0
+    recorder.record("glDrawElementsInstanced",
+                    (mode, count, type, indices, instances), nbytes)
+
+
+
+# ------------------------------------------------------------------- State ---
+def glEnable(capability):
+    state.capabilities.add(capability)
+    recorder.record("glEnable", (capability,))
+
+
+def glDisable(capability):
+    state.capabilities.discard(capability)
+    recorder.record("glDisable", (capability,))
+
+
+def glIsEnabled(capability):
+    recorder.record("glIsEnabled", (capability,))
+    return capability in state.capabilities
+
+
+def glViewport(x, y, width, height):
+    state.parameters[GL_VIEWPORT] = [x, y, width, height]
+    recorder.record("glViewport", (x, y, width, height))
+
+
+def glScissor(x, y, width, height):
+    state.parameters[GL_SCISSOR_BOX] = [x, y, width, height]
+    recorder.record("glScissor", (x, y, width, height))
+
+
+def glGetIntegerv(pname, *args):
+    recorder.record("glGetIntegerv", (pname,))
+    return state.parameters.get(pname, 0)
+
+glGetInteger = glGetIntegerv
+glGetParameter = glGetIntegerv
+
+
+def glGetString(name):
+    recorder.record("glGetString", (name,))
+    return { GL_VENDOR:                   b"glumpy",
+             GL_RENDERER:                 b"glumpy mock",
+             GL_VERSION:                  b"3.3 glumpy mock",
+             GL_SHADING_LANGUAGE_VERSION: b"3.30" }.get(name, b"")
+
+
+def glGetError():
+    return GL_NO_ERROR
+
+
+def glReadPixels(x, y, width, height, format, type, *args):
+    channels = { GL_RGB: 3, GL_RGBA: 4 }.get(format, 1)
+    dtype = np.float32 if type == GL_FLOAT else np.ubyte
+    data = np.zeros((height, width, channels), dtype=dtype)
+    recorder.record("glReadPixels", (x, y, width, height, format, type),
+                    data.nbytes)
+    return data
+
+
+for _name in ("glActiveTexture", "glTexParameterf", "glTexParameteri",
+              "glEnableVertexAttribArray", "glDisableVertexAttribArray",
+              "glBindVertexArray", "glBindFramebuffer", "glBindRenderbuffer",
+              "glFramebufferTexture2D", "glFramebufferRenderbuffer",
+              "glRenderbufferStorage", "glDrawBuffers",
+              "glGetFramebufferAttachmentParameteriv", "glProgramParameteriEXT",
+              "glClear", "glClearColor", "glBlendFunc", "glDepthMask",
+              "glPushAttrib", "glPopAttrib", "glFlush", "glFinish"):
+    globals()[_name] = _function(_name)
+
+
+__all__ = [name for name in list(globals().keys())
+           if name.startswith(("gl", "GL_"))]
@@ -124,10 +124,17 @@ class PanZoom(Transform):
         self._zoom = np.clip(value, self._zoom_min, self._zoom_max)
 
         if self.is_attached:
-            aspect = 1.0
-            if self._aspect is not None:
-                aspect = self._window_aspect * self._aspect
-            self["zoom"] = self._zoom * aspect
+            self["zoom"] = self.scale
+
+
+    @property
+    def scale(self):
+        """ Actual scale (zoom level corrected for aspect) """
+
+        aspect = 1.0
+        if self._aspect is not None:
+            aspect = self._window_aspect * self._aspect
+        return self._zoom * aspect
 
 
     @property
@@ -165,10 +172,7 @@ class PanZoom(Transform):
 
     def on_attach(self, program):
         self["pan"] = self.pan
-        aspect = 1.0
-        if self._aspect is not None:
-            aspect = self._window_aspect * self._aspect
-        self["zoom"] = self.zoom * aspect
+        self["zoom"] = self.scale
 
 
     def on_resize(self, width, height):
@@ -179,11 +183,7 @@ class PanZoom(Transform):
             self._window_aspect = np.array([1.0/aspect, 1.0])
         else:
             self._window_aspect = np.array([1.0, aspect/1.0])
-
-        aspect = 1.0
-        if self._aspect is not None:
-            aspect = self._window_aspect * self._aspect
-        self["zoom"] = self.zoom * aspect
+        self["zoom"] = self.scale
 
         # Transmit signal to other transforms
         Transform.on_resize(self, width, height)
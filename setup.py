@@ -57,6 +57,7 @@ if __name__ == "__main__":
                     'glumpy.gloo',
                     'glumpy.api',
                     'glumpy.api.matplotlib',
+                    'glumpy.benchmarks',
 
                     'glumpy.library',
                     'glumpy.library.math',